@@ -0,0 +1,329 @@
+"""
+Autore: Francesco Antonetti Lamorgese Passeri
+
+This work is licensed under the Creative Commons Attribution 4.0 International
+License. To view a copy of this license, visit
+http://creativecommons.org/licenses/by/4.0/ or send a letter to Creative
+Commons, PO Box 1866, Mountain View, CA 94042, USA.
+
+Avvio
+
+Metodo di avvio dei processi del framework ("metodo_avvio" in pipeline.conf):
+"fork" (predefinito su Linux), "spawn" o "forkserver". Con "forkserver" un
+processo dedicato importa una volta sola i moduli del framework e quelli delle
+operazioni elencate in pipeline.conf, e ogni nuovo processo (operazioni,
+Gestori Segnali, operazioni riavviate) è una copia di quel processo già
+pronto: non reimporta nulla e non eredita lo stato del processo principale.
+
+I processi avviati senza fork ricevono l'oggetto da eseguire serializzato e
+non ereditano lo stato dei moduli: la tabella dei nomi del formato binario, il
+registro e il buffer del tracciamento viaggiano insieme all'oggetto e vengono
+ripristinati al suo arrivo, e i processi già avviati a cui l'oggetto fa
+riferimento viaggiano come processo_esterno.
+
+Il metodo va impostato nel processo principale prima di creare code, lock e
+processi (vedi main.py).
+
+Start
+
+Start method of the framework processes ("metodo_avvio" in pipeline.conf):
+"fork" (default on Linux), "spawn" or "forkserver". With "forkserver" a
+dedicated process imports only once the framework modules and the ones of the
+operations listed in pipeline.conf, and every new process (operations, Signal
+Managers, restarted operations) is a copy of that ready process: it imports
+nothing again and it does not inherit the state of the main process.
+
+The processes started without fork receive the object to run serialized and
+do not inherit the state of the modules: the names table of the binary
+format, the log and the tracing buffer travel together with the object and
+are restored on its arrival, and the already started processes the object
+refers to travel as processo_esterno.
+
+The method must be set in the main process before creating queues, locks and
+processes (see main.py).
+"""
+
+import multiprocessing
+import os
+import signal
+import sys
+
+from importlib               import import_module,reload
+from multiprocessing.process import BaseProcess
+from time                    import monotonic,sleep
+
+#Framework
+from formato_segnale import nomi,registra_nomi
+from registro        import stato_registro,ripristina_registro
+from tracciamento    import stato_tracciamento,ripristina_tracciamento
+
+METODO_FORK          = "fork"
+METODO_SPAWN         = "spawn"
+METODO_FORKSERVER    = "forkserver"
+METODI               = (METODO_FORK,METODO_SPAWN,METODO_FORKSERVER)
+# Moduli del framework importati in anticipo dal processo forkserver
+# Framework modules imported in advance by the forkserver process
+MODULI_FRAMEWORK     = ("oggetto",
+                        "oggetto_asincrono",
+                        "gestore_segnali",
+                        "gestore_pipeline",
+                        "code_segnali",
+                        "formato_segnale",
+                        "memoria_condivisa",
+                        "metriche",
+                        "registro",
+                        "tracciamento",
+                        "profilatore",
+                        "trasporto",
+                        "giornale")
+# Chiave dello stato dei moduli nello stato serializzato di un oggetto
+# Key of the modules state in the serialized state of an object
+CHIAVE_STATO_GLOBALE = "_stato_globale"
+# Attributo con la versione di un modulo ricaricato (vedi ricarica_modulo)
+# Attribute with the version of a reloaded module (see ricarica_modulo)
+ATTRIBUTO_VERSIONE   = "versione_modulo"
+# Intervallo di controllo dei processi esterni attesi con join
+# Check interval of the external processes waited for with join
+ATTESA_PROCESSO      = 0.01
+
+# Processo in cui lo stato dei moduli è già stato ripristinato
+# Process in which the modules state has already been restored
+pid_ripristinato     = None
+
+def metodo_avvio(impostazioni):
+    """
+    Metodo di avvio indicato nelle impostazioni, None se manca
+    Start method given in the settings, None if missing
+    """
+    metodo = next((valore for nome,valore in impostazioni \
+                   if nome == "metodo_avvio"),None)
+    if metodo is not None and metodo not in METODI:
+        raise ValueError("Metodo di avvio non valido: " + metodo) # Invalid start method
+    return metodo
+
+def imposta_metodo_avvio(impostazioni):
+    """
+    Imposta Metodo Avvio
+
+    Imposta il metodo di avvio dei processi indicato nelle impostazioni della
+    pipeline; con "forkserver" fa importare in anticipo al processo
+    forkserver i moduli del framework e delle operazioni. Va chiamata nel
+    processo principale prima di creare code, lock e processi. Restituisce il
+    metodo in uso.
+
+    Set Start Method
+
+    Sets the processes start method given in the pipeline settings; with
+    "forkserver" it has the forkserver process import in advance the modules
+    of the framework and of the operations. It must be called in the main
+    process before creating queues, locks and processes. Returns the method
+    in use.
+    """
+    metodo = metodo_avvio(impostazioni)
+    if metodo is None:
+        return multiprocessing.get_start_method()
+    if metodo == METODO_FORKSERVER:
+        multiprocessing.set_forkserver_preload(
+                         list(MODULI_FRAMEWORK) + \
+                         [valore.split()[0] for nome,valore in impostazioni \
+                          if nome == "operazione"])
+    multiprocessing.set_start_method(metodo,force=True)
+    return metodo
+
+def stato_globale():
+    """
+    Stato Globale
+
+    Restituisce lo stato dei moduli del framework che i processi avviati
+    senza fork non ereditano.
+
+    Global State
+
+    Returns the state of the framework modules which the processes started
+    without fork do not inherit.
+    """
+    return {"nomi":         list(nomi),
+            "registro":     stato_registro(),
+            "tracciamento": stato_tracciamento()}
+
+def ripristina_stato_globale(stato):
+    """
+    Ripristina Stato Globale
+
+    Ripristina lo stato dei moduli restituito da stato_globale, una sola volta
+    per processo.
+
+    Restore Global State
+
+    Restores the modules state returned by stato_globale, only once per
+    process.
+    """
+    global pid_ripristinato
+    if pid_ripristinato == os.getpid():
+        return
+    pid_ripristinato = os.getpid()
+    registra_nomi(stato["nomi"])
+    ripristina_registro(stato["registro"])
+    ripristina_tracciamento(stato["tracciamento"])
+
+class processo_esterno:
+    """
+    Processo Esterno
+
+    Riferimento serializzabile a un processo avviato da un altro processo:
+    ne conserva nome e pid e lo controlla tramite i segnali del sistema
+    operativo.
+
+    External Process
+
+    Serializable reference to a process started by another process: it keeps
+    its name and pid and controls it through the operating system signals.
+    """
+    def __init__(self,processo):
+        self.name = processo.name
+        self.pid  = processo.pid
+        self.nome = getattr(processo,"nome",processo.name)
+    def __repr__(self):
+        return "<" + type(self).__name__ + " " + self.nome + " pid " + \
+               str(self.pid) + ">"
+    def start(self):
+        pass
+    def is_alive(self):
+        # Il processo non è figlio di questo: uno zombie non è più vivo
+        # The process is not a child of this one: a zombie is no longer alive
+        try:
+            with open("/proc/" + str(self.pid) + "/stat") as stat:
+                return stat.read().rsplit(")",1)[1].split()[0] != "Z"
+        except FileNotFoundError:
+            return False
+        except OSError:
+            pass
+        try:
+            os.kill(self.pid,0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+    def join(self,timeout=None):
+        scadenza = None if timeout is None else monotonic() + timeout
+        while self.is_alive() and (scadenza is None or monotonic() < scadenza):
+            sleep(ATTESA_PROCESSO)
+    def terminate(self):
+        self.segnala(signal.SIGTERM)
+    def kill(self):
+        self.segnala(signal.SIGKILL)
+    def segnala(self,segnale):
+        try:
+            os.kill(self.pid,segnale)
+        except ProcessLookupError:
+            pass
+
+def vivo(processo):
+    """
+    Vero se il processo è vivo, anche se non è figlio di questo processo
+    True if the process is alive, even if it is not a child of this process
+    """
+    if getattr(processo,"pid",None) is None:
+        return False
+    return processo_esterno(processo).is_alive()
+
+def ricarica_modulo(nome):
+    """
+    Ricarica Modulo
+
+    Ricarica il modulo indicato (importandolo se necessario) e ne aumenta la
+    versione, così che i processi che ne hanno una versione precedente (il
+    processo forkserver lo importa una volta sola) lo ricarichino a loro volta
+    ricevendo un oggetto (vedi aggiorna_classe). Restituisce il modulo.
+
+    Reload Module
+
+    Reloads the given module (importing it if needed) and increases its
+    version, so that the processes holding a previous version of it (the
+    forkserver process imports it only once) reload it in turn when receiving
+    an object (see aggiorna_classe). Returns the module.
+    """
+    modulo   = import_module(nome)
+    versione = getattr(modulo,ATTRIBUTO_VERSIONE,0)
+    modulo   = reload(modulo)
+    setattr(modulo,ATTRIBUTO_VERSIONE,versione + 1)
+    return modulo
+
+def versione_classe(classe):
+    """Versione del modulo di una classe - Version of the module of a class"""
+    return getattr(sys.modules.get(classe.__module__),ATTRIBUTO_VERSIONE,0)
+
+def aggiorna_classe(istanza,versione):
+    """
+    Aggiorna Classe
+
+    Se il modulo della classe dell'istanza ha una versione diversa da quella
+    indicata lo ricarica e sposta l'istanza sulla classe ricaricata.
+
+    Update Class
+
+    If the module of the instance's class has a version other than the given
+    one it reloads it and moves the instance to the reloaded class.
+    """
+    classe = type(istanza)
+    if versione_classe(classe) == versione:
+        return
+    modulo = reload(sys.modules[classe.__module__])
+    setattr(modulo,ATTRIBUTO_VERSIONE,versione)
+    istanza.__class__ = getattr(modulo,classe.__name__)
+
+def avviato(valore):
+    """Vero per un processo già avviato - True for an already started process"""
+    return isinstance(valore,BaseProcess) and valore.pid is not None
+
+def serializzabile(valore):
+    """
+    Sostituisce con processo_esterno un processo già avviato, anche tra i
+    valori di un dizionario o gli elementi di una lista
+
+    Replaces an already started process with processo_esterno, also among the
+    values of a dictionary or the items of a list
+    """
+    if avviato(valore):
+        return processo_esterno(valore)
+    if isinstance(valore,dict) and any(map(avviato,valore.values())):
+        return {chiave: serializzabile(v) for chiave,v in valore.items()}
+    if isinstance(valore,list) and any(map(avviato,valore)):
+        return [serializzabile(v) for v in valore]
+    return valore
+
+def stato_processo(processo):
+    """
+    Stato Processo
+
+    Stato serializzabile di un processo del framework da avviare: i processi
+    già avviati a cui fa riferimento diventano processo_esterno e lo stato
+    dei moduli viaggia con lui.
+
+    Process State
+
+    Serializable state of a framework process to start: the already started
+    processes it refers to become processo_esterno and the modules state
+    travels with it.
+    """
+    stato = {nome: serializzabile(valore) \
+             for nome,valore in processo.__dict__.items()}
+    stato[CHIAVE_STATO_GLOBALE] = stato_globale()
+    return stato
+
+def ripristina_processo(processo,stato):
+    """
+    Ripristina Processo
+
+    Ripristina nel processo che lo riceve un processo del framework
+    serializzato con stato_processo.
+
+    Restore Process
+
+    Restores in the receiving process a framework process serialized with
+    stato_processo.
+    """
+    stato = dict(stato)
+    ripristina_stato_globale(stato.pop(CHIAVE_STATO_GLOBALE))
+    processo.__dict__.update(stato)
@@ -0,0 +1,477 @@
+"""
+Autore: Francesco Antonetti Lamorgese Passeri
+
+This work is licensed under the Creative Commons Attribution 4.0 International
+License. To view a copy of this license, visit
+http://creativecommons.org/licenses/by/4.0/ or send a letter to Creative
+Commons, PO Box 1866, Mountain View, CA 94042, USA.
+
+Benchmark
+
+Misura il costo del framework su pipeline sintetiche: una sonda e da 1 a 100
+repliche di un'operazione eco, costruite da file pipeline.conf generati. I
+risultati sono scritti in JSON, così da poter confrontare le versioni del
+framework e trovare le regressioni:
+
+    python benchmark.py --operazioni 1 10 100 --uscita risultati.json
+
+Misure:
+-) salto: latenza di un segnale attraverso due Gestori Segnali collegati da
+   una coda IPC (p50/p99);
+-) salto_locale: andata e ritorno tra due thread attraverso code a priorità
+   locali (p50/p99) e risvegli di chi attende senza trovare nessun elemento;
+-) instradamento: andata e ritorno sonda -> eco -> sonda attraverso
+   gestore_pipeline.avvia (p50/p99);
+-) diffusione: tempo perché un segnale broadcast della sonda raggiunga tutte
+   le eco e ne tornino le risposte (p50/p99);
+-) portata: segnali al secondo sostenuti tra sonda ed eco;
+-) avvio: tempo dalla costruzione del Gestore Pipeline al segnale "pronto";
+-) rss: memoria residente media di un'operazione e del suo Gestore Segnali
+   (solo dove c'è /proc).
+
+Benchmark
+
+Measures the framework cost on synthetic pipelines: a probe and from 1 to 100
+replicas of an echo operation, built from generated pipeline.conf files.
+Results are written as JSON, so that framework versions can be compared and
+regressions found (see above for the command line).
+
+Measures:
+-) salto: latency of a signal through two Signal Managers linked by an IPC
+   queue (p50/p99);
+-) salto_locale: round trip between two threads through local priority
+   queues (p50/p99) and wake-ups of the waiter that find no item;
+-) instradamento: round trip probe -> echo -> probe through
+   gestore_pipeline.avvia (p50/p99);
+-) diffusione: time for a broadcast signal of the probe to reach all the
+   echoes and for their answers to come back (p50/p99);
+-) portata: sustained signals per second between probe and echoes;
+-) avvio: time from the construction of the Pipeline Manager to the "pronto"
+   signal;
+-) rss: mean resident memory of an operation and of its Signal Manager (only
+   where /proc is available).
+
+Con --soglie, le misure con una soglia (vedi SOGLIE) che la superano vengono
+segnalate come regressioni e il benchmark termina con codice 1. Le soglie
+sono assolute e dipendono dalla macchina, quindi vanno richieste solo dove
+il carico è sotto controllo.
+
+With --soglie, the measures with a threshold (see SOGLIE) exceeding it are
+reported as regressions and the benchmark exits with code 1. The thresholds
+are absolute and depend on the machine, so they should be requested only
+where the load is under control.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import threading
+
+from multiprocessing            import Queue,Lock,active_children
+from multiprocessing.connection import wait
+from queue                      import Empty
+from time                       import monotonic
+
+#Framework
+from oggetto         import oggetto
+from gestore_segnali import gestore_segnali,MODALITA_PROCESSO,MODALITA_THREAD
+from code_segnali    import elementi,lettori,coda_priorita
+from formato_segnale import impacchetta,spacchetta_messaggio
+
+# Tempo massimo di attesa di una singola risposta
+# Maximum wait time for a single answer
+ATTESA_RISPOSTA  = 10.0
+# Segnali in volo durante la misura della portata
+# Signals in flight while measuring the throughput
+FINESTRA_PORTATA = 256
+# Soglie oltre le quali una misura è una regressione, controllate solo con
+# --soglie: latenza p50 del salto locale e risvegli a vuoto per campione
+# Thresholds beyond which a measure is a regression, checked only with
+# --soglie: p50 latency of the local hop and empty wake-ups per sample
+SOGLIE           = {("salto_locale","p50"):       0.001,
+                    ("salto_locale","a_vuoto"):   0.1}
+
+def percentili(campioni):
+    """
+    Percentili
+
+    Restituisce p50, p99 e numero dei campioni (tempi in secondi).
+
+    Percentiles
+
+    Returns p50, p99 and number of samples (times in seconds).
+    """
+    campioni = sorted(campioni)
+    if not campioni:
+        return {"p50": None, "p99": None, "campioni": 0}
+    return {"p50":      campioni[len(campioni) // 2],
+            "p99":      campioni[min(len(campioni) - 1,
+                                     int(len(campioni) * 0.99))],
+            "campioni": len(campioni)}
+
+def rss(pid):
+    """
+    Memoria residente del processo in kB, None se non disponibile
+    Resident memory of the process in kB, None if not available
+    """
+    try:
+        with open("/proc/" + str(pid) + "/status") as f:
+            for riga in f:
+                if riga.startswith("VmRSS:"):
+                    return int(riga.split()[1])
+    except OSError:
+        pass
+    return None
+
+class eco_benchmark(oggetto):
+    """
+    Eco Benchmark
+
+    Risponde "pong" al mittente di ogni "ping", con le stesse estensioni.
+
+    Echo Benchmark
+
+    Answers "pong" to the sender of every "ping", with the same extensions.
+    """
+    def __init__(self,file_configurazione,*code):
+        super().__init__(*code)
+    def run(self):
+        if self.gestore_segnali is None:
+            self.avvia_gestore_segnali()
+        self.segnala_pronto()
+        while True:
+            try:
+                segnale,mittente,destinatario,timestamp = self.leggi_segnale()
+            except Empty:
+                continue
+            if segnale == "stop":
+                return -1
+            if segnale == "ping":
+                self.scrivi_segnale("pong",mittente,self.estensioni_segnale)
+
+class sonda_benchmark(oggetto):
+    """
+    Sonda Benchmark
+
+    Esegue le misure richieste dal benchmark con i segnali "instradamento",
+    "diffusione" e "portata" e ne mette i risultati nella coda risultati.
+
+    Benchmark Probe
+
+    Runs the measures requested by the benchmark with the signals
+    "instradamento", "diffusione" and "portata" and puts their results in the
+    risultati queue.
+    """
+    # Creata prima di avviare la pipeline, così che la sonda la erediti
+    # Created before starting the pipeline, so that the probe inherits it
+    risultati = None
+    def __init__(self,file_configurazione,*code):
+        super().__init__(*code)
+    def run(self):
+        if self.gestore_segnali is None:
+            self.avvia_gestore_segnali()
+        self.segnala_pronto()
+        while True:
+            try:
+                segnale = self.leggi_segnale()[0]
+            except Empty:
+                continue
+            if segnale == "stop":
+                return -1
+            if segnale in ("instradamento","diffusione","portata"):
+                parametri = dict(self.estensioni_segnale)
+                try:
+                    misura = getattr(self,"misura_" + segnale)(**parametri)
+                    self.risultati.put([segnale,misura])
+                except Exception as e:
+                    self.risultati.put([segnale,{"errore": repr(e)}])
+    def attendi_pong(self):
+        scadenza = monotonic() + ATTESA_RISPOSTA
+        while True:
+            segnale = self.leggi_segnale(max(0,scadenza - monotonic()))[0]
+            if segnale == "pong":
+                return self.estensioni_segnale
+    def misura_instradamento(self,campioni):
+        tempi = []
+        for i in range(campioni):
+            inizio = monotonic()
+            self.scrivi_segnale("ping","eco_benchmark",{"i": i})
+            self.attendi_pong()
+            tempi.append(monotonic() - inizio)
+        return percentili(tempi)
+    def misura_diffusione(self,campioni,destinatari):
+        tempi = []
+        for i in range(campioni):
+            inizio = monotonic()
+            self.scrivi_segnale("ping","",{"i": i})
+            for _ in range(destinatari):
+                self.attendi_pong()
+            tempi.append(monotonic() - inizio)
+        return percentili(tempi)
+    def misura_portata(self,campioni):
+        inviati = ricevuti = 0
+        inizio  = monotonic()
+        while ricevuti < campioni:
+            while inviati < campioni and inviati - ricevuti < FINESTRA_PORTATA:
+                self.scrivi_segnale("ping","eco_benchmark",{"i": inviati})
+                inviati += 1
+            self.attendi_pong()
+            ricevuti += 1
+        durata = monotonic() - inizio
+        # Ogni ping genera due segnali instradati: il ping e il pong
+        # Every ping generates two routed signals: the ping and the pong
+        return {"segnali_al_secondo": 2 * campioni / durata,
+                "campioni":           campioni}
+
+def misura_salto(campioni,modalita):
+    """
+    Misura Salto
+
+    Latenza di un segnale da un Gestore Segnali all'altro attraverso una coda
+    IPC, misurata dal processo del benchmark, che fa da oggetto per entrambi.
+
+    Measure Hop
+
+    Latency of a signal from a Signal Manager to the other through an IPC
+    queue, measured by the benchmark process, which acts as the object of
+    both.
+    """
+    ipc                       = Queue()
+    ipc_inutilizzata          = Queue()
+    uscita_a,entrata_b        = Queue(),Queue()
+    gestori                   = []
+    for padre,coda_entrata,coda_uscita,ipc_entrata,ipc_uscita in \
+        (("a",Queue(),uscita_a,ipc_inutilizzata,ipc),
+         ("b",entrata_b,Queue(),ipc,ipc_inutilizzata)):
+        gestore = gestore_segnali(padre,
+                                  ipc_entrata,Lock(),
+                                  ipc_uscita,Lock(),
+                                  coda_entrata,Lock(),
+                                  coda_uscita,Lock(),
+                                  modalita=modalita)
+        gestore.start()
+        coda_uscita.put(["avvia","gestore_segnali"])
+        gestori.append((gestore,coda_uscita))
+    tempi = []
+    try:
+        for i in range(campioni):
+            inizio = monotonic()
+            uscita_a.put(["ping","b"])
+            while not any(segnale[0] == "ping" for segnale in \
+                          elementi(entrata_b.get(timeout=ATTESA_RISPOSTA))):
+                pass
+            tempi.append(monotonic() - inizio)
+    finally:
+        for gestore,coda_uscita in gestori:
+            coda_uscita.put(["stop","gestore_segnali"])
+        for gestore,coda_uscita in gestori:
+            gestore.join(ATTESA_RISPOSTA)
+    return percentili(tempi)
+
+def misura_salto_locale(campioni):
+    """
+    Misura Salto Locale
+
+    Andata e ritorno di un segnale tra il thread del benchmark e un thread eco
+    attraverso due code a priorità locali, come tra un oggetto e il suo
+    Gestore Segnali in modalità thread. Conta anche quante volte chi attende
+    viene risvegliato dalla pipe della coda senza trovarvi un elemento: un
+    risveglio anticipato rispetto all'inserimento diventa un'attesa attiva.
+
+    Measure Local Hop
+
+    Round trip of a signal between the benchmark thread and an echo thread
+    through two local priority queues, as between an object and its Signal
+    Manager in thread mode. It also counts how many times the waiter is woken
+    up by the queue pipe without finding an item there: a wake-up ahead of
+    the insertion turns into a busy wait.
+    """
+    andata,ritorno = coda_priorita(locale=True),coda_priorita(locale=True)
+    a_vuoto        = [0,0] # benchmark, eco - # benchmark, echo
+    def ricevi(coda,indice):
+        while True:
+            try:
+                return coda.get_nowait()
+            except Empty:
+                pass
+            if not wait(lettori(coda),ATTESA_RISPOSTA):
+                raise Empty
+            if coda.empty():
+                a_vuoto[indice] += 1
+    def eco():
+        while True:
+            segnale = ricevi(andata,1)
+            if segnale is None:
+                return
+            ritorno.put(segnale)
+    thread_eco = threading.Thread(target=eco,daemon=True)
+    thread_eco.start()
+    tempi = []
+    try:
+        for i in range(campioni):
+            inizio = monotonic()
+            andata.put(["ping","eco"])
+            ricevi(ritorno,0)
+            tempi.append(monotonic() - inizio)
+    finally:
+        andata.put(None)
+        thread_eco.join(ATTESA_RISPOSTA)
+    risultato            = percentili(tempi)
+    risultato["a_vuoto"] = sum(a_vuoto) / max(1,campioni)
+    return risultato
+
+def regressioni(risultati):
+    """
+    Regressioni
+
+    Restituisce le misure che superano la loro soglia (vedi SOGLIE).
+
+    Regressions
+
+    Returns the measures exceeding their threshold (see SOGLIE).
+    """
+    superate = []
+    for (misura,valore),soglia in SOGLIE.items():
+        misurato = risultati.get(misura,{}).get(valore)
+        if misurato is not None and misurato > soglia:
+            superate.append(misura + " " + valore + ": " + str(misurato) + \
+                            " > " + str(soglia))
+    return superate
+
+def attendi_segnale(coda,nome):
+    """
+    Attende il segnale indicato dal Gestore Pipeline
+    Waits for the given signal from the Pipeline Manager
+    """
+    scadenza = monotonic() + ATTESA_RISPOSTA
+    while True:
+        for segnale in spacchetta_messaggio(
+                         coda.get(timeout=max(0,scadenza - monotonic()))):
+            if segnale[0] == nome:
+                return
+
+def misura_pipeline(operazioni,campioni,modalita,cartella):
+    """
+    Misura Pipeline
+
+    Costruisce una pipeline con una sonda e il numero indicato di repliche
+    dell'eco ed esegue le misure.
+
+    Measure Pipeline
+
+    Builds a pipeline with a probe and the given number of echo replicas and
+    runs the measures.
+    """
+    from gestore_pipeline import gestore_pipeline
+
+    file_configurazione = os.path.join(cartella,
+                                       "pipeline_" + str(operazioni) + ".conf")
+    with open(file_configurazione,"w") as f:
+        f.write("modalita_gestore_segnali " + modalita + "\n")
+        f.write("operazione eco_benchmark " + str(operazioni) + "\n")
+        f.write("operazione sonda_benchmark\n")
+    entrata,uscita = Queue(),Queue()
+    risultato      = {"operazioni": operazioni}
+
+    inizio   = monotonic()
+    pipeline = gestore_pipeline(file_configurazione,entrata,Lock(),uscita,Lock())
+    pipeline.start()
+    entrata.put(impacchetta("avvia","__main__","gestore_pipeline"))
+    try:
+        attendi_segnale(uscita,"pronto")
+        risultato["avvio"] = monotonic() - inizio
+
+        # In modalità thread il Gestore Segnali è dentro l'operazione
+        # In thread mode the Signal Manager is inside the operation
+        memoria = []
+        for nome,operazione in pipeline.operazioni.items():
+            if nome.startswith("eco_benchmark"):
+                kb = rss(operazione.pid)
+                if kb is not None and operazione.gestore_segnali is not None:
+                    kb += rss(operazione.gestore_segnali.pid) or 0
+                memoria.append(kb)
+        if memoria and None not in memoria:
+            risultato["rss_operazione_kb"] = sum(memoria) / len(memoria)
+
+        for misura,parametri in (("instradamento",{"campioni": campioni}),
+                                 ("diffusione",   {"campioni": max(1,campioni // 10),
+                                                   "destinatari": operazioni}),
+                                 ("portata",      {"campioni": 10 * campioni})):
+            entrata.put(impacchetta(misura,"__main__","",estensioni=parametri))
+            nome,valore = sonda_benchmark.risultati.get(
+                                    timeout=ATTESA_RISPOSTA * max(1,operazioni))
+            risultato[nome] = valore
+    finally:
+        entrata.put(impacchetta("stop","__main__","gestore_pipeline"))
+        pipeline.join(ATTESA_RISPOSTA)
+        for processo in active_children():
+            processo.kill()
+    return risultato
+
+def esegui(elenco_operazioni,campioni,modalita):
+    """
+    Esegui
+
+    Esegue tutte le misure e restituisce i risultati come dizionario.
+
+    Run
+
+    Runs all the measures and returns the results as a dictionary.
+    """
+    sonda_benchmark.risultati = Queue()
+    risultati = {"python":      platform.python_version(),
+                 "piattaforma": platform.platform(),
+                 "modalita":    modalita,
+                 "campioni":    campioni,
+                 "salto":       misura_salto(campioni,modalita),
+                 "salto_locale":misura_salto_locale(campioni),
+                 "pipeline":    []}
+    with tempfile.TemporaryDirectory() as cartella:
+        for operazioni in elenco_operazioni:
+            risultati["pipeline"].append(misura_pipeline(operazioni,
+                                                         campioni,
+                                                         modalita,
+                                                         cartella))
+    return risultati
+
+# Il Gestore Pipeline importa le operazioni per nome: il modulo di ogni
+# operazione deve avere il suo nome
+# The Pipeline Manager imports the operations by name: the module of every
+# operation must have its name
+sys.modules.setdefault("eco_benchmark",  sys.modules[__name__])
+sys.modules.setdefault("sonda_benchmark",sys.modules[__name__])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del framework") # Framework benchmark
+    parser.add_argument("--operazioni",type=int,nargs="+",default=[1,10,100],
+                        help="numero di operazioni eco delle pipeline") # number of echo operations
+    parser.add_argument("--campioni",type=int,default=1000,
+                        help="campioni per ogni misura di latenza") # samples per latency measure
+    parser.add_argument("--modalita",default=MODALITA_PROCESSO,
+                        choices=(MODALITA_PROCESSO,MODALITA_THREAD),
+                        help="modalità dei Gestori Segnali") # Signal Managers mode
+    parser.add_argument("--uscita",default="-",
+                        help="file JSON dei risultati, - per lo standard output") # results JSON file
+    parser.add_argument("--soglie",action="store_true",
+                        help="termina con codice 1 se una misura supera la sua soglia") # exit with code 1 if a measure exceeds its threshold
+    argomenti = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    risultati = esegui(argomenti.operazioni,
+                       argomenti.campioni,
+                       argomenti.modalita)
+    if argomenti.uscita == "-":
+        json.dump(risultati,sys.stdout,indent=2)
+        print()
+    else:
+        with open(argomenti.uscita,"w") as f:
+            json.dump(risultati,f,indent=2)
+    if argomenti.soglie:
+        superate = regressioni(risultati)
+        for regressione in superate:
+            print("regressione: " + regressione,file=sys.stderr) # regression
+        sys.exit(1 if superate else 0)
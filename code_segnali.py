@@ -0,0 +1,559 @@
+"""
+Autore: Francesco Antonetti Lamorgese Passeri
+
+This work is licensed under the Creative Commons Attribution 4.0 International
+License. To view a copy of this license, visit
+http://creativecommons.org/licenses/by/4.0/ or send a letter to Creative
+Commons, PO Box 1866, Mountain View, CA 94042, USA.
+"""
+
+import os
+
+from collections                import deque
+from multiprocessing.connection import wait
+from queue                      import Empty,Full
+from multiprocessing            import Queue,Value
+from threading                  import Lock,Condition
+from time                       import monotonic
+
+def lettori(coda):
+    """
+    Lettori
+
+    Restituisce la lista degli oggetti su cui si può attendere che la coda
+    abbia dei dati. Per le code di multiprocessing è il capo in lettura della
+    pipe sottostante; le code del framework espongono il metodo lettori().
+
+    Readers
+
+    Returns the list of objects that can be waited on until the queue has
+    data. For multiprocessing queues it is the reading end of the underlying
+    pipe; the framework queues expose the lettori() method.
+    """
+    if hasattr(coda,"lettori"):
+        return coda.lettori()
+    return [coda._reader]
+
+class lotto(list):
+    """
+    Lotto
+
+    Gruppo di segnali che viaggia come un unico elemento di una coda. Chi legge
+    da una coda deve essere pronto a trovarvi sia segnali singoli che lotti
+    (vedi elementi()).
+
+    Batch
+
+    Group of signals travelling as a single item of a queue. Whoever reads
+    from a queue must be ready to find both single signals and batches in it
+    (see elementi()).
+    """
+
+def elementi(pacchetto):
+    """
+    Elementi
+
+    Restituisce i segnali contenuti in un elemento di una coda: quelli del
+    lotto, oppure il segnale stesso.
+
+    Items
+
+    Returns the signals contained in a queue item: the ones in the batch, or
+    the signal itself.
+    """
+    if isinstance(pacchetto,lotto):
+        return pacchetto
+    return (pacchetto,)
+
+def impacchetta_elementi(segnali):
+    """
+    Impacchetta Elementi
+
+    Restituisce l'elemento da mettere in coda per una lista di segnali: il
+    segnale stesso se è uno solo, altrimenti un lotto.
+
+    Pack Items
+
+    Returns the queue item for a list of signals: the signal itself if there
+    is only one, a batch otherwise.
+    """
+    if len(segnali) == 1:
+        return segnali[0]
+    return lotto(segnali)
+
+class insieme_attesa:
+    """
+    Insieme Attesa
+
+    Raccoglie un insieme di code e permette di sospendersi finché almeno una
+    di esse non ha dei dati, senza consumare CPU. La corrispondenza tra i
+    lettori e le code viene calcolata una sola volta, alla creazione.
+
+    Wait Set
+
+    Collects a set of queues and allows to sleep until at least one of them
+    has data, without burning CPU. The mapping between readers and queues is
+    computed only once, on creation.
+    """
+    def __init__(self,code):
+        self.code   = list(code)
+        self.indice = {}
+        for coda in self.code:
+            for lettore in lettori(coda):
+                self.indice[lettore] = coda
+        self.lettori = list(self.indice)
+    def attendi(self,timeout=None):
+        """
+        Attendi
+
+        Si sospende finché almeno una coda non è pronta o finché non scade il
+        timeout. Restituisce le code pronte, nell'ordine in cui sono state
+        registrate (lista vuota allo scadere del timeout).
+
+        Wait
+
+        Sleeps until at least one queue is ready or the timeout expires.
+        Returns the ready queues, in registration order (empty list on
+        timeout).
+        """
+        pronti = wait(self.lettori,timeout)
+        if not pronti:
+            return []
+        pronte = {id(self.indice[lettore]) for lettore in pronti}
+        return [coda for coda in self.code if id(coda) in pronte]
+
+def attendi_code(code,timeout=None):
+    """
+    Attendi Code
+
+    Scorciatoia per un'attesa singola su un insieme di code.
+
+    Wait Queues
+
+    Shortcut for a one-off wait on a set of queues.
+    """
+    return insieme_attesa(code).attendi(timeout)
+
+class coda_locale:
+    """
+    Coda Locale
+
+    Coda per la comunicazione tra thread dello stesso processo, con la stessa
+    interfaccia delle code di multiprocessing usata dal framework. Gli
+    elementi non vengono serializzati. Una pipe contiene un byte finché la
+    coda non è vuota, così che la coda possa essere attesa insieme alle code
+    di multiprocessing.
+
+    Deve essere creata nel processo che la usa.
+
+    Local Queue
+
+    Queue for communication between threads of the same process, with the
+    same interface of the multiprocessing queues used by the framework. Items
+    are not serialized. A pipe holds one byte while the queue is not empty, so
+    that the queue can be waited on together with multiprocessing queues.
+
+    It must be created in the process that uses it.
+    """
+    def __init__(self,maxsize=0):
+        self.maxsize    = maxsize
+        self._elementi  = deque()
+        self._lock      = Lock()
+        self._spazio    = Condition(self._lock)
+        self._lettore,self._scrittore = os.pipe()
+    def __del__(self):
+        try:
+            os.close(self._lettore)
+            os.close(self._scrittore)
+        except (AttributeError,OSError):
+            pass
+    def lettori(self):
+        return [self._lettore]
+    def qsize(self):
+        return len(self._elementi)
+    def empty(self):
+        return not self._elementi
+    def full(self):
+        return 0 < self.maxsize <= len(self._elementi)
+    def put(self,elemento,block=True,timeout=None):
+        with self._lock:
+            while 0 < self.maxsize <= len(self._elementi):
+                if not block or not self._spazio.wait(timeout):
+                    raise Full
+            # L'elemento va inserito prima del byte: os.write rilascia il GIL
+            # e chi si risveglia senza trovarlo riattende sul byte già
+            # scritto, in un'attesa attiva
+            # The item must be inserted before the byte: os.write releases
+            # the GIL and whoever wakes up without finding it waits again on
+            # the byte already written, in a busy wait
+            self._elementi.append(elemento)
+            if len(self._elementi) == 1:
+                os.write(self._scrittore,b"\0")
+    def put_nowait(self,elemento):
+        self.put(elemento,False)
+    def get(self,block=True,timeout=None):
+        scadenza = None if timeout is None else monotonic() + timeout
+        while True:
+            with self._lock:
+                if self._elementi:
+                    elemento = self._elementi.popleft()
+                    if not self._elementi:
+                        os.read(self._lettore,1)
+                    if self.maxsize > 0:
+                        self._spazio.notify()
+                    return elemento
+            if not block:
+                raise Empty
+            if scadenza is None:
+                wait([self._lettore])
+            else:
+                rimanente = scadenza - monotonic()
+                if rimanente <= 0 or not wait([self._lettore],rimanente):
+                    raise Empty
+    def get_nowait(self):
+        return self.get(False)
+
+# Politiche di una coda limitata piena: blocca il produttore, scarta il segnale
+# più vecchio in coda, scarta il nuovo segnale, scarta il nuovo segnale e chiedi
+# al mittente di rallentare
+# Policies of a full bounded queue: block the producer, drop the oldest queued
+# signal, drop the new signal, drop the new signal and ask the sender to slow
+# down
+POLITICA_BLOCCA           = "blocca"
+POLITICA_SCARTA_VECCHI    = "scarta_vecchi"
+POLITICA_SCARTA_NUOVI     = "scarta_nuovi"
+POLITICA_RALLENTA         = "rallenta"
+POLITICHE                 = (POLITICA_BLOCCA,
+                             POLITICA_SCARTA_VECCHI,
+                             POLITICA_SCARTA_NUOVI,
+                             POLITICA_RALLENTA)
+# Tempo massimo per cui un produttore resta bloccato su una coda piena prima
+# che il segnale venga scartato
+# Maximum time a producer stays blocked on a full queue before the signal is
+# dropped
+ATTESA_MASSIMA_INSERIMENTO = 1.0
+
+def incrementa(contatore,quantita=1):
+    """Incrementa un contatore condiviso - Increments a shared counter"""
+    with contatore.get_lock():
+        contatore.value += quantita
+
+class coda_limitata:
+    """
+    Coda Limitata
+
+    Coda con capacità massima (in elementi; un lotto conta come un elemento)
+    e politica da applicare quando è piena. Con capacità nulla la coda è
+    illimitata. Offre l'interfaccia delle code di multiprocessing; i segnali
+    vanno però inseriti con inserisci(), che applica la politica e conta gli
+    eventi di coda piena e i segnali scartati. Può essere una coda di
+    multiprocessing o, per i thread di uno stesso processo, una coda locale.
+
+    Il produttore non deve tenere un lock condiviso con il consumatore mentre
+    inserisce: con la politica blocca resterebbe bloccato insieme a lui.
+
+    Bounded Queue
+
+    Queue with a maximum capacity (in items; a batch counts as one item) and
+    a policy to apply when it is full. With zero capacity the queue is
+    unbounded. It offers the interface of multiprocessing queues; signals must
+    however be inserted with inserisci(), which applies the policy and counts
+    the queue full events and the dropped signals. It can be a
+    multiprocessing queue or, for threads of the same process, a local queue.
+
+    The producer must not hold a lock shared with the consumer while
+    inserting: with the blocca policy it would stay blocked together with it.
+    """
+    def __init__(self,capacita=0,politica=POLITICA_BLOCCA,locale=False):
+        if politica not in POLITICHE:
+            raise ValueError("Politica coda non valida: " + str(politica)) # Invalid queue policy
+        self.capacita = int(capacita)
+        self.politica = politica
+        self.coda     = coda_locale(self.capacita) if locale \
+                        else Queue(self.capacita)
+        # Contatori degli eventi di coda piena e dei segnali scartati
+        # Counters of queue full events and of dropped signals
+        self.pieno    = Value("Q",0)
+        self.scartati = Value("Q",0)
+    def lettori(self):
+        return lettori(self.coda)
+    def qsize(self):
+        return self.coda.qsize()
+    def empty(self):
+        return self.coda.empty()
+    def full(self):
+        return self.coda.full()
+    def put(self,elemento,block=True,timeout=None):
+        self.coda.put(elemento,block,timeout)
+    def put_nowait(self,elemento):
+        self.coda.put_nowait(elemento)
+    def get(self,block=True,timeout=None):
+        return self.coda.get(block,timeout)
+    def get_nowait(self):
+        return self.coda.get_nowait()
+    def inserisci(self,elemento):
+        """
+        Inserisci
+
+        Inserisce un elemento applicando la politica della coda. Restituisce
+        False se l'elemento è stato scartato.
+
+        Insert
+
+        Inserts an item applying the queue policy. Returns False if the item
+        has been dropped.
+        """
+        try:
+            self.coda.put_nowait(elemento)
+            return True
+        except Full:
+            pass
+        incrementa(self.pieno)
+        if self.politica == POLITICA_BLOCCA:
+            try:
+                self.coda.put(elemento,True,ATTESA_MASSIMA_INSERIMENTO)
+                return True
+            except Full:
+                pass
+        elif self.politica == POLITICA_SCARTA_VECCHI:
+            try:
+                self.coda.get_nowait()
+                incrementa(self.scartati)
+            except Empty:
+                pass
+            try:
+                self.coda.put_nowait(elemento)
+                return True
+            except Full:
+                pass
+        incrementa(self.scartati)
+        return False
+
+# Priorità dei segnali: la corsia 0 è servita per prima. I segnali di
+# controllo e di sistema vanno nella corsia 0, tutti gli altri, se
+# pipeline.conf non dice diversamente, nella corsia predefinita
+# Signal priorities: lane 0 is served first. Control and system signals go in
+# lane 0, all the others, unless pipeline.conf says otherwise, in the default
+# lane
+PRIORITA_CONTROLLO        = 0
+PRIORITA_PREDEFINITA      = 1
+SEGNALI_CONTROLLO         = ("stop",
+                             "ferma",
+                             "termina",
+                             "sospendi",
+                             "uccidi",
+                             "avvia",
+                             "rallenta",
+                             "statistiche",
+                             "profila")
+PRIORITA_SEGNALI          = {segnale: PRIORITA_CONTROLLO \
+                             for segnale in SEGNALI_CONTROLLO}
+# Estensione che sceglie la corsia di un singolo segnale, al posto di quella
+# del suo nome
+# Extension choosing the lane of a single signal, instead of the one of its
+# name
+CHIAVE_PRIORITA           = "priorita"
+# Numero di elementi che una corsia non vuota può lasciar passare avanti alle
+# corsie più prioritarie prima di essere servita comunque
+# Number of items a non empty lane can let the higher priority lanes serve
+# ahead of it before being served anyway
+SOGLIA_PRECEDENZA         = 16
+
+class coda_priorita:
+    """
+    Coda Priorità
+
+    Coda a più corsie, una coda limitata ciascuna, con la stessa interfaccia
+    delle code limitate. Ogni segnale va nella corsia della sua priorità
+    (indicata dall'estensione "priorita" o, se manca, dal suo nome) e un lotto
+    viene diviso tra le corsie dei suoi segnali; i segnali di una stessa
+    corsia restano in ordine. Le letture servono prima la corsia 0, poi le
+    successive, ma una corsia non vuota scavalcata per soglia elementi viene
+    servita comunque. Gli elementi già codificati (i messaggi sulle code IPC)
+    vanno inseriti indicando la corsia (vedi inserisci()).
+
+    La capacità vale per ogni corsia; i contatori degli eventi di coda piena e
+    dei segnali scartati sono comuni a tutte. Le letture devono venire da un
+    solo consumatore.
+
+    Priority Queue
+
+    Queue with many lanes, a bounded queue each, with the same interface of
+    the bounded queues. Every signal goes in the lane of its priority (given
+    by the "priorita" extension or, if missing, by its name) and a batch is
+    split across the lanes of its signals; signals of the same lane stay in
+    order. Reads serve lane 0 first, then the following ones, but a non empty
+    lane skipped for soglia items is served anyway. Already encoded items
+    (the messages on the IPC queues) must be inserted giving the lane (see
+    inserisci()).
+
+    The capacity holds for every lane; the counters of queue full events and
+    of dropped signals are shared by all of them. Reads must come from a
+    single consumer.
+    """
+    def __init__(self,
+                 capacita = 0,
+                 politica = POLITICA_BLOCCA,
+                 locale   = False,
+                 priorita = None,
+                 soglia   = SOGLIA_PRECEDENZA):
+        self.priorita = dict(PRIORITA_SEGNALI if priorita is None \
+                             else priorita)
+        self.capacita = int(capacita)
+        self.politica = politica
+        self.soglia   = max(1,int(soglia))
+        numero        = max([PRIORITA_PREDEFINITA] + \
+                            list(self.priorita.values())) + 1
+        self.corsie   = [coda_limitata(capacita,politica,locale) \
+                         for _ in range(numero)]
+        self.pieno    = self.corsie[0].pieno
+        self.scartati = self.corsie[0].scartati
+        for corsia in self.corsie[1:]:
+            corsia.pieno,corsia.scartati = self.pieno,self.scartati
+        # Elementi serviti da altre corsie mentre ciascuna non era vuota
+        # Items served by other lanes while each one was not empty
+        self.saltati  = [0] * numero
+    def __getstate__(self):
+        stato = dict(self.__dict__)
+        stato["saltati"] = [0] * len(self.corsie)
+        return stato
+    def corsia(self,segnale,estensioni=None):
+        """
+        Corsia di un segnale, dal nome e dalle estensioni
+        Lane of a signal, from the name and the extensions
+        """
+        if estensioni and CHIAVE_PRIORITA in estensioni:
+            numero = int(estensioni[CHIAVE_PRIORITA])
+        else:
+            numero = self.priorita.get(segnale,PRIORITA_PREDEFINITA)
+        return min(max(numero,0),len(self.corsie) - 1)
+    def corsia_elemento(self,elemento):
+        """
+        Corsia di un segnale non codificato; quella predefinita per gli altri
+        elementi
+
+        Lane of a non encoded signal; the default one for the other items
+        """
+        if isinstance(elemento,(list,tuple)) and elemento and \
+           isinstance(elemento[0],str):
+            estensioni = elemento[-1] if isinstance(elemento[-1],dict) \
+                         else None
+            return self.corsia(elemento[0],estensioni)
+        return min(PRIORITA_PREDEFINITA,len(self.corsie) - 1)
+    def lettori(self):
+        return [lettore for corsia in self.corsie \
+                for lettore in corsia.lettori()]
+    def qsize(self):
+        return sum(corsia.qsize() for corsia in self.corsie)
+    def empty(self):
+        return all(corsia.empty() for corsia in self.corsie)
+    def full(self):
+        return any(corsia.full() for corsia in self.corsie)
+    def put(self,elemento,block=True,timeout=None):
+        self.corsie[self.corsia_elemento(elemento)].put(elemento,block,timeout)
+    def put_nowait(self,elemento):
+        self.put(elemento,False)
+    def get(self,block=True,timeout=None):
+        scadenza = None if timeout is None else monotonic() + timeout
+        while True:
+            try:
+                return self.get_nowait()
+            except Empty:
+                pass
+            if not block:
+                raise Empty
+            rimanente = None
+            if scadenza is not None:
+                rimanente = scadenza - monotonic()
+                if rimanente <= 0:
+                    raise Empty
+            wait(self.lettori(),rimanente)
+    def get_nowait(self):
+        """
+        Preleva un elemento dalla corsia più prioritaria non vuota, o dalla
+        prima corsia non vuota scavalcata troppe volte
+
+        Takes an item from the highest priority non empty lane, or from the
+        first non empty lane skipped too many times
+        """
+        piene = [numero for numero,corsia in enumerate(self.corsie) \
+                 if not corsia.empty()]
+        if not piene:
+            raise Empty
+        scelta = next((numero for numero in piene[1:] \
+                       if self.saltati[numero] >= self.soglia),piene[0])
+        elemento = self.corsie[scelta].get_nowait()
+        self.saltati[scelta] = 0
+        for numero in piene:
+            if numero > scelta:
+                self.saltati[numero] += 1
+        return elemento
+    def inserisci(self,elemento,corsia=None):
+        """
+        Inserisci
+
+        Inserisce un elemento nella corsia indicata o, se manca, in quella dei
+        suoi segnali, applicando la politica della coda. Restituisce False se
+        almeno un segnale è stato scartato.
+
+        Insert
+
+        Inserts an item in the given lane or, if missing, in the one of its
+        signals, applying the queue policy. Returns False if at least one
+        signal has been dropped.
+        """
+        if corsia is not None:
+            return self.corsie[min(max(corsia,0),len(self.corsie) - 1)]\
+                       .inserisci(elemento)
+        if not isinstance(elemento,lotto):
+            return self.corsie[self.corsia_elemento(elemento)]\
+                       .inserisci(elemento)
+        gruppi = {}
+        for segnale in elemento:
+            gruppi.setdefault(self.corsia_elemento(segnale),[]).append(segnale)
+        if len(gruppi) == 1:
+            return self.corsie[next(iter(gruppi))].inserisci(elemento)
+        esito = True
+        for numero in sorted(gruppi):
+            if not self.corsie[numero].inserisci(
+                                        impacchetta_elementi(gruppi[numero])):
+                esito = False
+        return esito
+
+def corsia_segnale(coda,segnale,estensioni=None):
+    """
+    Corsia Segnale
+
+    Corsia di un segnale in una coda a priorità, None per le altre code.
+
+    Signal Lane
+
+    Lane of a signal in a priority queue, None for the other queues.
+    """
+    if isinstance(coda,coda_priorita):
+        return coda.corsia(segnale,estensioni)
+    return None
+
+def inserisci(coda,elemento,corsia=None):
+    """
+    Inserisci
+
+    Inserisce un elemento in una coda qualsiasi: applica la politica se è una
+    coda limitata (o un'altra coda con un proprio metodo inserisci(), come i
+    canali remoti), altrimenti lo inserisce senza attendere. La corsia conta
+    solo per le code a priorità. Restituisce False se l'elemento è stato
+    scartato.
+
+    Insert
+
+    Inserts an item in any queue: applies the policy if it is a bounded
+    queue (or another queue with its own inserisci() method, like the remote
+    channels), otherwise inserts it without waiting. The lane only matters
+    for the priority queues. Returns False if the item has been dropped.
+    """
+    if isinstance(coda,coda_priorita):
+        return coda.inserisci(elemento,corsia)
+    if isinstance(coda,coda_limitata) or hasattr(coda,"inserisci"):
+        return coda.inserisci(elemento)
+    coda.put_nowait(elemento)
+    return True
@@ -0,0 +1,420 @@
+"""
+Autore: Francesco Antonetti Lamorgese Passeri
+
+This work is licensed under the Creative Commons Attribution 4.0 International
+License. To view a copy of this license, visit
+http://creativecommons.org/licenses/by/4.0/ or send a letter to Creative
+Commons, PO Box 1866, Mountain View, CA 94042, USA.
+
+Formato Segnale
+
+Formato binario dei segnali scambiati tra i Gestori Segnali. Ogni segnale è
+una trama con un'intestazione a larghezza fissa:
+
+    versione     (1 byte)
+    flag         (1 byte)
+    segnale      (2 byte, ID del nome)
+    mittente     (2 byte, ID del nome)
+    destinatario (2 byte, ID del nome)
+    timestamp    (8 byte, float)
+
+seguita dai nomi non registrati (2 byte di lunghezza + UTF-8, nell'ordine
+segnale, mittente, destinatario) e, se il flag ESTENSIONI è attivo, dal blocco
+delle estensioni. Più trame possono viaggiare in un unico messaggio, un lotto:
+un'intestazione con versione, flag LOTTO e numero di trame, seguita dalle trame
+precedute dalla loro lunghezza. I nomi delle operazioni e dei segnali sono
+registrati in una tabella comune: la tabella va completata prima di avviare i
+processi, così che tutti i processi la ereditino identica.
+
+Signal Format
+
+Binary format of the signals exchanged between the Signal Managers. Every
+signal is a frame with a fixed width header (see above), followed by the names
+that are not registered (2 byte length + UTF-8, in the order signal, sender,
+recipient) and, if the ESTENSIONI flag is set, by the extensions block. Many
+frames can travel in a single message, a batch: a header with version, LOTTO
+flag and number of frames, followed by the frames preceded by their length.
+The names of operations and signals are registered in a common table: the
+table must be completed before starting the processes, so that every process
+inherits it unchanged.
+"""
+
+import struct
+
+from time import time
+
+VERSIONE              = 1
+
+# Flag dell'intestazione
+# Header flags
+FLAG_ESTENSIONI       = 0x01
+FLAG_LOTTO            = 0x80
+
+INTESTAZIONE          = struct.Struct(">BBHHHd")
+INTESTAZIONE_LOTTO    = struct.Struct(">BBI")
+LUNGHEZZA             = struct.Struct(">H")
+LUNGHEZZA_LUNGA       = struct.Struct(">I")
+INTERO                = struct.Struct(">q")
+REALE                 = struct.Struct(">d")
+
+# ID riservato ai nomi non registrati, trasmessi per esteso
+# ID reserved to unregistered names, sent in full
+NOME_ESTESO           = 0xFFFF
+
+# Limiti del formato: lunghezza in byte di un nome non registrato e della
+# chiave di un'estensione, numero di estensioni, intervallo degli interi
+# Format limits: length in bytes of an unregistered name and of an extension
+# key, number of extensions, range of the integers
+LUNGHEZZA_MASSIMA_NOME   = 0xFFFF
+LUNGHEZZA_MASSIMA_CHIAVE = 0xFF
+ESTENSIONI_MASSIME       = 0xFFFF
+INTERO_MINIMO            = -(1 << 63)
+INTERO_MASSIMO           = (1 << 63) - 1
+
+# Tipi dei valori delle estensioni
+# Types of the extensions values
+TIPO_NULLO            = 0
+TIPO_INTERO           = 1
+TIPO_REALE            = 2
+TIPO_TESTO            = 3
+TIPO_BYTE             = 4
+TIPO_BOOLEANO         = 5
+
+# Nomi noti a tutti i processi del framework. L'ID di un nome è la sua
+# posizione nella tabella: l'ID 0 è la stringa vuota (broadcast)
+# Names known to every framework process. The ID of a name is its position in
+# the table: ID 0 is the empty string (broadcast)
+NOMI_PREDEFINITI      = ("",
+                         "gestore_segnali",
+                         "gestore_pipeline",
+                         "__main__",
+                         "idle",
+                         "avvia",
+                         "avviato",
+                         "pronto",
+                         "stop",
+                         "ferma",
+                         "termina",
+                         "terminato",
+                         "sospendi",
+                         "uccidi",
+                         "lista_operazioni",
+                         "segnale mal formato",
+                         "segnale non valido",
+                         "rallenta")
+
+nomi                  = list(NOMI_PREDEFINITI)
+id_nomi               = {nome: i for i,nome in enumerate(nomi)}
+
+class segnale_mal_formato(ValueError):
+    """
+    Sollevata quando una trama non può essere decodificata
+    Raised when a frame cannot be decoded
+    """
+
+class segnale_non_codificabile(ValueError):
+    """
+    Sollevata quando un segnale non può essere codificato
+    Raised when a signal cannot be encoded
+    """
+
+def registra_nomi(nuovi_nomi):
+    """
+    Registra Nomi
+
+    Aggiunge dei nomi alla tabella dei nomi registrati. Va chiamata prima di
+    avviare i processi che si scambiano i segnali.
+
+    Register Names
+
+    Adds names to the registered names table. It must be called before
+    starting the processes that exchange signals.
+    """
+    for nome in nuovi_nomi:
+        nome = str(nome)
+        if nome not in id_nomi and len(nomi) < NOME_ESTESO:
+            id_nomi[nome] = len(nomi)
+            nomi.append(nome)
+
+def _chiave(chiave):
+    chiave = str(chiave).encode()
+    if len(chiave) > LUNGHEZZA_MASSIMA_CHIAVE:
+        raise segnale_non_codificabile("Chiave estensione troppo lunga: " + # Extension key too long
+                                       repr(chiave[:32]) + "...")
+    return chiave
+
+def verifica_estensioni(estensioni):
+    """
+    Verifica Estensioni
+
+    Solleva segnale_non_codificabile se le estensioni non possono viaggiare
+    nel formato binario: i valori ammessi sono None, bool, interi a 64 bit,
+    float, str e bytes, e le chiavi non superano i 255 byte. Le liste e i
+    dizionari vanno codificati, per esempio in JSON.
+
+    Check Extensions
+
+    Raises segnale_non_codificabile if the extensions cannot travel in the
+    binary format: the allowed values are None, bool, 64 bit integers,
+    float, str and bytes, and the keys do not exceed 255 bytes. Lists and
+    dictionaries must be encoded, for instance as JSON.
+    """
+    if len(estensioni) > ESTENSIONI_MASSIME:
+        raise segnale_non_codificabile("Troppe estensioni: " + # Too many extensions
+                                       str(len(estensioni)))
+    for chiave,valore in estensioni.items():
+        _chiave(chiave)
+        _tipo(chiave,valore)
+
+def _tipo(chiave,valore):
+    if valore is None:
+        return TIPO_NULLO
+    if isinstance(valore,bool):
+        return TIPO_BOOLEANO
+    if isinstance(valore,int):
+        if not INTERO_MINIMO <= valore <= INTERO_MASSIMO:
+            raise segnale_non_codificabile("Estensione " + str(chiave) + \
+                                           ": intero fuori dai 64 bit") # integer out of 64 bits
+        return TIPO_INTERO
+    if isinstance(valore,float):
+        return TIPO_REALE
+    if isinstance(valore,(bytes,bytearray,memoryview)):
+        return TIPO_BYTE
+    if isinstance(valore,str):
+        return TIPO_TESTO
+    raise segnale_non_codificabile("Estensione " + str(chiave) + \
+                                   ": tipo non ammesso " + # type not allowed
+                                   type(valore).__name__)
+
+def _impacchetta_estensioni(estensioni):
+    if len(estensioni) > ESTENSIONI_MASSIME:
+        raise segnale_non_codificabile("Troppe estensioni: " + # Too many extensions
+                                       str(len(estensioni)))
+    parti = [LUNGHEZZA.pack(len(estensioni))]
+    for chiave,valore in estensioni.items():
+        codificata = _chiave(chiave)
+        tipo       = _tipo(chiave,valore)
+        parti.append(bytes((len(codificata),)))
+        parti.append(codificata)
+        if tipo == TIPO_NULLO:
+            parti.append(bytes((TIPO_NULLO,)))
+        elif tipo == TIPO_BOOLEANO:
+            parti.append(bytes((TIPO_BOOLEANO,int(valore))))
+        elif tipo == TIPO_INTERO:
+            parti.append(bytes((TIPO_INTERO,)))
+            parti.append(INTERO.pack(valore))
+        elif tipo == TIPO_REALE:
+            parti.append(bytes((TIPO_REALE,)))
+            parti.append(REALE.pack(valore))
+        else:
+            valore = bytes(valore) if tipo == TIPO_BYTE else valore.encode()
+            parti.append(bytes((tipo,)))
+            parti.append(LUNGHEZZA_LUNGA.pack(len(valore)))
+            parti.append(valore)
+    return b"".join(parti)
+
+def _leggi(dati,posizione,lunghezza):
+    fine = posizione + lunghezza
+    if fine > len(dati):
+        raise segnale_mal_formato("Trama troncata") # Truncated frame
+    return bytes(dati[posizione:fine]),fine
+
+def _spacchetta_estensioni(dati,posizione):
+    estensioni = {}
+    (numero,)  = LUNGHEZZA.unpack_from(dati,posizione)
+    posizione += LUNGHEZZA.size
+    for _ in range(numero):
+        lunghezza  = dati[posizione]
+        chiave,posizione = _leggi(dati,posizione + 1,lunghezza)
+        chiave     = chiave.decode()
+        tipo       = dati[posizione]
+        posizione += 1
+        if tipo == TIPO_NULLO:
+            valore = None
+        elif tipo == TIPO_BOOLEANO:
+            valore     = bool(dati[posizione])
+            posizione += 1
+        elif tipo == TIPO_INTERO:
+            (valore,)  = INTERO.unpack_from(dati,posizione)
+            posizione += INTERO.size
+        elif tipo == TIPO_REALE:
+            (valore,)  = REALE.unpack_from(dati,posizione)
+            posizione += REALE.size
+        elif tipo in (TIPO_TESTO,TIPO_BYTE):
+            (lunghezza,) = LUNGHEZZA_LUNGA.unpack_from(dati,posizione)
+            valore,posizione = _leggi(dati,posizione + LUNGHEZZA_LUNGA.size,
+                                      lunghezza)
+            if tipo == TIPO_TESTO:
+                valore = valore.decode()
+        else:
+            raise segnale_mal_formato("Tipo estensione sconosciuto: " + \
+                                      str(tipo)) # Unknown extension type
+        estensioni[chiave] = valore
+    return estensioni,posizione
+
+def impacchetta(segnale,mittente,destinatario,timestamp=None,estensioni=None):
+    """
+    Impacchetta
+
+    Codifica un segnale in una trama binaria. Solleva
+    segnale_non_codificabile se un nome o le estensioni superano i limiti del
+    formato (vedi verifica_estensioni).
+
+    Pack
+
+    Encodes a signal into a binary frame. Raises segnale_non_codificabile if
+    a name or the extensions exceed the format limits (see
+    verifica_estensioni).
+    """
+    if timestamp is None:
+        timestamp = time()
+    flag   = FLAG_ESTENSIONI if estensioni else 0
+    estesi = []
+    ids    = []
+    for nome in (segnale,mittente,destinatario):
+        i = id_nomi.get(nome)
+        if i is None:
+            try:
+                nome = str(nome).encode()
+            except UnicodeEncodeError as e:
+                raise segnale_non_codificabile(str(e))
+            if len(nome) > LUNGHEZZA_MASSIMA_NOME:
+                raise segnale_non_codificabile("Nome troppo lungo: " + # Name too long
+                                               repr(nome[:32]) + "...")
+            estesi.append(LUNGHEZZA.pack(len(nome)))
+            estesi.append(nome)
+            i = NOME_ESTESO
+        ids.append(i)
+    trama = INTESTAZIONE.pack(VERSIONE,flag,ids[0],ids[1],ids[2],
+                              float(timestamp))
+    if estesi:
+        trama += b"".join(estesi)
+    if flag & FLAG_ESTENSIONI:
+        try:
+            trama += _impacchetta_estensioni(estensioni)
+        except UnicodeEncodeError as e:
+            raise segnale_non_codificabile(str(e))
+    return trama
+
+def spacchetta(dati):
+    """
+    Spacchetta
+
+    Decodifica una trama e restituisce il segnale come lista
+    [segnale,mittente,destinatario,timestamp], con in coda il dizionario delle
+    estensioni se presenti. Per compatibilità accetta anche il vecchio formato
+    testuale "segnale:timestamp:mittente[:destinatario]".
+
+    Unpack
+
+    Decodes a frame and returns the signal as a list
+    [signal,sender,recipient,timestamp], followed by the extensions dictionary
+    if there are any. For compatibility it also accepts the old text format
+    "signal:timestamp:sender[:recipient]".
+    """
+    if isinstance(dati,str):
+        return spacchetta_testo(dati)
+    try:
+        versione,flag,id_segnale,id_mittente,id_destinatario,timestamp = \
+                                                INTESTAZIONE.unpack_from(dati)
+        if versione != VERSIONE:
+            raise segnale_mal_formato("Versione non supportata: " + \
+                                      str(versione)) # Unsupported version
+        posizione = INTESTAZIONE.size
+        campi     = []
+        for i in (id_segnale,id_mittente,id_destinatario):
+            if i == NOME_ESTESO:
+                (lunghezza,) = LUNGHEZZA.unpack_from(dati,posizione)
+                nome,posizione = _leggi(dati,posizione + LUNGHEZZA.size,
+                                        lunghezza)
+                campi.append(nome.decode())
+            else:
+                campi.append(nomi[i])
+        campi.append(timestamp)
+        if flag & FLAG_ESTENSIONI:
+            estensioni,posizione = _spacchetta_estensioni(dati,posizione)
+            campi.append(estensioni)
+    except (struct.error,IndexError,UnicodeDecodeError) as e:
+        raise segnale_mal_formato(str(e))
+    return campi
+
+def spacchetta_testo(pacchetto_segnale):
+    """
+    Spacchetta Testo
+
+    Decodifica un segnale nel vecchio formato testuale.
+
+    Unpack Text
+
+    Decodes a signal in the old text format.
+    """
+    segnale_spacchettato = pacchetto_segnale.split(":")
+    if len(segnale_spacchettato) == 4:
+        segnale,timestamp,mittente,destinatario = segnale_spacchettato
+    elif len(segnale_spacchettato) == 3:
+        segnale,timestamp,mittente = segnale_spacchettato
+        destinatario               = ""
+    else:
+        raise segnale_mal_formato(pacchetto_segnale)
+    try:
+        timestamp = float(timestamp)
+    except ValueError:
+        raise segnale_mal_formato(pacchetto_segnale)
+    return [segnale,mittente,destinatario,timestamp]
+
+def impacchetta_lotto(trame):
+    """
+    Impacchetta Lotto
+
+    Riunisce più trame in un unico messaggio. Una sola trama viene restituita
+    così com'è.
+
+    Pack Batch
+
+    Joins many frames in a single message. A single frame is returned as it
+    is.
+    """
+    if len(trame) == 1:
+        return trame[0]
+    parti = [INTESTAZIONE_LOTTO.pack(VERSIONE,FLAG_LOTTO,len(trame))]
+    for trama in trame:
+        parti.append(LUNGHEZZA_LUNGA.pack(len(trama)))
+        parti.append(trama)
+    return b"".join(parti)
+
+def spacchetta_messaggio(dati):
+    """
+    Spacchetta Messaggio
+
+    Decodifica un messaggio, sia esso una trama singola, un lotto o un
+    segnale nel vecchio formato testuale, e restituisce la lista dei segnali
+    che contiene.
+
+    Unpack Message
+
+    Decodes a message, be it a single frame, a batch or a signal in the old
+    text format, and returns the list of signals it contains.
+    """
+    if isinstance(dati,str):
+        return [spacchetta_testo(dati)]
+    if len(dati) < 2 or not dati[1] & FLAG_LOTTO:
+        return [spacchetta(dati)]
+    try:
+        versione,flag,numero = INTESTAZIONE_LOTTO.unpack_from(dati)
+    except struct.error as e:
+        raise segnale_mal_formato(str(e))
+    if versione != VERSIONE:
+        raise segnale_mal_formato("Versione non supportata: " + \
+                                  str(versione)) # Unsupported version
+    vista     = memoryview(dati)
+    posizione = INTESTAZIONE_LOTTO.size
+    segnali   = []
+    for _ in range(numero):
+        try:
+            (lunghezza,) = LUNGHEZZA_LUNGA.unpack_from(dati,posizione)
+        except struct.error as e:
+            raise segnale_mal_formato(str(e))
+        posizione   += LUNGHEZZA_LUNGA.size
+        segnali.append(spacchetta(vista[posizione:posizione + lunghezza]))
+        posizione   += lunghezza
+    return segnali
@@ -7,17 +7,271 @@ http://creativecommons.org/licenses/by/4.0/ or send a letter to Creative
 Commons, PO Box 1866, Mountain View, CA 94042, USA.
 """
 
+import json
 import logging
 
-from multiprocessing import Queue,Lock
-from time            import time,sleep
+import threading
+
+from multiprocessing import Queue,Lock,get_start_method
+from queue           import Empty
+from time            import time,sleep,monotonic
 from importlib       import import_module
+from multiprocessing import active_children
+from zlib            import crc32
 
 #Framework
 from oggetto         import oggetto
-from gestore_segnali import gestore_segnali
+from gestore_segnali import gestore_segnali,MODALITA_PROCESSO,MODALITA_THREAD
+from code_segnali    import insieme_attesa,elementi,\
+                            impacchetta_elementi,coda_priorita,inserisci,\
+                            POLITICA_BLOCCA,POLITICA_RALLENTA,\
+                            PRIORITA_SEGNALI,PRIORITA_CONTROLLO,\
+                            PRIORITA_PREDEFINITA,CHIAVE_PRIORITA
+from formato_segnale import registra_nomi
+from memoria_condivisa import pool_memoria
+from oggetto_asincrono import ciclo_condiviso
+from registro        import imposta_livello,imposta_campionamento
+from profilatore     import SEGNALE_PROFILA
+from trasporto       import canale_remoto,operazione_remota,indirizzo,chiave
+from giornale        import giornale,SEGNALE_CONFERMA,CHIAVE_SEQUENZA,\
+                            DIMENSIONE_SEGMENTO,INTERVALLO_COMMIT,\
+                            INTERVALLO_CHECKPOINT
+from tracciamento    import attiva_tracciamento,tracciamento_attivo,\
+                            registra_segnale,esporta_chrome,EVENTI
+from metriche        import metriche,scrivi_istantanee,SEGNALE_STATISTICHE,\
+                            CHIAVE_METRICHE
+from avvio           import metodo_avvio,ricarica_modulo,vivo,processo_esterno
+from richieste       import richiesta,estensioni_risposta,SEGNALE_RISPOSTA,\
+                            CHIAVE_CORRELAZIONE
 
 ATTESA_CICLO_PRINCIPALE = 0.001
+# Tempo massimo di sospensione in attesa di segnali
+# Maximum sleep time while waiting for signals
+ATTESA_MASSIMA          = 1.0
+# Separatore tra il nome dell'operazione e il numero della replica
+# Separator between the operation name and the replica number
+SEPARATORE_REPLICA        = "#"
+# Politiche di bilanciamento dei segnali tra le repliche di un'operazione
+# Balancing policies of the signals across the replicas of an operation
+BILANCIAMENTO_ROUND_ROBIN = "round_robin"
+BILANCIAMENTO_CODA_MINIMA = "coda_minima"
+BILANCIAMENTO_AFFINITA    = "affinita"
+BILANCIAMENTI             = (BILANCIAMENTO_ROUND_ROBIN,
+                             BILANCIAMENTO_CODA_MINIMA,
+                             BILANCIAMENTO_AFFINITA)
+# Estensione con la chiave per il bilanciamento per affinità
+# Extension with the key for affinity balancing
+CHIAVE_AFFINITA           = "chiave"
+# Intervallo predefinito tra due istantanee delle metriche su file
+# Default interval between two metrics snapshots on file
+INTERVALLO_STATISTICHE    = 10.0
+# Tempo massimo di attesa del segnale di pronto delle operazioni
+# Maximum wait time for the operations' ready report
+ATTESA_PRONTO           = 10.0
+# Segnali di controllo che aggiungono, rimuovono e sostituiscono
+# un'operazione con la pipeline avviata, e loro estensioni
+# Control signals adding, removing and replacing an operation with the
+# pipeline started, and their extensions
+SEGNALE_AGGIUNGI          = "aggiungi_operazione"
+SEGNALE_RIMUOVI           = "rimuovi_operazione"
+SEGNALE_SOSTITUISCI       = "sostituisci_operazione"
+SEGNALI_OPERAZIONI        = (SEGNALE_AGGIUNGI,SEGNALE_RIMUOVI,SEGNALE_SOSTITUISCI)
+CHIAVE_OPERAZIONE         = "operazione"
+CHIAVE_REPLICHE           = "repliche"
+CHIAVE_SUCCESSORI         = "successori"
+CHIAVE_PREDECESSORI       = "predecessori"
+# Tempo massimo per smaltire i segnali di un'operazione rimossa, e tempo per
+# cui le sue code devono restare vuote dopo la sua fine prima di staccarla
+# Maximum time to drain the signals of a removed operation, and time its
+# queues must stay empty after its end before detaching it
+ATTESA_DRENAGGIO          = 30.0
+INTERVALLO_DRENAGGIO      = 0.1
+# Segnali di controllo del Gestore Pipeline, serviti prima dei segnali
+# ordinari come quelli di code_segnali.SEGNALI_CONTROLLO, e corsia di
+# priorità più bassa ammessa in pipeline.conf
+# Control signals of the Pipeline Manager, served before the ordinary
+# signals like the ones of code_segnali.SEGNALI_CONTROLLO, and lowest
+# priority lane allowed in pipeline.conf
+SEGNALI_CONTROLLO_PIPELINE = SEGNALI_OPERAZIONI + ("lista_operazioni",
+                                                   "esporta_traccia")
+PRIORITA_MASSIMA          = 7
+
+def leggi_impostazioni(file_configurazione):
+    """
+    Leggi Impostazioni
+
+    Legge le impostazioni dal file di configurazione della pipeline.
+
+    Read Settings
+
+    Reads the settings from the configuration file of the pipeline.
+    """
+    ##################### Lettura delle impostazioni ###########################
+    ##################### Reading the settings #################################
+    configurazione       = []
+    lista_configurazione = []
+    impostazioni         = []
+
+    # Leggi le impostazioni dal file configurazione e mettile in una lista
+    # Read the settings from the configuration file and put them in a list
+    with open(file_configurazione) as f:
+        configurazione = f.readlines()
+    lista_configurazione[:] = [x.strip() for x in configurazione]
+
+    # La lista delle impostazioni è una lista di liste, così da permettere
+    # indici non unici
+    # The list of settings is a list of lists, so to allow non-unique indices
+    for impostazione in lista_configurazione:
+        nome,valore = impostazione.split(" ",1)
+        impostazioni.append([nome,valore])
+    ################# Fine lettura delle impostazioni ##########################
+    ################# End of reading the settings ##############################
+    return impostazioni
+
+def imposta_framework(impostazioni):
+    """
+    Imposta Framework
+
+    Applica le impostazioni della pipeline che valgono per tutti gli oggetti
+    del framework di un processo e dei suoi figli: modalità dei Gestori
+    Segnali, lotti, capacità delle code, priorità e coalescenza dei segnali,
+    tabella dei nomi del formato binario e livelli del registro. Va chiamata
+    prima di creare gli oggetti, sia dal Gestore Pipeline che da un nodo che
+    ospita operazioni remote (vedi nodo.py). Restituisce le capacità e le
+    politiche delle code delle singole operazioni.
+
+    Set Framework
+
+    Applies the pipeline settings holding for all the framework objects of a
+    process and of its children: Signal Managers mode, batches, queue
+    capacity, signal priorities and coalescing, names table of the binary
+    format and log levels. It must be called before creating the objects, both
+    by the Pipeline Manager and by a node hosting remote operations (see
+    nodo.py). Returns the capacities and policies of the queues of the single
+    operations.
+    """
+    # La modalità dei Gestori Segnali diventa la modalità predefinita di
+    # tutte le operazioni
+    # The Signal Managers mode becomes the default mode of all the operations
+    for nome,valore in impostazioni:
+        if nome == "modalita_gestore_segnali":
+            oggetto.modalita_gestore_segnali = valore
+        if nome == "lotto_massimo":
+            oggetto.lotto_massimo            = int(valore)
+        if nome == "ritardo_massimo_lotto":
+            oggetto.ritardo_massimo_lotto    = float(valore)
+    # Capacità e politica delle code: "capacita_coda N" e
+    # "politica_coda P" valgono per tutte le code, "capacita_coda X N" e
+    # "politica_coda X P" solo per quelle dell'operazione X
+    # Queue capacity and policy: "capacita_coda N" and "politica_coda P"
+    # apply to every queue, "capacita_coda X N" and "politica_coda X P"
+    # only to the queues of operation X
+    capacita_code = {}
+    politiche_code = {}
+    for nome,valore in impostazioni:
+        if nome in ("capacita_coda","politica_coda"):
+            parti = valore.split()
+            if nome == "capacita_coda":
+                if len(parti) == 1:
+                    oggetto.capacita_coda     = int(parti[0])
+                else:
+                    capacita_code[parti[0]]   = int(parti[1])
+            else:
+                if len(parti) == 1:
+                    politiche_code[""]        = parti[0]
+                else:
+                    politiche_code[parti[0]]  = parti[1]
+    # Priorità dei segnali: "priorita S N" mette i segnali S nella corsia N
+    # delle code in entrata (0 è servita per prima, 1 è quella dei segnali
+    # ordinari) e "soglia_precedenza N" è il numero di elementi dopo cui una
+    # corsia scavalcata viene servita comunque
+    # Signal priorities: "priorita S N" puts the S signals in the N lane of
+    # the incoming queues (0 is served first, 1 is the one of the ordinary
+    # signals) and "soglia_precedenza N" is the number of items after which
+    # a skipped lane is served anyway
+    priorita = dict(PRIORITA_SEGNALI)
+    priorita.update((segnale,PRIORITA_CONTROLLO) \
+                    for segnale in SEGNALI_CONTROLLO_PIPELINE)
+    for nome,valore in impostazioni:
+        if nome == "priorita":
+            parti = valore.split()
+            if len(parti) != 2 or not parti[1].isdigit() or \
+               int(parti[1]) > PRIORITA_MASSIMA:
+                raise ValueError("Priorità non valida: " + valore) # Invalid priority
+            priorita[parti[0]] = int(parti[1])
+        if nome == "soglia_precedenza":
+            oggetto.soglia_precedenza = int(valore)
+    oggetto.priorita_segnali = priorita
+    # "coalesci S [S ...]": finché un segnale S è in coda, uno più recente
+    # con lo stesso nome e destinatario ne prende il posto (vedi
+    # gestore_segnali)
+    # "coalesci S [S ...]": while an S signal is queued, a newer one with the
+    # same name and recipient takes its place (see gestore_segnali)
+    coalescenti = set(oggetto.segnali_coalescenti)
+    for nome,valore in impostazioni:
+        if nome == "coalesci":
+            coalescenti.update(valore.split())
+    oggetto.segnali_coalescenti = frozenset(coalescenti)
+    # Registra i nomi delle operazioni e dei segnali nella tabella del
+    # formato binario prima di avviare qualsiasi processo
+    # Register the names of operations and signals in the binary format
+    # table before starting any process
+    registra_nomi(valore.split()[0] for nome,valore in impostazioni \
+                  if nome in ("operazione","segnale"))
+    # Livelli dei logger ("livello_log COMPONENTE LIVELLO") e
+    # campionamento dei record per singolo segnale ("campionamento_log
+    # N"): anche questi vanno impostati prima di avviare i processi
+    # Logger levels ("livello_log COMPONENTE LIVELLO") and sampling of the
+    # per signal records ("campionamento_log N"): these too must be set
+    # before starting the processes
+    for nome,valore in impostazioni:
+        if nome == "livello_log":
+            imposta_livello(*valore.split())
+        if nome == "campionamento_log":
+            imposta_campionamento(valore)
+    return capacita_code,politiche_code
+
+def nomi_repliche(operazione,repliche):
+    """
+    Nomi delle repliche di un'operazione - Names of the replicas of an operation
+    """
+    if repliche == 1:
+        return (operazione,)
+    return tuple(operazione + SEPARATORE_REPLICA + str(i) \
+                 for i in range(repliche))
+
+def operazioni_remote(impostazioni):
+    """
+    Operazioni Remote
+
+    Indirizzi delle operazioni che girano su altri host: "remota X host:porta"
+    vale per l'operazione X o per la replica X#i; le repliche di
+    un'operazione remota usano porte consecutive a partire da quella
+    indicata.
+
+    Remote Operations
+
+    Addresses of the operations running on other hosts: "remota X host:porta"
+    holds for the operation X or for the replica X#i; the replicas of a
+    remote operation use consecutive ports starting from the given one.
+    """
+    repliche = {}
+    for nome,valore in impostazioni:
+        if nome == "operazione":
+            parti                = valore.split()
+            repliche[parti[0]]   = nomi_repliche(parti[0],
+                                         int(parti[1]) if len(parti) > 1 else 1)
+    indirizzi = {}
+    for nome,valore in impostazioni:
+        if nome == "remota":
+            parti = valore.split()
+            if len(parti) != 2:
+                raise ValueError("Operazione remota non valida: " + valore) # Invalid remote operation
+            host,porta = indirizzo(parti[1])
+            for numero,replica in enumerate(repliche.get(parti[0],
+                                                         (parti[0],))):
+                indirizzi[replica] = (host,porta + numero)
+    return indirizzi
 
 class gestore_pipeline(oggetto):
     """Gestore Pipeline
@@ -32,44 +286,82 @@ class gestore_pipeline(oggetto):
     the Pipeline Manager (himself) and orchestrates the operations.
     It ensures that the operations are carried out in the established order
     """
+    # I segnali dall'esterno diretti alle operazioni passano dal Gestore
+    # Pipeline, che li instrada (vedi gestisci_segnale_esterno)
+    # Signals from the outside addressed to the operations go through the
+    # Pipeline Manager, which routes them (see gestisci_segnale_esterno)
+    controlla_destinatario = False
+
     def __init__(self,
                  file_configurazione,
                  coda_ipc_entrata,
                  lock_ipc_entrata,
                  coda_ipc_uscita,
                  lock_ipc_uscita):
-        super().__init__(coda_ipc_entrata,
-                         lock_ipc_entrata,
-                         coda_ipc_uscita,
-                         lock_ipc_uscita)
-        logging.info(type(self).__name__ + " inizializzazione")
+        logging.getLogger(type(self).__name__).info(type(self).__name__ + \
+                                                    " inizializzazione")
 
         ##### Inizializzazione comune a tutti gli oggetti del framework ########
         ##### Common initialization for all framework objects ##################
-
-        ##################### Lettura delle impostazioni #######################
-        ##################### Reading the settings #############################
-        configurazione       = []
-        lista_configurazione = []
-        impostazioni         = []
-
-        # Leggi le impostazioni dal file configurazione e mettile in una lista #
-        # Read the settings from the configuration file and put them in a list #
-        with open(file_configurazione) as f:
-            configurazione = f.readlines()
-        lista_configurazione[:] = [x.strip() for x in configurazione]
-
-        # La lista delle impostazioni è una lista di liste, così da permettere
-        # indici non unici
-        # The list of settings is a list of lists, so to allow non-unique indices
-        for impostazione in lista_configurazione:
-            nome,valore = impostazione.split(" ")
-            impostazioni.append([nome,valore])
-        ################# Fine lettura delle impostazioni ######################
+        impostazioni  = leggi_impostazioni(file_configurazione)
         #### Fine inizializzazione comune a tutti gli oggetti del framework ####
-        ################# End of reading the settings ##########################
         ######## End of initialization common to all framework objects #########
 
+        # Le impostazioni del framework (modalità dei Gestori Segnali, lotti,
+        # code, tabella dei nomi, registro) vanno applicate prima di
+        # inizializzare l'oggetto, perché valgono anche per il Gestore Segnali
+        # del Gestore Pipeline, e prima di avviare qualsiasi processo
+        # The framework settings (Signal Managers mode, batches, queues, names
+        # table, log) must be applied before initializing the object, because
+        # they apply to the Pipeline Manager's own Signal Manager too, and
+        # before starting any process
+        capacita_code,politiche_code = imposta_framework(impostazioni)
+        # Il metodo di avvio dei processi ("metodo_avvio") va impostato dal
+        # processo principale prima di creare le code (vedi avvio e main.py):
+        # qui è troppo tardi, si può solo segnalare che non è quello in uso
+        # The processes start method ("metodo_avvio") must be set by the main
+        # process before creating the queues (see avvio and main.py): here it
+        # is too late, it can only be reported that it is not the one in use
+        metodo = metodo_avvio(impostazioni)
+        if metodo is not None and metodo != get_start_method():
+            logging.getLogger(type(self).__name__).warning(
+                         type(self).__name__ + " metodo_avvio " + metodo + \
+                         " ignorato, in uso " + get_start_method() + \
+                         ": va impostato con avvio.imposta_metodo_avvio") # ignored, in use: it must be set with
+        # Il pool di memoria condivisa va creato prima di qualsiasi processo,
+        # così che tutte le operazioni lo ereditino
+        # The shared memory pool must be created before any process, so that
+        # every operation inherits it
+        impostazioni_memoria = {nome: int(valore) \
+                                for nome,valore in impostazioni \
+                                if nome in ("memoria_condivisa_blocchi",
+                                            "memoria_condivisa_dimensione")}
+        if len(impostazioni_memoria) == 2:
+            oggetto.pool_memoria = pool_memoria(
+                          impostazioni_memoria["memoria_condivisa_blocchi"],
+                          impostazioni_memoria["memoria_condivisa_dimensione"])
+        # Tracciamento dei segnali: "tracciamento N" traccia un segnale ogni
+        # N, "tracciamento_eventi E" è la dimensione del buffer circolare. Il
+        # buffer è in memoria condivisa e va creato prima dei processi
+        # Signal tracing: "tracciamento N" traces one signal every N,
+        # "tracciamento_eventi E" is the size of the ring buffer. The buffer
+        # is in shared memory and must be created before the processes
+        impostazioni_tracciamento = {nome: int(valore) \
+                                     for nome,valore in impostazioni \
+                                     if nome in ("tracciamento",
+                                                 "tracciamento_eventi")}
+        if impostazioni_tracciamento.get("tracciamento",0) > 0:
+            attiva_tracciamento(impostazioni_tracciamento["tracciamento"],
+                                impostazioni_tracciamento.get(
+                                              "tracciamento_eventi",EVENTI))
+
+        super().__init__(coda_ipc_entrata,
+                         lock_ipc_entrata,
+                         coda_ipc_uscita,
+                         lock_ipc_uscita)
+        self.capacita_code  = capacita_code
+        self.politiche_code = politiche_code
+
         ################### Inizializza le impostazioni ########################
         #################### Initialize the settings #########################
 
@@ -133,17 +425,191 @@ class gestore_pipeline(oggetto):
         # For each pipeline operation, the Pipeline Manager creates a
         # Signal Manager for communicating with that operation
         self.gestore_segnali_operazioni      = {}
+        # Nome con cui le operazioni indirizzano i segnali al Gestore Pipeline
+        # Name with which the operations address signals to the Pipeline
+        # Manager
+        self.nome                            = type(self).__name__
+        # Tabella di instradamento: per ogni destinatario, le operazioni a cui
+        # inoltrare il segnale; per ogni mittente, i gruppi di repliche che
+        # ricevono i suoi segnali broadcast, uno per operazione (vedi
+        # costruisci_tabella_instradamento)
+        # Routing table: for every recipient, the operations the signal is
+        # forwarded to; for every sender, the groups of replicas receiving its
+        # broadcast signals, one per operation (see
+        # costruisci_tabella_instradamento)
+        self.tabella_instradamento           = {}
+        self.diffusione                      = {}
+        self.diffusione_esterna              = ()
+        # Archi della topologia ("arco A B": A alimenta B) e, una volta
+        # compilata, successori di ogni operazione e ordine topologico. Senza
+        # archi i segnali broadcast vanno a tutte le altre operazioni
+        # Topology edges ("arco A B": A feeds B) and, once compiled,
+        # successors of every operation and topological order. With no edges
+        # broadcast signals go to every other operation
+        self.archi                           = {} # operazione: [successori] - # operation: [successors]
+        self.successori                      = None
+        self.ordine_topologico               = ()
+        # Repliche di ogni operazione, operazione di ogni replica e politica
+        # di bilanciamento tra le repliche ("" è la politica predefinita)
+        # Replicas of every operation, operation of every replica and
+        # balancing policy across the replicas ("" is the default policy)
+        self.repliche                        = {} # "operazione": ("replica",...) - # "operation": ("replica",...)
+        self.operazione_di                   = {} # "replica": "operazione" - # "replica": "operation"
+        self.bilanciamento                   = {} # "operazione": politica - # "operation": policy
+        self.turni                           = {} # "operazione": prossima replica (round robin) - # "operation": next replica
+        # Indirizzi delle operazioni che girano su altri host e chiave
+        # condivisa dei loro canali (vedi trasporto.py). Vanno letti prima
+        # di creare le operazioni
+        # Addresses of the operations running on other hosts and shared key
+        # of their channels (see trasporto.py). They must be read before
+        # creating the operations
+        self.indirizzi_remoti                = operazioni_remote(impostazioni) # "replica": (host,porta)
+        self.chiave_remota                   = None
+        if self.indirizzi_remoti:
+            self.chiave_remota               = chiave(next(
+                                          (valore for nome,valore in impostazioni \
+                                           if nome == "chiave_remota"),None))
+        # Gruppi di operazioni asincrone che condividono un ciclo di eventi e
+        # processi dei cicli condivisi
+        # Groups of asynchronous operations sharing an event loop and
+        # processes of the shared loops
+        self.cicli_operazioni                = {} # "operazione": gruppo - # "operation": group
+        self.cicli_condivisi                 = {} # gruppo: ciclo_condiviso - # group: shared loop
+        # Metriche del Gestore Pipeline e ultime istantanee ricevute dai
+        # Gestori Segnali. Le risposte alle richieste di statistiche esterne
+        # vengono inoltrate all'esterno fino alla scadenza. Le istantanee
+        # possono essere scritte periodicamente su file
+        # Metrics of the Pipeline Manager and last snapshots received from the
+        # Signal Managers. The answers to external statistics requests are
+        # forwarded outside until the deadline. The snapshots can be
+        # periodically written to a file
+        self.metriche                        = metriche(self.nome)
+        self.ultime_statistiche              = {} # "componente:pid": istantanea - # "component:pid": snapshot
+        self.scadenza_statistiche_esterne    = 0
+        self.file_statistiche                = None
+        self.intervallo_statistiche          = INTERVALLO_STATISTICHE
+        self.prossime_statistiche            = 0
+        # File in cui esportare la traccia dei segnali, allo stop o con il
+        # segnale "esporta_traccia"
+        # File where to export the signals trace, on stop or with the
+        # "esporta_traccia" signal
+        self.file_traccia                    = None
+        # Giornale dei segnali instradati (vedi giornale), aperto all'avvio
+        # del processo del Gestore Pipeline, e segnali non confermati da
+        # riprendere
+        # Journal of the routed signals (see giornale), opened when the
+        # Pipeline Manager process starts, and unacknowledged signals to
+        # resume
+        self.giornale                        = None
+        self.da_riprendere                   = []
+        # Lotti di segnali in attesa di essere spediti alle operazioni e
+        # scadenza del più vecchio
+        # Signal batches waiting to be shipped to the operations and deadline
+        # of the oldest one
+        self.lotti_uscita                    = {} # "nome operazione": lista - # "operation name": list
+        self.scadenza_lotti                  = 0
+        # Posizione nei lotti in uscita dei segnali coalescenti, per
+        # sostituirli con quelli più recenti (vedi accoda_segnale)
+        # Position in the outgoing batches of the coalescing signals, to
+        # replace them with the newer ones (see accoda_segnale)
+        self.posizioni_lotti                 = {} # "nome operazione": {(segnale,destinatario): posizione} - # "operation name": {(signal,recipient): position}
+        # Coda su cui le operazioni segnalano di essere pronte e tempi di
+        # avvio di ogni operazione (vedi attendi_pronti)
+        # Queue on which the operations report they are ready and startup
+        # times of every operation (see attendi_pronti)
+        self.coda_pronti                     = Queue()
+        self.tempi_avvio                     = {} # "nome operazione": {fase: secondi} - # "operation name": {phase: seconds}
+        # Repliche che smaltiscono i segnali ricevuti prima di essere rimosse
+        # (vedi scollega_operazione), con la scadenza e l'istante da cui le
+        # loro code sono vuote. Non ricevono nuovi segnali
+        # Replicas draining the signals received before being removed (see
+        # scollega_operazione), with the deadline and the instant since their
+        # queues are empty. They receive no new signals
+        self.in_drenaggio                    = {} # "replica": [scadenza,vuote_da] - # "replica": [deadline,empty_since]
+        # Insieme delle code su cui il Gestore Pipeline attende quando è
+        # avviato, e operazione di ciascuna (vedi costruisci_attesa)
+        # Set of the queues the Pipeline Manager waits on when started, and
+        # operation of each one (see costruisci_attesa)
+        self.attesa                          = None
+        self.operazioni_code                 = {} # id(coda): "nome operazione" - # id(queue): "operation name"
         # Segnale in entrata dall'esterno dell'applicazione (dalla coda IPC)
 
         # Preleva le impostazioni del Gestore Pipeline. Le impostazioni sono:
-        # -) Operazione: il nome dell'operazione da aggiungere alla pipeline
+        # -) Operazione: il nome dell'operazione da aggiungere alla pipeline,
+        #    seguito dal numero di repliche (1 se manca)
+        # -) Bilanciamento: la politica con cui i segnali sono distribuiti tra
+        #    le repliche, per tutte le operazioni o per quella indicata
+        # -) Ciclo_condiviso: il gruppo di operazioni asincrone che condividono
+        #    un processo e un ciclo di eventi, seguito dall'operazione
+        # -) Arco: un'operazione seguita dalle operazioni che alimenta
+        # -) Remota, chiave_remota: indirizzo "host:porta" di un'operazione
+        #    (o replica) che gira su un altro host e chiave condivisa dei
+        #    canali (letti sopra)
+        # -) Statistiche_file, statistiche_intervallo: file e intervallo delle
+        #    istantanee periodiche delle metriche
         # -) Segnale: un segnale che il Gestore Pipeline può inviare
+        # -) Modalita_gestore_segnali: "processo" o "thread" (letta sopra)
+        # -) Lotto_massimo, ritardo_massimo_lotto: raggruppamento dei segnali
+        #    (letti sopra)
+        # -) Memoria_condivisa_blocchi, memoria_condivisa_dimensione: pool di
+        #    memoria condivisa per i dati voluminosi (letti sopra)
+        # -) Capacita_coda, politica_coda: capacità e politica delle code
+        #    delle operazioni (letti sopra)
+        # -) Priorita, soglia_precedenza: corsia di priorità di un segnale e
+        #    soglia oltre cui una corsia scavalcata viene servita (letti
+        #    sopra)
+        # -) Coalesci: segnali di cui conta solo l'ultimo valore (letto
+        #    sopra)
+        # -) Livello_log, campionamento_log: livello di un componente nel
+        #    registro e campionamento dei record per segnale (letti sopra)
+        # -) Tracciamento, tracciamento_eventi: campionamento dei segnali
+        #    tracciati e dimensione del buffer (letti sopra)
+        # -) Tracciamento_file: file della traccia dei segnali
+        # -) Giornale: cartella del giornale dei segnali instradati;
+        #    giornale_segmento, giornale_commit, giornale_checkpoint:
+        #    dimensione dei segmenti e intervalli di sincronizzazione e dei
+        #    punti di controllo
+        # -) Metodo_avvio: "fork", "spawn" o "forkserver", letto dal processo
+        #    principale (vedi avvio)
 
         # Incoming signal from outside the application (from the IPC queue)
 
          # Get Pipeline Manager settings. The settings are:
-         # -) Operation: the name of the operation to add to the pipeline
+         # -) Operation: the name of the operation to add to the pipeline,
+         #    followed by the number of replicas (1 if missing)
+         # -) Bilanciamento: the policy with which signals are spread across
+         #    the replicas, for every operation or for the given one
+         # -) Ciclo_condiviso: the group of asynchronous operations sharing a
+         #    process and an event loop, followed by the operation
+         # -) Arco: an operation followed by the operations it feeds
+         # -) Remota, chiave_remota: "host:porta" address of an operation (or
+         #    replica) running on another host and shared key of the
+         #    channels (read above)
+         # -) Statistiche_file, statistiche_intervallo: file and interval of
+         #    the periodic metrics snapshots
          # -) Signal: a signal that the Pipeline Manager can send
+         # -) Modalita_gestore_segnali: "processo" or "thread" (read above)
+         # -) Lotto_massimo, ritardo_massimo_lotto: signal batching (read
+         #    above)
+         # -) Memoria_condivisa_blocchi, memoria_condivisa_dimensione: shared
+         #    memory pool for bulky data (read above)
+         # -) Capacita_coda, politica_coda: capacity and policy of the
+         #    operations' queues (read above)
+         # -) Priorita, soglia_precedenza: priority lane of a signal and
+         #    threshold past which a skipped lane is served (read above)
+         # -) Coalesci: signals of which only the latest value matters (read
+         #    above)
+         # -) Livello_log, campionamento_log: log level of a component and
+         #    sampling of the per signal records (read above)
+         # -) Tracciamento, tracciamento_eventi: sampling of the traced
+         #    signals and size of the buffer (read above)
+         # -) Tracciamento_file: file of the signals trace
+         # -) Giornale: directory of the journal of the routed signals;
+         #    giornale_segmento, giornale_commit, giornale_checkpoint: size
+         #    of the segments and intervals of the syncs and of the
+         #    checkpoints
+         # -) Metodo_avvio: "fork", "spawn" or "forkserver", read by the main
+         #    process (see avvio)
         for impostazione in impostazioni:
             nome,valore = impostazione
             # Aggiungi il segnale alla lista dei segnali
@@ -152,77 +618,741 @@ class gestore_pipeline(oggetto):
                 self.lista_segnali.append(valore)
             # Aggiungi l'operazione alla pipeline
             # Add the operation to the pipeline
+            # "operazione X N" aggiunge N repliche dell'operazione X
+            # "operazione X N" adds N replicas of the operation X
             if nome == "operazione":
-                # Inizializza le code e i lock *associati* all'operazione nel
-                # Gestore Pipeline
-                # Initialize the queues and locks * associated * with the operation in the
-                # Pipeline manager
-
-                # globals()[valore] = getattr(__import__(valore),valore)
-                globals()[valore] = getattr(import_module(valore),valore)
-
-                self.ipc_entrata_operazioni[valore]          = Queue()
-                self.lock_ipc_entrata_operazioni[valore]     = Lock()
-                self.ipc_uscita_operazioni[valore]           = Queue()
-                self.lock_ipc_uscita_operazioni[valore]      = Lock()
-                self.coda_segnali_entrata_operazioni[valore] = Queue()
-                self.lock_segnali_entrata_operazioni[valore] = Lock()
-                self.coda_segnali_uscita_operazioni[valore]  = Queue()
-                self.lock_segnali_uscita_operazioni[valore]  = Lock()
-                # Inizializza il Gestore Segnali *associato* all'operazione
-                # Initialize the Signal Manager * associated * with the operation
-                self.gestore_segnali_operazioni[valore]      = gestore_segnali(
-                                   type(self).__name__,
-                                   self.ipc_entrata_operazioni[valore],
-                                   self.lock_ipc_entrata_operazioni[valore],
-                                   self.ipc_uscita_operazioni[valore],
-                                   self.lock_ipc_uscita_operazioni[valore],
-                                   self.coda_segnali_entrata_operazioni[valore],
-                                   self.lock_segnali_entrata_operazioni[valore],
-                                   self.coda_segnali_uscita_operazioni[valore],
-                                   self.lock_segnali_uscita_operazioni[valore],
-                                   controlla_destinatario=False,
-                                   inoltra=True)
-                # Avvia il Gestore Segnali *associato* all'operazione
-                # Start the Signal Manager * associated * with the operation
-                self.gestore_segnali_operazioni[valore].start()
-                sleep(0.01)
-                with self.lock_segnali_uscita_operazioni[valore]:
-                    if not self.coda_segnali_uscita_operazioni[valore].full():
-                        self.coda_segnali_uscita_operazioni[valore].put_nowait(["avvia","gestore_segnali"])
-                # Inizializza l'operazione nella coda delle operazioni
-                # Initialize the operation in the operation queue
-
-                self.operazioni[valore] = globals()[valore](
-                                       str(valore + ".conf"),
-                                       self.ipc_uscita_operazioni[valore],
-                                       self.lock_ipc_uscita_operazioni[valore],
-                                       self.ipc_entrata_operazioni[valore],
-                                       self.lock_ipc_entrata_operazioni[valore])
-                logging.info(self.operazioni[valore])
-                sleep(0.1)
-        # Avvia tutte le operazioni
-        # Start all operations
+                parti      = valore.split()
+                operazione = parti[0]
+                repliche   = int(parti[1]) if len(parti) > 1 else 1
+                nomi = nomi_repliche(operazione,repliche)
+                # Importa il modulo dell'operazione una sola volta, e solo se
+                # almeno una replica gira su questo host
+                # Import the operation module only once, and only if at least
+                # one replica runs on this host
+                durata_importazione = 0
+                if operazione not in globals() and \
+                   any(replica not in self.indirizzi_remoti for replica in nomi):
+                    inizio = monotonic()
+                    # globals()[valore] = getattr(__import__(valore),valore)
+                    globals()[operazione] = getattr(import_module(operazione),
+                                                    operazione)
+                    durata_importazione = monotonic() - inizio
+                self.repliche[operazione] = nomi
+                for replica in nomi:
+                    self.crea_operazione(replica,operazione)
+                self.tempi_avvio[nomi[0]]["importazione"] = \
+                                                            durata_importazione
+            # "statistiche_file F" e "statistiche_intervallo S": scrivi le
+            # istantanee delle metriche nel file F ogni S secondi
+            # "statistiche_file F" and "statistiche_intervallo S": write the
+            # metrics snapshots to the file F every S seconds
+            if nome == "statistiche_file":
+                self.file_statistiche       = valore
+            if nome == "statistiche_intervallo":
+                self.intervallo_statistiche = float(valore)
+            # "tracciamento_file F": esporta la traccia dei segnali nel file F
+            # "tracciamento_file F": export the signals trace to the file F
+            if nome == "tracciamento_file":
+                self.file_traccia           = valore
+            # "giornale C": registra i segnali instradati nella cartella C e
+            # riprendi quelli non confermati all'avvio
+            # "giornale C": record the routed signals in the directory C and
+            # resume the unacknowledged ones on start
+            if nome == "giornale":
+                impostazioni_giornale = {nome: valore \
+                                         for nome,valore in impostazioni}
+                self.giornale = giornale(
+                    valore,
+                    int(impostazioni_giornale.get("giornale_segmento",
+                                                  DIMENSIONE_SEGMENTO)),
+                    float(impostazioni_giornale.get("giornale_commit",
+                                                    INTERVALLO_COMMIT)),
+                    float(impostazioni_giornale.get("giornale_checkpoint",
+                                                    INTERVALLO_CHECKPOINT)))
+            # "ciclo_condiviso G X": l'operazione asincrona X gira nel ciclo
+            # di eventi condiviso G, insieme alle altre operazioni del gruppo
+            # "ciclo_condiviso G X": the asynchronous operation X runs in the
+            # shared event loop G, together with the other operations of the
+            # group
+            if nome == "ciclo_condiviso":
+                gruppo,operazione = valore.split()
+                self.cicli_operazioni[operazione] = gruppo
+            # "arco A B [C ...]": i segnali broadcast di A vanno solo a B (e a
+            # C, ...)
+            # "arco A B [C ...]": the broadcast signals of A go only to B (and
+            # to C, ...)
+            if nome == "arco":
+                parti = valore.split()
+                if len(parti) < 2:
+                    raise ValueError("Arco non valido: " + valore) # Invalid edge
+                self.archi.setdefault(parti[0],[]).extend(parti[1:])
+            # "bilanciamento P" e "bilanciamento X P": politica con cui i
+            # segnali diretti a X vengono distribuiti tra le sue repliche
+            # "bilanciamento P" and "bilanciamento X P": policy with which the
+            # signals addressed to X are spread across its replicas
+            if nome == "bilanciamento":
+                parti = valore.split()
+                if parti[-1] not in BILANCIAMENTI:
+                    raise ValueError("Bilanciamento non valido: " + valore) # Invalid balancing
+                if len(parti) == 1:
+                    self.bilanciamento[""]       = parti[0]
+                else:
+                    self.bilanciamento[parti[0]] = parti[1]
+        self.compila_topologia()
+        self.costruisci_tabella_instradamento()
+        # Avvia tutte le operazioni senza attenderle: i processi partono in
+        # parallelo e il Gestore Pipeline attende che siano pronti all'avvio
+        # del proprio processo (vedi attendi_pronti)
+        # Start all operations without waiting for them: the processes start
+        # in parallel and the Pipeline Manager waits for them to be ready when
+        # its own process starts (see attendi_pronti)
         for nome,operazione in self.operazioni.items():
-            logging.info(type(self).__name__ + " sta avviando " + nome)
+            if nome in self.indirizzi_remoti:
+                continue
+            gruppo = self.cicli_operazioni.get(self.operazione_di[nome])
+            if gruppo is not None:
+                if gruppo not in self.cicli_condivisi:
+                    self.cicli_condivisi[gruppo] = ciclo_condiviso(gruppo)
+                self.cicli_condivisi[gruppo].aggiungi(operazione)
+                continue
+            self.registro.info(type(self).__name__ + " sta avviando " + nome)
+            self.tempi_avvio[nome]["inizio_avvio"] = time()
             operazione.start()
+        # Le operazioni asincrone di uno stesso gruppo partono insieme nel
+        # processo del loro ciclo condiviso
+        # The asynchronous operations of the same group start together in the
+        # process of their shared loop
+        for gruppo,ciclo in self.cicli_condivisi.items():
+            self.registro.info(type(self).__name__ + " sta avviando " + gruppo)
+            for operazione in ciclo.operazioni:
+                self.tempi_avvio[operazione.nome]["inizio_avvio"] = time()
+            ciclo.start()
         ################ Fine inizializza le impostazioni ######################
         ################ Finish initializes the settings #######################
-        logging.info(type(self).__name__ + " inizializzato")
+        self.registro.info(type(self).__name__ + " inizializzato")
+    def crea_operazione(self,nome,operazione):
+        """
+        Crea Operazione
+
+        Crea le code, il Gestore Segnali *associato* (in modalità processo) e
+        l'oggetto dell'operazione, che avrà il nome indicato. L'operazione è
+        un'istanza della classe operazione, già importata; le repliche di una
+        stessa operazione ne condividono la classe e il file di
+        configurazione.
+
+        Create Operation
+
+        Creates the queues, the *associated* Signal Manager (in process mode)
+        and the object of the operation, which will have the given name. The
+        operation is an instance of the class operazione, already imported;
+        the replicas of the same operation share its class and its
+        configuration file.
+
+        Un'operazione remota gira su un altro host (vedi nodo.py): al posto
+        delle due code IPC c'è un unico canale remoto in ascolto, usato dal
+        Gestore Segnali *associato* come quelle.
+
+        A remote operation runs on another host (see nodo.py): instead of the
+        two IPC queues there is a single listening remote channel, used by
+        the *associated* Signal Manager like them.
+        """
+        inizio = monotonic()
+        self.operazione_di[nome] = operazione
+        # Inizializza le code e i lock *associati* all'operazione nel
+        # Gestore Pipeline
+        # Initialize the queues and locks * associated * with the operation in the
+        # Pipeline manager
+        if nome in self.indirizzi_remoti:
+            canale = canale_remoto(self.indirizzi_remoti[nome],
+                                   self.chiave_remota,
+                                   True,
+                                   nome,
+                                   self.capacita_coda_operazione(nome))
+            self.ipc_entrata_operazioni[nome]      = canale
+            self.ipc_uscita_operazioni[nome]       = canale
+        else:
+            self.ipc_entrata_operazioni[nome]      = self.crea_coda(nome)
+            self.ipc_uscita_operazioni[nome]       = self.crea_coda(nome)
+        self.lock_ipc_entrata_operazioni[nome]     = Lock()
+        self.lock_ipc_uscita_operazioni[nome]      = Lock()
+        self.metriche.registra_coda(nome + " ipc_entrata",
+                                    self.ipc_entrata_operazioni[nome])
+        self.metriche.registra_coda(nome + " ipc_uscita",
+                                    self.ipc_uscita_operazioni[nome])
+        # In modalità thread i Gestori Segnali delle operazioni vengono
+        # creati all'avvio del processo del Gestore Pipeline
+        # In thread mode the operations' Signal Managers are created
+        # when the Pipeline Manager process starts
+        if self.modalita_gestore_segnali == MODALITA_PROCESSO:
+            self.avvia_gestore_segnali_operazione(nome)
+        # Inizializza l'operazione nella coda delle operazioni
+        # Initialize the operation in the operation queue
+        if nome in self.indirizzi_remoti:
+            self.operazioni[nome]  = operazione_remota(
+                                              nome,
+                                              self.ipc_entrata_operazioni[nome])
+            self.tempi_avvio[nome] = {"costruzione": monotonic() - inizio}
+            self.registro.info(self.operazioni[nome])
+            return
+        self.operazioni[nome] = globals()[operazione](
+                                       str(operazione + ".conf"),
+                                       self.ipc_uscita_operazioni[nome],
+                                       self.lock_ipc_uscita_operazioni[nome],
+                                       self.ipc_entrata_operazioni[nome],
+                                       self.lock_ipc_entrata_operazioni[nome])
+        self.operazioni[nome].nome        = nome
+        self.operazioni[nome].coda_pronti = self.coda_pronti
+        self.tempi_avvio[nome] = {"costruzione": monotonic() - inizio}
+        self.registro.info(self.operazioni[nome])
+    def avvia_gestore_segnali_operazione(self,nome):
+        """
+        Avvia Gestore Segnali Operazione
+
+        Crea le code interne e il Gestore Segnali *associato* all'operazione
+        nel Gestore Pipeline e lo avvia. In modalità thread le code interne
+        sono code locali del processo del Gestore Pipeline.
+
+        Start Operation Signal Manager
+
+        Creates the internal queues and the Signal Manager *associated* with
+        the operation in the Pipeline Manager and starts it. In thread mode the
+        internal queues are local queues of the Pipeline Manager process.
+        """
+        locale   = self.modalita_gestore_segnali == MODALITA_THREAD
+        # La politica scelta vale per la coda su cui il Gestore Pipeline
+        # inoltra i segnali all'operazione; le altre code bloccano il
+        # produttore
+        # The chosen policy applies to the queue on which the Pipeline Manager
+        # forwards signals to the operation; the other queues block the
+        # producer
+        self.coda_segnali_entrata_operazioni[nome] = self.crea_coda(
+                                                nome,
+                                                POLITICA_BLOCCA,
+                                                locale)
+        self.coda_segnali_uscita_operazioni[nome]  = self.crea_coda(
+                                                nome,
+                                                self.politica_coda_operazione(nome),
+                                                locale)
+        self.metriche.registra_coda(nome + " segnali_entrata",
+                                    self.coda_segnali_entrata_operazioni[nome])
+        self.metriche.registra_coda(nome + " segnali_uscita",
+                                    self.coda_segnali_uscita_operazioni[nome])
+        if locale:
+            self.lock_segnali_entrata_operazioni[nome] = threading.Lock()
+            self.lock_segnali_uscita_operazioni[nome]  = threading.Lock()
+        else:
+            self.lock_segnali_entrata_operazioni[nome] = Lock()
+            self.lock_segnali_uscita_operazioni[nome]  = Lock()
+        # Inizializza il Gestore Segnali *associato* all'operazione
+        # Initialize the Signal Manager * associated * with the operation
+        self.gestore_segnali_operazioni[nome]      = gestore_segnali(
+                               type(self).__name__,
+                               self.ipc_entrata_operazioni[nome],
+                               self.lock_ipc_entrata_operazioni[nome],
+                               self.ipc_uscita_operazioni[nome],
+                               self.lock_ipc_uscita_operazioni[nome],
+                               self.coda_segnali_entrata_operazioni[nome],
+                               self.lock_segnali_entrata_operazioni[nome],
+                               self.coda_segnali_uscita_operazioni[nome],
+                               self.lock_segnali_uscita_operazioni[nome],
+                               controlla_destinatario=False,
+                               inoltra=True,
+                               modalita=self.modalita_gestore_segnali,
+                               lotto_massimo=self.lotto_massimo,
+                               ritardo_massimo_lotto=self.ritardo_massimo_lotto,
+                               nome=nome,
+                               coalescenti=self.segnali_coalescenti)
+        # Avvia il Gestore Segnali *associato* all'operazione
+        # Start the Signal Manager * associated * with the operation
+        self.gestore_segnali_operazioni[nome].start()
+        inserisci(self.coda_segnali_uscita_operazioni[nome],["avvia","gestore_segnali"])
+    def crea_coda(self,nome,politica=POLITICA_BLOCCA,locale=False):
+        """
+        Crea Coda
+
+        Crea una coda dell'operazione indicata: una coda a priorità, così che
+        i segnali di controllo verso l'operazione e da essa non attendano i
+        segnali ordinari già in coda.
+
+        Create Queue
+
+        Creates a queue of the given operation: a priority queue, so that the
+        control signals towards the operation and from it do not wait for the
+        ordinary signals already queued.
+        """
+        return coda_priorita(self.capacita_coda_operazione(nome),
+                             politica,
+                             locale,
+                             self.priorita_segnali,
+                             self.soglia_precedenza)
+    def capacita_coda_operazione(self,nome):
+        """Capacità delle code dell'operazione - Capacity of the operation queues"""
+        return self.capacita_code.get(self.operazione_di.get(nome,nome),
+                                      self.capacita_coda)
+    def politica_coda_operazione(self,nome):
+        """Politica delle code dell'operazione - Policy of the operation queues"""
+        return self.politiche_code.get(self.operazione_di.get(nome,nome),
+                                       self.politiche_code.get("",POLITICA_BLOCCA))
+    def gestisci_controllo(self,segnale,estensioni):
+        """
+        Gestisci Controllo
+
+        Gestisce i segnali che cambiano le operazioni della pipeline avviata,
+        senza fermare le altre. L'estensione "operazione" indica l'operazione:
+        -) aggiungi_operazione: la importa, ne avvia le repliche
+           (estensione "repliche", 1 se manca) e la collega alla topologia
+           con le estensioni "successori" e "predecessori" (nomi separati da
+           spazi);
+        -) rimuovi_operazione: la scollega e la stacca dopo che ha smaltito i
+           segnali già ricevuti;
+        -) sostituisci_operazione: ricarica il suo modulo, ne avvia le nuove
+           repliche (tante quante le vecchie se manca l'estensione "repliche")
+           e rimuove le vecchie, che smaltiscono i segnali già ricevuti mentre
+           i nuovi vanno alle nuove.
+        L'esito viene segnalato all'esterno.
+
+        Handle Control
+
+        Handles the signals changing the operations of the started pipeline,
+        without stopping the other ones. The "operazione" extension gives the
+        operation:
+        -) aggiungi_operazione: imports it, starts its replicas ("repliche"
+           extension, 1 if missing) and connects it to the topology with the
+           "successori" and "predecessori" extensions (space separated
+           names);
+        -) rimuovi_operazione: disconnects it and detaches it after it has
+           drained the signals already received;
+        -) sostituisci_operazione: reloads its module, starts its new replicas
+           (as many as the old ones if the "repliche" extension is missing)
+           and removes the old ones, which drain the signals already received
+           while the new ones go to the new replicas.
+        The outcome is reported to the outside.
+
+        Restituisce l'esito, None se il segnale non è valido.
+
+        Returns the outcome, None if the signal is not valid.
+        """
+        estensioni = estensioni or {}
+        operazione = str(estensioni.get(CHIAVE_OPERAZIONE,""))
+        try:
+            if not operazione:
+                raise ValueError("operazione mancante") # missing operation
+            if segnale == SEGNALE_AGGIUNGI:
+                self.collega_operazione(
+                      operazione,
+                      int(estensioni.get(CHIAVE_REPLICHE,1)),
+                      str(estensioni.get(CHIAVE_SUCCESSORI,"")).split(),
+                      str(estensioni.get(CHIAVE_PREDECESSORI,"")).split())
+                esito = "operazione aggiunta: " # operation added
+            elif segnale == SEGNALE_RIMUOVI:
+                self.scollega_operazione(operazione)
+                esito = "operazione in rimozione: " # operation being removed
+            else:
+                self.aggiorna_operazione(operazione,
+                                         int(estensioni.get(CHIAVE_REPLICHE,0)))
+                esito = "operazione sostituita: " # operation replaced
+        except Exception as e:
+            # Anche l'importazione del modulo dell'operazione può fallire
+            # The import of the operation module can fail too
+            self.registro.error(type(self).__name__ + " " + segnale + " " + \
+                                operazione + ": " + repr(e))
+            inserisci(self.coda_segnali_uscita,["segnale non valido",""]) # invalid signal
+            return None
+        self.registro.info(type(self).__name__ + " " + esito + operazione)
+        inserisci(self.coda_segnali_uscita,[esito + operazione,""])
+        return esito + operazione
+    def importa_operazione(self,operazione,ricarica=False):
+        """
+        Importa (o ricarica) la classe dell'operazione e restituisce la
+        durata dell'importazione
+
+        Imports (or reloads) the class of the operation and returns the
+        duration of the import
+        """
+        inizio = monotonic()
+        modulo = ricarica_modulo(operazione) if ricarica \
+                 else import_module(operazione)
+        globals()[operazione] = getattr(modulo,operazione)
+        return monotonic() - inizio
+    def nomi_nuove_repliche(self,operazione,repliche):
+        """
+        Nomi Nuove Repliche
+
+        Nomi delle nuove repliche di un'operazione: come in pipeline.conf se
+        non ne esiste nessuna, altrimenti numeri di replica non ancora in uso
+        (le vecchie repliche possono essere ancora in drenaggio).
+
+        New Replicas Names
+
+        Names of the new replicas of an operation: as in pipeline.conf if
+        none exists, otherwise replica numbers not in use yet (the old
+        replicas can still be draining).
+        """
+        if not any(self.operazione_di.get(nome) == operazione \
+                   for nome in self.operazioni):
+            return nomi_repliche(operazione,repliche)
+        nomi   = []
+        indice = 0
+        while len(nomi) < repliche:
+            nome = operazione + SEPARATORE_REPLICA + str(indice)
+            if nome not in self.operazioni:
+                nomi.append(nome)
+            indice += 1
+        return tuple(nomi)
+    def avvia_repliche(self,operazione,nomi,durata_importazione):
+        """
+        Avvia Repliche
+
+        Crea ed avvia con la pipeline avviata le repliche indicate
+        dell'operazione, ciascuna nel proprio processo, e manda loro il
+        segnale di avvio. La pipeline attende le loro code quando vengono
+        aggiunte all'insieme di attesa (vedi costruisci_attesa).
+
+        Start Replicas
+
+        Creates and starts with the pipeline started the given replicas of the
+        operation, each one in its own process, and sends them the start
+        signal. The pipeline waits on their queues once they are added to the
+        wait set (see costruisci_attesa).
+        """
+        for nome in nomi:
+            self.crea_operazione(nome,operazione)
+            # Il processo del Gestore Pipeline è già avviato: in modalità
+            # thread il Gestore Segnali va avviato qui
+            # The Pipeline Manager process is already started: in thread mode
+            # the Signal Manager must be started here
+            if self.modalita_gestore_segnali == MODALITA_THREAD:
+                self.avvia_gestore_segnali_operazione(nome)
+            if nome not in self.indirizzi_remoti:
+                self.registro.info(type(self).__name__ + " sta avviando " + nome) # is starting
+                self.tempi_avvio[nome]["inizio_avvio"] = time()
+                self.operazioni[nome].start()
+            inserisci(self.coda_segnali_uscita_operazioni[nome],
+                      ["avvia",operazione,self.nome]) # start
+        self.tempi_avvio[nomi[0]]["importazione"] = durata_importazione
+    def collega_operazione(self,operazione,repliche,successori,predecessori):
+        """
+        Collega Operazione
+
+        Aggiunge un'operazione alla pipeline avviata. Solleva ValueError se
+        l'operazione c'è già o se gli archi indicati non sono validi.
+
+        Connect Operation
+
+        Adds an operation to the started pipeline. Raises ValueError if the
+        operation is already there or if the given edges are not valid.
+        """
+        if operazione in self.repliche:
+            raise ValueError("già nella pipeline, va sostituita") # already in the pipeline, it must be replaced
+        durata = self.importa_operazione(operazione)
+        archi  = {nome: list(successori_nome) \
+                  for nome,successori_nome in self.archi.items()}
+        if successori:
+            self.archi.setdefault(operazione,[]).extend(successori)
+        for predecessore in predecessori:
+            self.archi.setdefault(predecessore,[]).append(operazione)
+        nomi                      = self.nomi_nuove_repliche(operazione,
+                                                             repliche)
+        self.repliche[operazione] = nomi
+        try:
+            self.compila_topologia()
+        except ValueError:
+            self.archi = archi
+            del self.repliche[operazione]
+            self.compila_topologia()
+            raise
+        self.avvia_repliche(operazione,nomi,durata)
+        self.costruisci_tabella_instradamento()
+        self.costruisci_attesa()
+    def scollega_operazione(self,operazione):
+        """
+        Scollega Operazione
+
+        Toglie un'operazione dalla pipeline avviata, con i suoi archi: le sue
+        repliche non ricevono più segnali e vengono staccate quando hanno
+        smaltito quelli già ricevuti (vedi controlla_drenaggio). Solleva
+        ValueError se l'operazione non c'è.
+
+        Disconnect Operation
+
+        Removes an operation from the started pipeline, with its edges: its
+        replicas receive no more signals and are detached once they have
+        drained the ones already received (see controlla_drenaggio). Raises
+        ValueError if the operation is not there.
+        """
+        repliche = self.repliche.pop(operazione,None)
+        if repliche is None:
+            raise ValueError("non è nella pipeline") # is not in the pipeline
+        archi      = {nome: [successore for successore in successori \
+                             if successore != operazione] \
+                      for nome,successori in self.archi.items() \
+                      if nome != operazione}
+        self.archi = {nome: successori for nome,successori in archi.items() \
+                      if successori}
+        self.turni.pop(operazione,None)
+        self.compila_topologia()
+        self.drena_repliche(repliche)
+    def aggiorna_operazione(self,operazione,repliche=0):
+        """
+        Aggiorna Operazione
+
+        Sostituisce le repliche di un'operazione con repliche della nuova
+        versione del suo modulo: le nuove ricevono i segnali da subito, le
+        vecchie smaltiscono quelli già ricevuti e vengono staccate. Solleva
+        ValueError se l'operazione non c'è.
+
+        Update Operation
+
+        Replaces the replicas of an operation with replicas of the new
+        version of its module: the new ones receive the signals right away,
+        the old ones drain the ones already received and are detached. Raises
+        ValueError if the operation is not there.
+        """
+        vecchie = self.repliche.get(operazione)
+        if vecchie is None:
+            raise ValueError("non è nella pipeline") # is not in the pipeline
+        durata = self.importa_operazione(operazione,True)
+        nuove  = self.nomi_nuove_repliche(operazione,repliche or len(vecchie))
+        self.avvia_repliche(operazione,nuove,durata)
+        self.repliche[operazione] = nuove
+        self.turni.pop(operazione,None)
+        self.drena_repliche(vecchie)
+        self.costruisci_attesa()
+    def drena_repliche(self,nomi):
+        """
+        Drena Repliche
+
+        Toglie le repliche indicate dall'instradamento, spedisce i lotti già
+        pronti per loro e manda loro il segnale di stop, che le raggiunge dopo
+        tutti i segnali già inoltrati: viaggia nella corsia dei segnali
+        ordinari invece che in quella di controllo.
+
+        Drain Replicas
+
+        Removes the given replicas from routing, ships the batches already
+        prepared for them and sends them the stop signal, which reaches them
+        after all the signals already forwarded: it travels in the lane of the
+        ordinary signals instead of the control one.
+        """
+        scadenza = monotonic() + ATTESA_DRENAGGIO
+        for nome in nomi:
+            self.in_drenaggio[nome] = [scadenza,None]
+        self.costruisci_tabella_instradamento()
+        for nome in nomi:
+            self.spedisci_lotto(nome)
+            inserisci(self.coda_segnali_uscita_operazioni[nome],
+                      ["stop",self.operazione_di[nome],self.nome,
+                       {CHIAVE_PRIORITA: PRIORITA_PREDEFINITA}])
+    def controlla_drenaggio(self):
+        """
+        Controlla Drenaggio
+
+        Stacca le repliche in drenaggio che hanno finito: il loro processo è
+        terminato e le code da cui il Gestore Pipeline riceve i loro segnali
+        sono rimaste vuote per INTERVALLO_DRENAGGIO. Allo scadere di
+        ATTESA_DRENAGGIO la replica viene terminata e staccata comunque.
+
+        Check Draining
+
+        Detaches the draining replicas that are done: their process has ended
+        and the queues from which the Pipeline Manager receives their signals
+        have stayed empty for INTERVALLO_DRENAGGIO. When ATTESA_DRENAGGIO
+        expires the replica is terminated and detached anyway.
+        """
+        adesso = monotonic()
+        for nome,stato in list(self.in_drenaggio.items()):
+            scadenza,vuote_da = stato
+            if adesso >= scadenza:
+                self.registro.warning(type(self).__name__ + " " + nome + \
+                                      " non ha finito di smaltire i segnali") # did not finish draining the signals
+                if vivo(self.operazioni[nome]):
+                    processo_esterno(self.operazioni[nome]).terminate()
+            elif vivo(self.operazioni[nome]) or \
+                 not self.ipc_entrata_operazioni[nome].empty() or \
+                 not self.coda_segnali_entrata_operazioni[nome].empty():
+                stato[1] = None
+                continue
+            elif vuote_da is None or adesso - vuote_da < INTERVALLO_DRENAGGIO:
+                if vuote_da is None:
+                    stato[1] = adesso
+                continue
+            self.stacca_replica(nome)
+    def stacca_replica(self,nome):
+        """
+        Stacca Replica
+
+        Ferma il Gestore Segnali *associato* alla replica (e quello della
+        replica, se è ancora vivo) e la toglie dalla pipeline.
+
+        Detach Replica
+
+        Stops the Signal Manager *associated* with the replica (and the one of
+        the replica, if still alive) and removes it from the pipeline.
+        """
+        inserisci(self.coda_segnali_uscita_operazioni[nome],
+                  ["stop","gestore_segnali",self.nome]) # "stop", "signal_manager"
+        gestore = getattr(self.operazioni[nome],"gestore_segnali",None)
+        if vivo(gestore):
+            processo_esterno(gestore).terminate()
+        for dizionario in (self.operazioni,
+                           self.operazione_di,
+                           self.ipc_entrata_operazioni,
+                           self.lock_ipc_entrata_operazioni,
+                           self.ipc_uscita_operazioni,
+                           self.lock_ipc_uscita_operazioni,
+                           self.coda_segnali_entrata_operazioni,
+                           self.lock_segnali_entrata_operazioni,
+                           self.coda_segnali_uscita_operazioni,
+                           self.lock_segnali_uscita_operazioni,
+                           self.gestore_segnali_operazioni,
+                           self.tempi_avvio,
+                           self.lotti_uscita,
+                           self.posizioni_lotti,
+                           self.in_drenaggio):
+            dizionario.pop(nome,None)
+        for canale in ("ipc_entrata","ipc_uscita","segnali_entrata",
+                       "segnali_uscita"):
+            self.metriche.rimuovi_coda(nome + " " + canale)
+        self.costruisci_tabella_instradamento()
+        self.costruisci_attesa()
+        # Raccoglie i processi figli terminati
+        # Reaps the ended child processes
+        active_children()
+        self.registro.info(type(self).__name__ + " " + nome + " staccata") # detached
+        inserisci(self.coda_segnali_uscita,[nome + " terminata",""]) # finished
     def run(self):
         """Punto d'entrata del processo/thread"""
-        logging.info(type(self).__name__ + " creato")
+        self.registro.info(type(self).__name__ + " creato")
+        # In modalità thread i Gestori Segnali girano nel processo del Gestore
+        # Pipeline e vanno avviati qui
+        # In thread mode the Signal Managers run in the Pipeline Manager
+        # process and must be started here
+        if self.modalita_gestore_segnali == MODALITA_THREAD:
+            self.avvia_gestore_segnali()
+            for nome in self.operazioni:
+                self.avvia_gestore_segnali_operazione(nome)
+        self.metriche.registra_coda("segnali_entrata",self.coda_segnali_entrata)
+        self.metriche.registra_coda("segnali_uscita", self.coda_segnali_uscita)
+        # Il giornale si apre qui, nel processo che vi scrive; i segnali non
+        # confermati vengono ripresi quando le operazioni sono avviate
+        # The journal is opened here, in the process writing to it; the
+        # unacknowledged signals are resumed when the operations are started
+        if self.giornale is not None:
+            self.da_riprendere = self.giornale.apri()
+        self.attendi_pronti()
         # Entra nello stato richiesto
         # Enter the required state
         while True:
-            logging.info(type(self).__name__ + " entrando in " + self.stato)
+            self.registro.info(type(self).__name__ + " entrando in " + self.stato)
             s = getattr(self,self.stato)()
             if isinstance(s,int):
                 if s != 0:
                     break
         return int(s)
+    def attendi_pronti(self):
+        """
+        Attendi Pronti
+
+        Attende che tutte le operazioni abbiano segnalato di essere pronte, al
+        più ATTESA_PRONTO secondi, e registra i tempi di avvio di ciascuna:
+        importazione del modulo, costruzione (code e Gestori Segnali compresi)
+        e avvio del processo fino al segnale di pronto, che va anche
+        nell'istogramma "avvio" delle metriche. Restituisce le operazioni che
+        non hanno risposto.
+
+        Wait Ready
+
+        Waits for all the operations to report they are ready, at most
+        ATTESA_PRONTO seconds, and logs the startup times of each one: module
+        import, construction (queues and Signal Managers included) and process
+        start up to the ready report, which also goes into the "avvio"
+        histogram of the metrics. Returns the operations that did not answer.
+        """
+        # Le operazioni remote si connettono quando il loro nodo è avviato
+        # Remote operations connect when their node is started
+        in_attesa = set(self.operazioni) - set(self.indirizzi_remoti)
+        scadenza  = monotonic() + ATTESA_PRONTO
+        while in_attesa:
+            rimanente = scadenza - monotonic()
+            if rimanente <= 0:
+                break
+            try:
+                nome,pid,istante = self.coda_pronti.get(timeout=rimanente)
+            except Empty:
+                break
+            if nome not in in_attesa:
+                continue
+            in_attesa.discard(nome)
+            self.registra_pronto(nome,pid,istante)
+        for nome in in_attesa:
+            self.registro.warning(type(self).__name__ + " " + nome + \
+                            " non ha segnalato di essere pronto") # did not report it is ready
+        return in_attesa
+    def registra_pronto(self,nome,pid,istante):
+        """
+        Registra Pronto
+
+        Registra i tempi di avvio di un'operazione che ha segnalato di essere
+        pronta (vedi attendi_pronti).
+
+        Record Ready
+
+        Records the startup times of an operation that reported it is ready
+        (see attendi_pronti).
+        """
+        tempi = self.tempi_avvio.get(nome)
+        if tempi is None or "inizio_avvio" not in tempi:
+            return
+        inizio_avvio   = tempi.pop("inizio_avvio")
+        tempi["avvio"] = istante - inizio_avvio
+        self.metriche.registra_latenza("avvio",inizio_avvio,istante)
+        self.registro.info(type(self).__name__ + " " + nome + " pronto (pid " + \
+                     str(pid) + ", " + get_start_method() + "): " + \
+                     ", ".join(fase + " " + format(1000 * durata,".1f") + \
+                               " ms" for fase,durata in tempi.items())) # ready
+    def ricevi_pronti(self):
+        """
+        Ricevi Pronti
+
+        Registra le operazioni pronte dopo l'avvio della pipeline: quelle
+        aggiunte o sostituite e quelle in ritardo.
+
+        Receive Ready
+
+        Records the operations ready after the pipeline start: the added or
+        replaced ones and the late ones.
+        """
+        while True:
+            try:
+                nome,pid,istante = self.coda_pronti.get_nowait()
+            except Empty:
+                return
+            self.registra_pronto(nome,pid,istante)
+    def costruisci_attesa(self):
+        """
+        Costruisci Attesa
+
+        Costruisce l'insieme delle code su cui il Gestore Pipeline attende
+        quando è avviato: la propria Coda Segnali Entrata, quelle di tutte le
+        operazioni e la coda su cui le operazioni segnalano di essere pronte.
+        Va richiamata ogni volta che cambiano le operazioni della pipeline.
+
+        Build Wait
+
+        Builds the set of the queues the Pipeline Manager waits on when
+        started: its own Incoming Signals Queue, the ones of all the
+        operations and the queue on which the operations report they are
+        ready. It must be called again whenever the pipeline operations
+        change.
+        """
+        self.operazioni_code = {id(coda): nome for nome,coda in \
+                                self.coda_segnali_entrata_operazioni.items()}
+        self.attesa          = insieme_attesa(
+                              [self.coda_segnali_entrata] + \
+                              list(self.coda_segnali_entrata_operazioni.values()) + \
+                              [self.coda_pronti])
     def idle(self):
-        logging.info(type(self).__name__ + " idle")
+        self.registro.info(type(self).__name__ + " idle")
 
         pacchetto_segnale_entrata = []
         segnale                   = ""
@@ -232,11 +1362,10 @@ class gestore_pipeline(oggetto):
 
         # Segnala all'esterno che sei in idle
         # It signals to the outside that you are idle
-        with self.lock_segnali_uscita:
-            if not self.coda_segnali_uscita.full():
-                self.coda_segnali_uscita.put_nowait(["idle",""])
+        inserisci(self.coda_segnali_uscita,["idle",""])
         # Attendi il segnale di avvio
         # Wait for the start signal
+        attesa = insieme_attesa([self.coda_segnali_entrata])
         while True:
             pacchetto_segnale_entrata[:] = []
             segnale                      = ""
@@ -244,44 +1373,41 @@ class gestore_pipeline(oggetto):
             destinatario                 = ""
             timestamp                    = 0
 
-            with self.lock_segnali_entrata:
-                if not self.coda_segnali_entrata.empty():
-                    pacchetto_segnale_entrata[:] = \
-                                          self.coda_segnali_entrata.get_nowait()
-            if len(pacchetto_segnale_entrata) == 4:
+            if not self.segnali_sospesi:
+                with self.lock_segnali_entrata:
+                    if not self.coda_segnali_entrata.empty():
+                        self.segnali_sospesi.extend(
+                               elementi(self.coda_segnali_entrata.get_nowait()))
+            if self.segnali_sospesi:
+                pacchetto_segnale_entrata[:] = self.segnali_sospesi.popleft()
+            if len(pacchetto_segnale_entrata) in (4,5):
                 segnale,mittente,destinatario,timestamp = \
-                                                       pacchetto_segnale_entrata
-                logging.info(type(self).__name__)
-                logging.info(pacchetto_segnale_entrata)
-                logging.info(segnale)
+                                                   pacchetto_segnale_entrata[:4]
+                self.registro_segnali.debug("idle %s",pacchetto_segnale_entrata)
             elif len(pacchetto_segnale_entrata) == 3:
                 segnale,mittente,timestamp = pacchetto_segnale_entrata
-                logging.info(type(self).__name__)
-                logging.info(pacchetto_segnale_entrata)
-                logging.info(segnale)
+                self.registro_segnali.debug("idle %s",pacchetto_segnale_entrata)
             elif len(pacchetto_segnale_entrata) == 0:
                 pass
             else:
-                with self.lock_segnali_uscita:
-                    self.coda_segnali_uscita.put_nowait(["segnale mal formato", # badly formed signal
-                                                         ""])
+                inserisci(self.coda_segnali_uscita,["segnale mal formato", # badly formed signal
+                                                     ""])
                 sleep(0.1)
-                logging.info("Gestore Pipeline: Segnale mal formato") # Pipeline Manager: Badly formed signal
+                self.registro.info("Gestore Pipeline: Segnale mal formato") # Pipeline Manager: Badly formed signal
                 pacchetto_segnale_entrata[:] = []
                 continue
             pacchetto_segnale_entrata[:] = []
             if segnale == "":
-                sleep(0.01)
+                attesa.attendi(ATTESA_MASSIMA)
                 continue
             # Se hai ricevuto il segnale di stop
             elif segnale == "stop":
-                with self.lock_segnali_uscita:
-                    self.coda_segnali_uscita.put_nowait(["terminato",""]) # finished
-                    # Invia il segnale di stop anche al tuo Gestore Segnali
-                    # Send the stop signal to your Signal Manager as well
-                    self.coda_segnali_uscita.put_nowait(["stop",
-                                                         "gestore_segnali"]) # signal_manager
-                    # Termina segnalando l'uscita per segnale di stop
+                inserisci(self.coda_segnali_uscita,["terminato",""]) # finished
+                # Invia il segnale di stop anche al tuo Gestore Segnali
+                # Send the stop signal to your Signal Manager as well
+                inserisci(self.coda_segnali_uscita,["stop",
+                                                     "gestore_segnali"]) # signal_manager
+                # Termina segnalando l'uscita per segnale di stop
                 return int(-1)
             else:
                 # Se il segnale è tra i metodi riconosciuti dal Gestore Pipeline
@@ -290,206 +1416,796 @@ class gestore_pipeline(oggetto):
                     s = getattr(self,segnale)()
                     return int(s)
                 else:
-                    with self.lock_segnali_uscita:
-                        self.coda_segnali_uscita.put_nowait( \
-                                                          ["Segnale non valido", # Invalid signal
-                                                           ""])
+                    inserisci(self.coda_segnali_uscita, \
+                                                      ["Segnale non valido", # Invalid signal
+                                                       ""])
                     sleep(0.01)
             ############## Fine ricezione messaggi dall'esterno ################
             ############## End of receiving messages from the outside #################
     def avvia(self):
-        logging.info(type(self).__name__ + " avviato")
+        self.registro.info(type(self).__name__ + " avviato")
 
-        pacchetto_segnale_entrata = []
-        segnale                   = ""
-        mittente                  = ""
-        destinatario              = ""
-        timestamp                 = 0
         richiesta_stop            = False
 
         # Segnala all'esterno che sei avviato
         # Signals externally that you are running
-        with self.lock_segnali_uscita:
-            if not self.coda_segnali_uscita.full():
-                self.coda_segnali_uscita.put_nowait(["avviato",""]) # started
+        inserisci(self.coda_segnali_uscita,["avviato",""]) # started
 
         for nome,operazione in self.operazioni.items():
-            # Manda il segnale di avvio all'operazione.
-            # Send the operation start signal.
-            with self.lock_ipc_uscita_operazioni[nome]:
-                self.ipc_uscita_operazioni[nome].put_nowait("avvia:"  + \
-                                                           str(time()) + ":" + \
-                                                           type(self).__name__ \
-                                                           + ":" + nome) # start
-        with self.lock_segnali_uscita:
-            if not self.coda_segnali_uscita.full():
-                self.coda_segnali_uscita.put_nowait(["pronto",""]) # ready
+            # Manda il segnale di avvio all'operazione tramite il suo Gestore
+            # Segnali, l'unico che usa le code IPC (o il canale remoto)
+            # Send the operation start signal through its Signal Manager, the
+            # only one using the IPC queues (or the remote channel)
+            inserisci(self.coda_segnali_uscita_operazioni[nome],
+                      ["avvia",self.operazione_di[nome],type(self).__name__]) # start
+        self.riprendi_segnali()
+        inserisci(self.coda_segnali_uscita,["pronto",""]) # ready
 
-        while True:
-            pacchetto_segnale_entrata[:] = []
-            segnale                      = ""
-            mittente                     = ""
-            destinatario                 = ""
-            timestamp                    = 0
+        self.costruisci_attesa()
+
+        # Gestisci i segnali arrivati nello stesso lotto del segnale di avvio
+        # Handle the signals arrived in the same batch of the start signal
+        while self.segnali_sospesi:
+            if self.gestisci_segnale_esterno(self.segnali_sospesi.popleft()):
+                richiesta_stop = True
 
+        while True:
             if richiesta_stop:
                 for operazione in self.operazioni:
-                    with self.lock_segnali_uscita:
-                        self.coda_segnali_uscita.put_nowait(["terminando: " + \
-                                                             str(operazione),
-                                                             ""]) # ending
-                    with self.lock_segnali_uscita_operazioni[operazione]:
-                        self.coda_segnali_uscita_operazioni[operazione].put_nowait(["stop",operazione])
-                    with self.lock_segnali_uscita_operazioni[operazione]:
-                        self.coda_segnali_uscita_operazioni[operazione].put_nowait(["stop","gestore_segnali"]) # "stop", "signal_manager"
+                    inserisci(self.coda_segnali_uscita,["terminando: " + \
+                                                         str(operazione),
+                                                         ""]) # ending
+                    # I Gestori Segnali delle operazioni inoltrano solo
+                    # segnali con il mittente
+                    # The operations' Signal Managers only forward signals
+                    # with the sender
+                    inserisci(self.coda_segnali_uscita_operazioni[operazione],
+                              ["stop",self.operazione_di[operazione],self.nome])
+                    inserisci(self.coda_segnali_uscita_operazioni[operazione],
+                              ["stop","gestore_segnali",self.nome]) # "stop", "signal_manager"
                     #self.operazioni[operazione].join()
-                    with self.lock_segnali_uscita:
-                        self.coda_segnali_uscita.put_nowait([str(operazione) + \
-                                                             " terminata",""]) # finished
-                with self.lock_segnali_uscita:
-                    self.coda_segnali_uscita.put_nowait(["stop",
-                                                         "gestore_segnali"]) # "stop","signal_manager"]
+                    inserisci(self.coda_segnali_uscita,[str(operazione) + \
+                                                         " terminata",""]) # finished
+                inserisci(self.coda_segnali_uscita,["stop",
+                                                     "gestore_segnali"]) # "stop","signal_manager"]
+                # In modalità thread i Gestori Segnali delle operazioni
+                # morirebbero con il processo del Gestore Pipeline: attendi
+                # che abbiano inoltrato lo stop
+                # In thread mode the operations' Signal Managers would die
+                # with the Pipeline Manager process: wait for them to forward
+                # the stop
+                if self.modalita_gestore_segnali == MODALITA_THREAD:
+                    for gestore in self.gestore_segnali_operazioni.values():
+                        gestore.join(ATTESA_MASSIMA)
+                self.scrivi_traccia()
+                if self.giornale is not None:
+                    self.giornale.chiudi()
                 return int(-1)
 
-            with self.lock_segnali_entrata:
-                if not self.coda_segnali_entrata.empty():
-                    pacchetto_segnale_entrata[:] = \
-                                          self.coda_segnali_entrata.get_nowait()
-            logging.debug("IPC")
-            logging.debug(pacchetto_segnale_entrata)
-            if len(pacchetto_segnale_entrata) == 4:
-                segnale,mittente,destinatario,timestamp = \
-                                                       pacchetto_segnale_entrata
-                pacchetto_segnale_entrata[:] = []
-            elif len(pacchetto_segnale_entrata) == 3:
-                segnale,mittente,timestamp = pacchetto_segnale_entrata
-                pacchetto_segnale_entrata[:] = []
-            elif len(pacchetto_segnale_entrata) == 0:
-                pass
-            else:
-                with self.lock_segnali_uscita:
-                    self.coda_segnali_uscita.put_nowait(["segnale mal formato", # badly formed signal
-                                                         ""])
-                logging.info("Gestore Pipeline: Segnale mal formato") # Pipeline Manager: Badly formed signal
-                pacchetto_segnale_entrata[:] = []
-                sleep(0.1)
-                continue
+            # Attendi che la Coda Segnali Entrata o una delle code delle
+            # operazioni abbia dei segnali e smaltisci quelle pronte
+            # Wait until the Incoming Signals Queue or one of the operation
+            # queues has signals and drain the ready ones
+            self.profilatore.controlla()
+            timeout = ATTESA_MASSIMA
+            if self.lotti_uscita:
+                timeout = max(0,self.scadenza_lotti - monotonic())
+            if self.file_statistiche is not None:
+                if monotonic() >= self.prossime_statistiche:
+                    self.scrivi_statistiche()
+                timeout = max(0,min(timeout,
+                                    self.prossime_statistiche - monotonic()))
+            if self.giornale is not None:
+                self.giornale.controlla()
+                timeout = max(0,min(timeout,
+                                    self.giornale.scadenza() - monotonic()))
+            if self.in_drenaggio:
+                self.controlla_drenaggio()
+                timeout = min(timeout,INTERVALLO_DRENAGGIO)
+            for coda in self.attesa.attendi(timeout):
+                if coda is self.coda_pronti:
+                    self.ricevi_pronti()
+                elif coda is self.coda_segnali_entrata:
+                    for pacchetto_segnale_entrata in \
+                        self.preleva_segnali(self.coda_segnali_entrata,
+                                             self.lock_segnali_entrata):
+                        if self.gestisci_segnale_esterno(
+                                                    pacchetto_segnale_entrata):
+                            richiesta_stop = True
+                else:
+                    ogg = self.operazioni_code.get(id(coda))
+                    # Coda di una replica staccata mentre si smaltivano le
+                    # altre code pronte
+                    # Queue of a replica detached while draining the other
+                    # ready queues
+                    if ogg is None:
+                        continue
+                    for pacchetto_segnale_entrata in \
+                        self.preleva_segnali(
+                                   coda,
+                                   self.lock_segnali_entrata_operazioni[ogg]):
+                        if self.instrada_segnale(ogg,pacchetto_segnale_entrata):
+                            richiesta_stop = True
+            # Spedisci i lotti pronti: tutti in caso di stop o allo scadere
+            # del ritardo massimo
+            # Ship the ready batches: all of them on stop or when the maximum
+            # delay expires
+            if self.lotti_uscita and \
+               (richiesta_stop or monotonic() >= self.scadenza_lotti):
+                self.spedisci_lotti()
+    def preleva_segnali(self,coda,lock):
+        """
+        Preleva Segnali
 
-            # Se hai ricevuto il segnale di stop
-            if segnale == "stop":
-                # Invia il segnale di stop anche al tuo Gestore Segnali
-                with self.lock_segnali_uscita:
-                    self.coda_segnali_uscita.put_nowait( \
-                                                        ["terminando: " + \
-                                                            type(self).__name__,
-                                                         ""]) # ending
-                richiesta_stop = True
+        Svuota la coda indicata e restituisce la lista dei segnali prelevati,
+        spacchettando i lotti. Il lock è tenuto solo per il tempo del prelievo.
+
+        Take Signals
+
+        Drains the given queue and returns the list of taken signals,
+        unpacking batches. The lock is held only for the time of the drain.
+        """
+        pacchetti = []
+        with lock:
+            while not coda.empty():
+                pacchetti.extend(elementi(coda.get_nowait()))
+        return pacchetti
+    def accoda_segnale(self,nome,inoltro):
+        """
+        Accoda Segnale
+
+        Aggiunge un segnale al lotto in uscita verso l'operazione indicata. Il
+        lotto viene spedito quando è pieno o, al più tardi, allo scadere del
+        ritardo massimo. Un segnale coalescente prende il posto di quello con
+        lo stesso nome e destinatario già nel lotto.
+
+        Queue Signal
+
+        Adds a signal to the outgoing batch towards the given operation. The
+        batch is shipped when it is full or, at the latest, when the maximum
+        delay expires. A coalescing signal takes the place of the one with the
+        same name and recipient already in the batch.
+        """
+        if self.giornale is not None:
+            inoltro = self.giornale.registra(nome,inoltro)
+        if not self.lotti_uscita:
+            self.scadenza_lotti = monotonic() + self.ritardo_massimo_lotto
+        lotto_operazione = self.lotti_uscita.setdefault(nome,[])
+        if inoltro[0] in self.segnali_coalescenti:
+            posizioni = self.posizioni_lotti.setdefault(nome,{})
+            chiave    = (inoltro[0],inoltro[1])
+            if chiave in posizioni:
+                lotto_operazione[posizioni[chiave]] = inoltro
+                self.metriche.conta("coalesciti")
+                return
+            posizioni[chiave] = len(lotto_operazione)
+        lotto_operazione.append(inoltro)
+        if len(lotto_operazione) >= self.lotto_massimo:
+            self.spedisci_lotto(nome)
+    def spedisci_lotto(self,nome):
+        """
+        Spedisci Lotto
+
+        Mette il lotto in uscita verso l'operazione indicata nella sua coda
+        come un unico elemento.
+
+        Ship Batch
+
+        Puts the outgoing batch towards the given operation in its queue as a
+        single item.
+
+        Se la coda è piena e la sua politica è rallenta, il lotto viene
+        scartato e ai mittenti dei suoi segnali viene chiesto di rallentare.
+
+        If the queue is full and its policy is rallenta, the batch is dropped
+        and the senders of its signals are asked to slow down.
+        """
+        lotto_operazione = self.lotti_uscita.pop(nome,None)
+        self.posizioni_lotti.pop(nome,None)
+        if not lotto_operazione:
+            return
+        # I segnali vanno sul disco prima di lasciare il Gestore Pipeline:
+        # una sola sincronizzazione per tutti quelli registrati finora
+        # Signals go to disk before leaving the Pipeline Manager: a single
+        # sync for all the ones recorded so far
+        if self.giornale is not None:
+            self.giornale.consolida()
+        coda = self.coda_segnali_uscita_operazioni[nome]
+        self.metriche.conta("lotti")
+        if tracciamento_attivo():
+            for inoltro in lotto_operazione:
+                if len(inoltro) > 3:
+                    registra_segnale(inoltro[3],self.nome,"spedisci")
+        if inserisci(coda,impacchetta_elementi(lotto_operazione)):
+            return
+        self.metriche.conta("scartati",len(lotto_operazione))
+        self.registro_segnali.debug("coda di %s piena, %d segnali scartati", # queue full, signals dropped
+                                    nome,len(lotto_operazione))
+        if coda.politica != POLITICA_RALLENTA:
+            return
+        for mittente in {inoltro[2] for inoltro in lotto_operazione}:
+            for replica in self.repliche.get(mittente,()):
+                if replica != nome:
+                    inserisci(self.coda_segnali_uscita_operazioni[replica],
+                              ["rallenta",mittente,self.nome])
+    def spedisci_lotti(self):
+        """
+        Spedisci Lotti
+
+        Spedisce tutti i lotti in uscita.
+
+        Ship Batches
+
+        Ships all the outgoing batches.
+        """
+        for nome in list(self.lotti_uscita):
+            self.spedisci_lotto(nome)
+    def gestisci_segnale_esterno(self,pacchetto_segnale_entrata):
+        """
+        Gestisci Segnale Esterno
+
+        Gestisce un segnale arrivato dall'esterno dell'applicazione. Restituisce
+        True se è stato richiesto lo stop della pipeline.
+
+        Handle External Signal
+
+        Handles a signal coming from outside the application. Returns True if
+        the pipeline stop has been requested.
+        """
+        segnale      = ""
+        mittente     = ""
+        destinatario = ""
+        timestamp    = 0
+        estensioni   = None
+        self.registro_segnali.debug("IPC %s",pacchetto_segnale_entrata)
+        if len(pacchetto_segnale_entrata) in (4,5):
+            segnale,mittente,destinatario,timestamp = \
+                                                   pacchetto_segnale_entrata[:4]
+            if len(pacchetto_segnale_entrata) == 5:
+                estensioni = pacchetto_segnale_entrata[4]
+        elif len(pacchetto_segnale_entrata) == 3:
+            segnale,mittente,timestamp = pacchetto_segnale_entrata
+        else:
+            inserisci(self.coda_segnali_uscita,["segnale mal formato", # badly formed signal
+                                                 ""])
+            self.registro.info("Gestore Pipeline: Segnale mal formato") # Pipeline Manager: Badly formed signal
+            self.metriche.conta("mal_formati")
+            return False
+
+        # Lo stop, le statistiche e la profilazione diretti a un'operazione
+        # vengono instradati come gli altri segnali
+        # Stop, statistics and profiling addressed to an operation are routed
+        # like the other signals
+        per_la_pipeline = destinatario in ("",self.nome)
+        # Se hai ricevuto il segnale di stop
+        if segnale == "stop" and per_la_pipeline:
+            # Invia il segnale di stop anche al tuo Gestore Segnali
+            inserisci(self.coda_segnali_uscita, \
+                                                ["terminando: " + \
+                                                    type(self).__name__,
+                                                 ""]) # ending
+            return True
+        if segnale == SEGNALE_STATISTICHE and per_la_pipeline:
+            self.metriche.conta("statistiche")
+            # Risposta del proprio Gestore Segnali o richiesta dall'esterno
+            # Answer of the own Signal Manager or request from the outside
+            if mittente == "gestore_segnali":
+                self.ricevi_statistiche(estensioni)
             else:
-                if destinatario == "":
-                    for (ogg,lock_uscita),                               \
-                        (ogg,coda_segnali_uscita)                        \
-                        in                                               \
-                        zip(self.lock_segnali_uscita_operazioni.items(), \
-                        self.coda_segnali_uscita_operazioni.items()):
-                            with self.lock_segnali_uscita_operazioni[str(ogg)]:
-                                self.coda_segnali_uscita_operazioni[str(ogg)].put_nowait([segnale,destinatario,mittente])
+                self.richiedi_statistiche(esterna=True)
+            return False
+        if segnale == SEGNALE_PROFILA and per_la_pipeline:
+            self.diffondi_profilazione(estensioni)
+            return False
+        if segnale == "esporta_traccia" and destinatario == self.nome:
+            self.scrivi_traccia()
+            return False
+        if segnale in SEGNALI_OPERAZIONI and destinatario == self.nome:
+            self.gestisci_controllo(segnale,estensioni)
+            return False
+        self.metriche.conta("esterni")
+        # Come in instrada_segnale, il Gestore Segnali di una replica accetta
+        # solo segnali diretti alla sua operazione
+        # As in instrada_segnale, the Signal Manager of a replica only accepts
+        # signals addressed to its operation
+        inoltro = [segnale,self.operazione_di.get(destinatario,destinatario),
+                   mittente]
+        if estensioni:
+            inoltro.append(estensioni)
+        if destinatario == "":
+            for repliche in self.diffusione_esterna:
+                self.accoda_segnale(self.destinazione(repliche,mittente,
+                                                      estensioni),
+                                    inoltro)
+            return False
+        # Un segnale diretto a un'operazione (o a una replica) va a una delle
+        # sue repliche attive; uno diretto a un destinatario sconosciuto viene
+        # rifiutato
+        # A signal addressed to an operation (or to a replica) goes to one of
+        # its active replicas; one addressed to an unknown recipient is
+        # rejected
+        destinazioni = self.tabella_instradamento.get(destinatario)
+        if destinazioni is not None:
+            self.accoda_segnale(self.destinazione(destinazioni,mittente,
+                                                  estensioni),
+                                inoltro)
+        elif destinatario != self.nome:
+            self.registro.info("Gestore Pipeline: destinatario sconosciuto " + # Pipeline Manager: unknown recipient
+                               str(destinatario))
+            inserisci(self.coda_segnali_uscita,["segnale non valido",""]) # invalid signal
+        return False
+    def instrada_segnale(self,ogg,pacchetto_segnale_entrata):
+        """
+        Instrada Segnale
 
-            ############## Fine ricezione messaggi dall'esterno ################
-            ########## Comunicazione con le operazioni della pipeline ##########
-            # Per ogni operazione
-            ############## End of receiving messages from the outside #################
-            ########## Communicating with Pipeline Operations ##########
-            # For each operation
-            for (ogg,lock_entrata),                               \
-                (ogg,coda_segnali_entrata),                       \
-                (ogg,lock_uscita),                                \
-                (ogg,coda_segnali_uscita)                         \
-                in                                                \
-                zip(self.lock_segnali_entrata_operazioni.items(), \
-                self.coda_segnali_entrata_operazioni.items(),     \
-                self.lock_segnali_uscita_operazioni.items(),      \
-                self.coda_segnali_uscita_operazioni.items()):
-                #TODO: CONTROLLA DA QUI
-                #TODO: CHECK IT FROM HERE
-                pacchetto_segnale_entrata[:] = []
-                segnale                   = ""
-                mittente                  = ""
-                destinatario              = ""
-                timestamp                 = 0
-                logging.debug(id(coda_segnali_entrata))
-                # Leggi l'eventuale segnale dall'operazione
-                # Read any signal from the operation
-                with lock_entrata:
-                    if not coda_segnali_entrata.empty():
-                        pacchetto_segnale_entrata[:] = \
-                         coda_segnali_entrata.get_nowait()
-                logging.debug(ogg)
-                logging.debug(pacchetto_segnale_entrata)
-                if len(pacchetto_segnale_entrata) == 4:
-                    segnale,mittente,destinatario,timestamp = \
-                                                   pacchetto_segnale_entrata
-                    pacchetto_segnale_entrata[:] = []
-                elif len(pacchetto_segnale_entrata) == 3:
-                    segnale,mittente,timestamp = pacchetto_segnale_entrata
-                    pacchetto_segnale_entrata[:] = []
-                elif len(pacchetto_segnale_entrata) == 0:
-                    sleep(0.01)
-                    continue
+        Instrada un segnale ricevuto dall'operazione ogg verso il suo
+        destinatario. Restituisce True se è stato richiesto lo stop della
+        pipeline.
+
+        Route Signal
+
+        Routes a signal received from the operation ogg towards its recipient.
+        Returns True if the pipeline stop has been requested.
+        """
+        segnale      = ""
+        mittente     = ""
+        destinatario = ""
+        timestamp    = 0
+        estensioni   = None
+        self.registro_segnali.debug("%s %s",ogg,pacchetto_segnale_entrata)
+        if len(pacchetto_segnale_entrata) in (4,5):
+            segnale,mittente,destinatario,timestamp = \
+                                                   pacchetto_segnale_entrata[:4]
+            if len(pacchetto_segnale_entrata) == 5:
+                estensioni = pacchetto_segnale_entrata[4]
+        elif len(pacchetto_segnale_entrata) == 3:
+            segnale,mittente,timestamp = pacchetto_segnale_entrata
+        else:
+            inserisci(self.coda_segnali_uscita, \
+                                     ["segnale mal formato",""]) # badly formed signal
+            inserisci(self.coda_segnali_uscita_operazioni[ogg], \
+                                     ["segnale mal formato",""]) # badly formed signal
+            self.registro.info("Gestore Pipeline: Segnale mal formato") # Pipeline Manager: Badly formed signal
+            self.metriche.conta("mal_formati")
+            return False
+        # Latenza dall'operazione fino all'instradamento
+        # Latency from the operation up to routing
+        self.metriche.registra_latenza(ogg,timestamp)
+        self.metriche.conta("instradati")
+        registra_segnale(estensioni,self.nome,"instrada")
+        # Segnale da inoltrare, nel formato atteso dai Gestori Segnali delle
+        # operazioni
+        # Signal to forward, in the format expected by the operations' Signal
+        # Managers
+        # Il Gestore Segnali di una replica accetta solo segnali diretti alla
+        # sua operazione
+        # The Signal Manager of a replica only accepts signals addressed to
+        # its operation
+        inoltro = [segnale,self.operazione_di.get(destinatario,destinatario),
+                   mittente]
+        if estensioni:
+            inoltro.append(estensioni)
+        # Se il destinatario è una delle operazioni (o una replica), la tabella di
+        # instradamento dà direttamente le code su cui inoltrare il segnale
+        # If the recipient is one of the operations (or a replica), the routing table
+        # directly gives the queues to forward the signal to
+        destinazioni = self.tabella_instradamento.get(destinatario)
+        if destinazioni is not None:
+            self.accoda_segnale(self.destinazione(destinazioni,
+                                                  mittente,
+                                                  estensioni),
+                                inoltro)
+        # Se il destinatario è "broadcast"
+        # If the recipient is "broadcast"
+        elif destinatario == "":
+            # Inoltra il segnale ai successori dell'operazione, o a tutte le
+            # altre operazioni se la topologia non ha archi
+            # Forwards the signal to the successors of the operation, or to
+            # all the other operations if the topology has no edges
+            for repliche in self.diffusione[ogg]:
+                self.accoda_segnale(self.destinazione(repliche,
+                                                      mittente,
+                                                      estensioni),
+                                    inoltro)
+            if segnale == "stop":
+                return True
+        # Se il destinatario è il Gestore Pipeline
+        # If the recipient is the Pipeline Manager
+        elif destinatario == self.nome:
+            if segnale == "stop":
+                return True
+            elif segnale == SEGNALE_STATISTICHE:
+                # Risposta di un Gestore Segnali o richiesta dell'operazione
+                # Answer of a Signal Manager or request of the operation
+                if mittente == "gestore_segnali":
+                    self.ricevi_statistiche(estensioni)
+                elif richiesta(mittente,estensioni) is not None:
+                    self.rispondi_operazione(ogg,estensioni,
+                                             self.metriche.istantanea())
                 else:
-                    with self.lock_segnali_uscita:
-                        self.coda_segnali_uscita.put_nowait( \
-                                                 ["segnale mal formato",""]) # badly formed signal
-                    with lock_uscita:
-                        coda_segnali_uscita.put_nowait(["segnale mal formato", # badly formed signal
-                                                        ""])
-                    logging.info("Gestore Pipeline: Segnale mal formato") # Pipeline Manager: Badly formed signal
-                    pacchetto_segnale_entrata[:] = []
-                    sleep(0.01)
+                    self.accoda_segnale(ogg,[segnale,mittente,self.nome,
+                                             self.metriche.estensioni()])
+            elif segnale in SEGNALI_OPERAZIONI:
+                esito = self.gestisci_controllo(segnale,estensioni)
+                if richiesta(mittente,estensioni) is not None:
+                    self.rispondi_operazione(ogg,estensioni,esito,
+                                             None if esito is not None \
+                                             else "segnale non valido") # invalid signal
+            elif segnale == SEGNALE_CONFERMA:
+                if self.giornale is not None and estensioni:
+                    self.giornale.conferma(ogg,estensioni.get(CHIAVE_SEQUENZA,-1))
+            elif segnale == "lista_operazioni":
+                self.rispondi_operazione(ogg,estensioni,list(self.operazioni))
+            elif richiesta(mittente,estensioni) is not None:
+                # Una richiesta non deve restare senza risposta fino alla
+                # scadenza
+                # A request must not stay unanswered until its deadline
+                self.rispondi_operazione(ogg,estensioni,
+                                         errore="segnale non valido") # invalid signal
+        return False
+    def rispondi_operazione(self,ogg,estensioni,valore=None,errore=None):
+        """
+        Rispondi Operazione
+
+        Risponde con il segnale "risposta" alla replica ogg che ha inviato una
+        richiesta al Gestore Pipeline, con la correlazione della richiesta se
+        c'è (vedi richieste).
+
+        Answer Operation
+
+        Answers with the "risposta" signal the replica ogg that sent a request
+        to the Pipeline Manager, with the correlation of the request if any
+        (see richieste).
+        """
+        correlazione = (estensioni or {}).get(CHIAVE_CORRELAZIONE)
+        self.accoda_segnale(ogg,[SEGNALE_RISPOSTA,self.operazione_di[ogg],
+                                 self.nome,
+                                 estensioni_risposta(correlazione,valore,
+                                                     errore)])
+    def riprendi_segnali(self):
+        """
+        Riprendi Segnali
+
+        Rispedisce i segnali del giornale non confermati nell'esecuzione
+        precedente, prima di qualsiasi segnale nuovo. Un segnale diretto a una
+        replica che non esiste più va a una replica della stessa operazione.
+
+        Resume Signals
+
+        Ships again the journal signals left unacknowledged in the previous
+        run, before any new signal. A signal addressed to a replica that does
+        not exist anymore goes to a replica of the same operation.
+        """
+        da_riprendere,self.da_riprendere = self.da_riprendere,[]
+        for destinatario,inoltro in da_riprendere:
+            nome = destinatario
+            if nome not in self.operazioni:
+                repliche = self.repliche.get(
+                                  destinatario.split(SEPARATORE_REPLICA)[0])
+                if not repliche:
+                    self.registro.warning("giornale: %s non esiste più, " + # does not exist anymore, signal dropped
+                                          "segnale %s scartato",
+                                          destinatario,inoltro[0])
+                    self.giornale.riprendi(destinatario,None,inoltro)
                     continue
-                logging.debug("Gestore Pipeline " + \
-                              segnale       + " " + \
-                              mittente      + " " + \
-                              destinatario  + " " + \
-                              str(timestamp)) # Pipeline Manager
-                sleep(0.001)
-                # Se il destinatario è il Gestore Pipeline
-                # If the recipient is the Pipeline Manager
-                if str(destinatario) == type(self).__name__:
-                    if segnale == "stop":
-                        richiesta_stop = True
-                        break
-                    elif segnale == "lista_operazioni":
-                        ops = ""
-                        prima_operazione = 1
-                        for op in self.operazioni:
-                            if prima_operazione == 1:
-                                ops = str(op)
-                                prima_operazione = 0
-                            else:
-                                ops = ops + "," + str(op)
-                        with self.lock_segnali_uscita_operazioni[ogg]:
-                            self.coda_segnali_uscita_operazioni[ogg].put_nowait([ops,destinatario,mittente])
-                # Se il destinatario è una delle altre operazioni
-                # If the recipient is one of the other operations
-                elif str(destinatario) in self.operazioni:
-                    # Inoltra il segnale a quella specifica operazione
-                    # Forwards the signal to that specific operation
-                    with self.lock_segnali_uscita_operazioni[str(destinatario)]:
-                        self.coda_segnali_uscita_operazioni[str(destinatario)].put_nowait([segnale,destinatario,mittente])
-                # Se il destinatario è "broadcast"
-                # If the recipient is "broadcast"
-                elif str(destinatario) == "":
-                    # Inoltra il segnale a tutte le altre operazioni
-                    # Forwards the signal to all other operations
-                    for operazione in self.operazioni:
-                        if operazione == ogg:
-                            continue
-                        else:
-                            with self.lock_segnali_uscita_operazioni[str(operazione)]:
-                                self.coda_segnali_uscita_operazioni[str(operazione)].put_nowait([segnale,destinatario,mittente])
-                        sleep(0.01)
-                    if segnale == "stop":
-                        richiesta_stop = True
-            ############## Fine comunicazione con le operazioni ################
-            ############## End of communication with operations #################
-            sleep(0.01)
+                nome = self.destinazione(repliche,inoltro[2],inoltro[3])
+            self.giornale.riprendi(destinatario,nome,inoltro)
+            if not self.lotti_uscita:
+                self.scadenza_lotti = monotonic() + self.ritardo_massimo_lotto
+            self.lotti_uscita.setdefault(nome,[]).append(inoltro)
+        if da_riprendere:
+            self.registro.info("giornale: %d segnali ripresi", # signals resumed
+                               len(da_riprendere))
+            self.spedisci_lotti()
+    def richiedi_statistiche(self,esterna=False):
+        """
+        Richiedi Statistiche
+
+        Chiede l'istantanea delle metriche al proprio Gestore Segnali e a
+        quelli di tutte le operazioni, da entrambi i lati delle code IPC. Le
+        risposte arrivano come segnali "statistiche" (vedi
+        ricevi_statistiche). Se la richiesta viene dall'esterno, l'istantanea
+        del Gestore Pipeline viene inviata subito.
+
+        Request Statistics
+
+        Asks the metrics snapshot to the own Signal Manager and to the ones of
+        all the operations, on both sides of the IPC queues. The answers
+        arrive as "statistiche" signals (see ricevi_statistiche). If the
+        request comes from the outside, the snapshot of the Pipeline Manager
+        is sent right away.
+        """
+        if esterna:
+            self.scadenza_statistiche_esterne = monotonic() + ATTESA_MASSIMA
+            inserisci(self.coda_segnali_uscita,[SEGNALE_STATISTICHE,"",
+                                                self.metriche.estensioni()])
+        inserisci(self.coda_segnali_uscita,[SEGNALE_STATISTICHE,
+                                            "gestore_segnali"])
+        for nome in self.operazioni:
+            inserisci(self.coda_segnali_uscita_operazioni[nome],
+                      [SEGNALE_STATISTICHE,"gestore_segnali",self.nome])
+    def ricevi_statistiche(self,estensioni):
+        """
+        Ricevi Statistiche
+
+        Conserva l'istantanea ricevuta da un Gestore Segnali e, se c'è una
+        richiesta esterna in corso, la inoltra all'esterno.
+
+        Receive Statistics
+
+        Keeps the snapshot received from a Signal Manager and, if an external
+        request is in progress, forwards it outside.
+        """
+        if not estensioni or CHIAVE_METRICHE not in estensioni:
+            return
+        istantanea = json.loads(estensioni[CHIAVE_METRICHE])
+        self.ultime_statistiche[istantanea["componente"] + ":" + \
+                                str(istantanea["pid"])] = istantanea
+        if monotonic() < self.scadenza_statistiche_esterne:
+            inserisci(self.coda_segnali_uscita,[SEGNALE_STATISTICHE,"",
+                                                estensioni])
+    def scrivi_statistiche(self):
+        """
+        Scrivi Statistiche
+
+        Scrive nel file delle statistiche l'istantanea del Gestore Pipeline e
+        le ultime ricevute dai Gestori Segnali, poi ne chiede di nuove.
+
+        Write Statistics
+
+        Writes to the statistics file the snapshot of the Pipeline Manager and
+        the last ones received from the Signal Managers, then asks for new
+        ones.
+        """
+        self.prossime_statistiche = monotonic() + self.intervallo_statistiche
+        try:
+            scrivi_istantanee(self.file_statistiche,
+                              [self.metriche.istantanea()] + \
+                              list(self.ultime_statistiche.values()))
+        except OSError as e:
+            self.registro.warning(type(self).__name__ + " " + \
+                            self.file_statistiche + ": " + str(e))
+        self.richiedi_statistiche()
+    def diffondi_profilazione(self,estensioni=None):
+        """
+        Diffondi Profilazione
+
+        Avvia la profilazione del Gestore Pipeline e la chiede a tutte le
+        operazioni (a tutte le repliche) con il segnale "profila". Con
+        l'estensione "gestori_segnali" vera la chiede anche a tutti i Gestori
+        Segnali. Le estensioni descrivono la profilazione (vedi profilatore).
+
+        Spread Profiling
+
+        Starts the profiling of the Pipeline Manager and asks it to every
+        operation (to every replica) with the "profila" signal. With the
+        "gestori_segnali" extension true it asks it to every Signal Manager
+        too. The extensions describe the profiling (see profilatore).
+        """
+        estensioni = dict(estensioni or {})
+        gestori    = bool(estensioni.pop("gestori_segnali",False))
+        self.avvia_profilazione(estensioni)
+        if gestori:
+            inserisci(self.coda_segnali_uscita,[SEGNALE_PROFILA,
+                                                "gestore_segnali",estensioni])
+        for nome in self.operazioni:
+            coda = self.coda_segnali_uscita_operazioni[nome]
+            inserisci(coda,[SEGNALE_PROFILA,self.operazione_di[nome],
+                            self.nome,estensioni])
+            if gestori:
+                inserisci(coda,[SEGNALE_PROFILA,"gestore_segnali",
+                                self.nome,estensioni])
+    def scrivi_traccia(self):
+        """
+        Scrivi Traccia
+
+        Esporta gli eventi del buffer di tracciamento nel file della traccia,
+        se è stato indicato.
+
+        Write Trace
+
+        Exports the events of the tracing buffer to the trace file, if one has
+        been given.
+        """
+        if self.file_traccia is None or not tracciamento_attivo():
+            return
+        try:
+            segnali = esporta_chrome(self.file_traccia)
+        except OSError as e:
+            self.registro.warning(type(self).__name__ + " " + \
+                                  self.file_traccia + ": " + str(e))
+            return
+        self.registro.info(type(self).__name__ + " traccia di " + \
+                           str(segnali) + " segnali esportata in " + \
+                           self.file_traccia) # trace of signals exported to
+    def costruisci_tabella_instradamento(self):
+        """
+        Costruisci Tabella Instradamento
+
+        Precalcola, per ogni destinatario, le repliche tra cui distribuire i
+        segnali e, per ogni replica, le repliche che ricevono i suoi
+        segnali broadcast: quelle dei successori se la topologia ha archi (vedi
+        compila_topologia), altrimenti tutte le altre. Va richiamata ogni volta
+        che cambiano le operazioni della pipeline.
+
+        Build Routing Table
+
+        Precomputes, for every recipient, the replicas across which the
+        signals are spread and, for every replica, the replicas that receive
+        its broadcast signals: the ones of the successors if the topology has
+        edges (see compila_topologia), all the other ones otherwise. It must
+        be called again whenever the pipeline operations change.
+        """
+        self.tabella_instradamento = dict(self.repliche)
+        # Ogni replica si raggiunge anche direttamente con il suo nome, come
+        # fanno le risposte alle richieste (vedi richieste)
+        # Every replica is also reached directly by its name, as the
+        # responses to requests do (see richieste)
+        for nome in self.operazioni:
+            self.tabella_instradamento.setdefault(nome,(nome,))
+        attive                     = [nome for nome in self.operazioni \
+                                      if nome not in self.in_drenaggio]
+        # I segnali broadcast dall'esterno sono segnali di controllo e vanno
+        # sempre a tutte le operazioni
+        # Broadcast signals from the outside are control signals and always
+        # go to every operation
+        self.diffusione_esterna    = tuple((operazione,) \
+                                           for operazione in attive)
+        # Le repliche in drenaggio diffondono i loro segnali come prima della
+        # rimozione, tranne che alle repliche ormai staccate
+        # The draining replicas spread their signals as before the removal,
+        # except to the replicas already detached
+        diffusione                 = {}
+        for nome in self.in_drenaggio:
+            gruppi = (tuple(replica for replica in repliche \
+                            if replica in self.operazioni) \
+                      for repliche in self.diffusione.get(nome,()))
+            diffusione[nome] = tuple(repliche for repliche in gruppi if repliche)
+        if self.successori is None:
+            diffusione.update({nome: tuple((operazione,) \
+                                           for operazione in attive \
+                                           if operazione != nome) \
+                               for nome in attive})
+        else:
+            # Con la topologia ogni successore riceve il segnale una volta
+            # sola, su una delle sue repliche
+            # With the topology every successor receives the signal only
+            # once, on one of its replicas
+            diffusione.update({nome: tuple(self.repliche[successore] \
+                                           for successore in \
+                                   self.successori[self.operazione_di[nome]]) \
+                               for nome in attive})
+        self.diffusione            = diffusione
+    def compila_topologia(self):
+        """
+        Compila Topologia
+
+        Controlla gli archi dichiarati in pipeline.conf e li compila nei
+        successori di ogni operazione. Solleva ValueError se un arco riguarda
+        un'operazione non dichiarata o se il grafo ha un ciclo. Senza archi
+        non fa nulla.
+
+        Compile Topology
+
+        Checks the edges declared in pipeline.conf and compiles them into the
+        successors of every operation. Raises ValueError if an edge involves
+        an undeclared operation or if the graph has a cycle. With no edges it
+        does nothing.
+        """
+        if not self.archi:
+            self.successori        = None
+            self.ordine_topologico = tuple(self.repliche)
+            return
+        for operazione,successori in self.archi.items():
+            for nome in [operazione] + successori:
+                if nome not in self.repliche:
+                    raise ValueError("Arco con un'operazione non dichiarata: " + \
+                                     nome) # Edge with an undeclared operation
+        successori = {operazione: tuple(dict.fromkeys(
+                                               self.archi.get(operazione,())))
+                      for operazione in self.repliche}
+        # Ordine topologico (algoritmo di Kahn): se qualche operazione resta
+        # fuori, il grafo ha un ciclo
+        # Topological order (Kahn's algorithm): if some operation is left out,
+        # the graph has a cycle
+        entranti = {operazione: 0 for operazione in successori}
+        for operazione in successori:
+            for successore in successori[operazione]:
+                entranti[successore] += 1
+        pronte = [operazione for operazione in successori \
+                  if entranti[operazione] == 0]
+        ordine = []
+        while pronte:
+            operazione = pronte.pop(0)
+            ordine.append(operazione)
+            for successore in successori[operazione]:
+                entranti[successore] -= 1
+                if entranti[successore] == 0:
+                    pronte.append(successore)
+        if len(ordine) < len(successori):
+            raise ValueError("La topologia ha un ciclo tra: " + \
+                             ", ".join(operazione for operazione in successori \
+                                       if operazione not in ordine)) # The topology has a cycle among
+        collegate = set(self.archi) | {successore for successori_operazione \
+                                       in self.archi.values() \
+                                       for successore in successori_operazione}
+        for operazione in ordine:
+            if operazione not in collegate:
+                self.registro.warning(type(self).__name__ + " " + operazione + \
+                                      " non è collegata a nessun'altra " + \
+                                      "operazione") # is not connected to any other operation
+        self.successori        = successori
+        self.ordine_topologico = tuple(ordine)
+    def destinazione(self,repliche,mittente,estensioni):
+        """
+        Destinazione
+
+        La replica, tra quelle di un'operazione, a cui inoltrare un segnale.
+
+        Destination
+
+        The replica, among the ones of an operation, to forward a signal to.
+        """
+        if len(repliche) == 1:
+            return repliche[0]
+        return self.scegli_replica(self.operazione_di[repliche[0]],
+                                   repliche,mittente,estensioni)
+    def scegli_replica(self,operazione,repliche,mittente,estensioni):
+        """
+        Scegli Replica
+
+        Sceglie la replica dell'operazione a cui inoltrare un segnale, secondo
+        la politica di bilanciamento dell'operazione:
+        -) round_robin: a turno;
+        -) coda_minima: la replica con meno segnali in attesa nelle code del
+           Gestore Pipeline verso di essa;
+        -) affinita: sempre la stessa replica per la stessa chiave,
+           l'estensione "chiave" del segnale o, se manca, il mittente.
+
+        Choose Replica
+
+        Chooses the replica of the operation to forward a signal to,
+        according to the balancing policy of the operation:
+        -) round_robin: in turn;
+        -) coda_minima: the replica with the fewest signals waiting in the
+           Pipeline Manager queues towards it;
+        -) affinita: always the same replica for the same key, the "chiave"
+           extension of the signal or, if missing, the sender.
+        """
+        politica = self.bilanciamento.get(operazione,
+                                          self.bilanciamento.get("",
+                                                                 BILANCIAMENTO_ROUND_ROBIN))
+        if politica == BILANCIAMENTO_AFFINITA:
+            chiave = mittente
+            if estensioni and CHIAVE_AFFINITA in estensioni:
+                chiave = estensioni[CHIAVE_AFFINITA]
+            return repliche[crc32(str(chiave).encode()) % len(repliche)]
+        if politica == BILANCIAMENTO_CODA_MINIMA:
+            return min(repliche,key=self.profondita_coda)
+        turno                  = self.turni.get(operazione,0)
+        self.turni[operazione] = (turno + 1) % len(repliche)
+        return repliche[turno]
+    def profondita_coda(self,nome):
+        """
+        Profondità Coda
+
+        Segnali in attesa verso l'operazione: quelli nel lotto in uscita più
+        gli elementi nelle code verso il suo Gestore Segnali e verso
+        l'operazione.
+
+        Queue Depth
+
+        Signals waiting towards the operation: the ones in the outgoing batch
+        plus the items in the queues towards its Signal Manager and towards
+        the operation.
+        """
+        profondita = len(self.lotti_uscita.get(nome,()))
+        for coda in (self.coda_segnali_uscita_operazioni[nome],
+                     self.ipc_uscita_operazioni[nome]):
+            try:
+                profondita += coda.qsize()
+            except NotImplementedError:
+                # qsize() non è disponibile su macOS
+                # qsize() is not available on macOS
+                pass
+        return profondita
@@ -8,11 +8,57 @@ Commons, PO Box 1866, Mountain View, CA 94042, USA.
 """
 
 from multiprocessing import Process
-from time            import sleep,time
+from threading       import Thread
+from time            import sleep,monotonic,time
 
 import logging
 
+#Framework
+from code_segnali    import insieme_attesa,elementi,impacchetta_elementi,\
+                            inserisci,corsia_segnale,PRIORITA_PREDEFINITA
+from formato_segnale import impacchetta,impacchetta_lotto,spacchetta_messaggio,\
+                            segnale_mal_formato,segnale_non_codificabile
+from registro        import registro_segnali
+from tracciamento    import tracciamento_attivo,registra_segnale,\
+                            CHIAVE_TRACCIA
+from metriche        import metriche,SEGNALE_STATISTICHE
+from profilatore     import profilatore,SEGNALE_PROFILA
+from avvio           import stato_processo,ripristina_processo
+
 ATTESA_CICLO_PRINCIPALE = 0.001
+# Modalità di esecuzione del Gestore Segnali: come processo separato o come
+# thread all'interno del processo dell'oggetto padre
+# Execution modes of the Signal Manager: as a separate process or as a thread
+# inside the process of the parent object
+MODALITA_PROCESSO       = "processo"
+MODALITA_THREAD         = "thread"
+# Tempo massimo di sospensione in attesa di segnali: limita solo la frequenza
+# con cui il ciclo si risveglia quando non succede nulla
+# Maximum sleep time while waiting for signals: it only bounds how often the
+# loop wakes up when nothing happens
+ATTESA_MASSIMA          = 1.0
+# Numero massimo predefinito di segnali raccolti in un unico messaggio e
+# ritardo massimo predefinito (in secondi) aggiunto dal raggruppamento: con
+# ritardo nullo si raggruppano solo i segnali già in coda
+# Default maximum number of signals gathered in a single message and default
+# maximum delay (in seconds) added by batching: with no delay only the signals
+# already queued are batched
+LOTTO_MASSIMO           = 64
+RITARDO_MASSIMO_LOTTO   = 0.0
+# Con dei segnali coalescenti, lotti che possono attendere nella Coda Segnali
+# in Entrata (gli altri segnali restano nel Gestore Segnali, dove quelli
+# superati possono essere sostituiti) e intervallo con cui si controlla se
+# l'oggetto li ha prelevati: raddoppia finché l'oggetto resta occupato, ma
+# solo fino a pochi millisecondi, perché è anche il ritardo con cui arriva
+# l'ultimo valore trattenuto
+# With coalescing signals, batches that can wait in the Incoming Signals Queue
+# (the other signals stay in the Signal Manager, where the superseded ones can
+# be replaced) and interval at which it is checked whether the object has
+# taken them: it doubles while the object stays busy, but only up to a few
+# milliseconds, since it is also the delay of the last held value
+LOTTI_IN_ATTESA                 = 2
+INTERVALLO_COALESCENZA          = 0.001
+INTERVALLO_COALESCENZA_MASSIMO  = 0.008
 
 class gestore_segnali(Process):
     """
@@ -25,6 +71,8 @@ class gestore_segnali(Process):
     Formato segnale: segnale:timestamp:[estensioni]
     Estensioni implementate: mittente:destinatario
     Formato segnale completo: segnale:timestamp:mittente:destinatario
+    Sulle code IPC i segnali viaggiano nel formato binario descritto in
+    formato_segnale; il vecchio formato testuale è ancora accettato in entrata.
 
     Fondamentalmente fa da "cuscinetto" tra il canale di comunicazione tra gli
     altri oggetti e l'oggetto stesso. La struttura di base è: canale di
@@ -45,6 +93,8 @@ class gestore_segnali(Process):
     Signal Format: Signal: Timestamp: [Extensions]
     Extensions implemented: sender: recipient
     Full signal format: signal: timestamp: sender: recipient
+    On the IPC queues signals travel in the binary format described in
+    formato_segnale; the old text format is still accepted on input.
 
     Basically it acts as a "buffer" between the communication channel between
     other objects and the object itself. The basic structure is: channel of
@@ -69,7 +119,13 @@ class gestore_segnali(Process):
                  coda_segnali_uscita,
                  lock_segnali_uscita,
                  controlla_destinatario = True,
-                 inoltra                = False):
+                 inoltra                = False,
+                 attesa_bloccante       = True,
+                 modalita               = MODALITA_PROCESSO,
+                 lotto_massimo          = LOTTO_MASSIMO,
+                 ritardo_massimo_lotto  = RITARDO_MASSIMO_LOTTO,
+                 nome                   = None,
+                 coalescenti            = ()):
         """
         Inizializza
 
@@ -81,7 +137,16 @@ class gestore_segnali(Process):
         """
 
         super().__init__()
-        logging.info(type(self).__name__ + " inizializzazione") # initialization
+        # Logger del Gestore Segnali e dei suoi record per singolo segnale,
+        # "gestore_segnali.<padre>" (vedi registro)
+        # Logger of the Signal Manager and of its per signal records,
+        # "gestore_segnali.<padre>" (see registro)
+        nome_registro             = type(self).__name__ + "." + str(padre)
+        if nome is not None and str(nome) != str(padre):
+            nome_registro        += "." + str(nome)
+        self.registro             = logging.getLogger(nome_registro)
+        self.registro_segnali     = registro_segnali(nome_registro)
+        self.registro.info(type(self).__name__ + " inizializzazione") # initialization
         ################# Inizializzazione Gestore Segnali ####################
         # Interfaccia con i processi esterni
         ################## Initialization of the Signal Manager #####################
@@ -109,13 +174,6 @@ class gestore_segnali(Process):
                                      "mittente":     "", # sender
                                      "destinatario": ""  # recipient
                                     }
-        # Segnale in entrata attualmente gestito
-        self.segnale_entrata      = {
-                                     "segnale":      "", # signal
-                                     "mittente":     "", # sender
-                                     "destinatario": "", # recipient
-                                     "timestamp":    0 
-                                    }
         # Effettivamente un workaround: serve per dire al gestore segnali se
         # deve inoltrare o meno i segnali che riceve ma non sono indirizzati
         # all'oggetto
@@ -124,18 +182,110 @@ class gestore_segnali(Process):
         # to the object
         self.controlla_destinatario = controlla_destinatario
         self.inoltra                = inoltra
+        # Se vero, il Gestore Segnali si sospende finché una delle code non ha
+        # dei dati invece di interrogarle ciclicamente con delle sleep
+        # If true, the Signal Manager sleeps until one of the queues has data
+        # instead of polling them cyclically with sleeps
+        self.attesa_bloccante       = attesa_bloccante
+        # In modalità thread il Gestore Segnali gira nel processo che lo
+        # avvia e le code verso l'oggetto possono essere code locali
+        # In thread mode the Signal Manager runs in the process that starts
+        # it and the queues towards the object can be local queues
+        if modalita not in (MODALITA_PROCESSO,MODALITA_THREAD):
+            raise ValueError("Modalità Gestore Segnali non valida: " + \
+                             str(modalita)) # Invalid Signal Manager mode
+        self.modalita               = modalita
+        self.thread                 = None
+        # Numero massimo di segnali per messaggio e ritardo massimo che un
+        # segnale in uscita può attendere che il lotto si riempia
+        # Maximum number of signals per message and maximum delay an outgoing
+        # signal can wait for the batch to fill up
+        self.lotto_massimo          = max(1,int(lotto_massimo))
+        self.ritardo_massimo_lotto  = float(ritardo_massimo_lotto)
+        # Trame in attesa di essere spedite e segnali in attesa di essere
+        # consegnati all'oggetto
+        # Frames waiting to be shipped and signals waiting to be delivered to
+        # the object
+        self.trame_uscita           = []
+        self.corsie_uscita          = [] # corsia di ogni trama - # lane of every frame
+        self.tracce_uscita          = [] # tracce nel lotto - # traces in the batch
+        self.scadenza_lotto         = 0
+        self.segnali_entrata        = []
+        # Segnali di cui conta solo l'ultimo valore: finché uno è in attesa
+        # nel Gestore Segnali, uno più recente con lo stesso nome e
+        # destinatario ne prende il posto. I segnali in entrata restano qui
+        # finché l'oggetto è occupato, tranne quelli delle corsie di
+        # controllo, che gli vengono consegnati subito
+        # Signals of which only the latest value matters: while one is waiting
+        # in the Signal Manager, a newer one with the same name and recipient
+        # takes its place. Incoming signals stay here while the object is
+        # busy, except the ones of the control lanes, which are delivered to
+        # it at once
+        self.coalescenti            = frozenset(coalescenti)
+        self.segnali_urgenti        = []
+        self.attesa_entrata         = {} # (segnale,destinatario): segnale - # (signal,recipient): signal
+        self.posizioni_uscita       = {} # (segnale,destinatario): posizione - # (signal,recipient): position
+        self.intervallo_coalescenza = INTERVALLO_COALESCENZA
+        # Metriche del Gestore Segnali, riportate con il segnale "statistiche".
+        # Il nome distingue i Gestori Segnali di uno stesso padre
+        # Metrics of the Signal Manager, reported with the "statistiche"
+        # signal. The name tells apart the Signal Managers of the same parent
+        componente                  = type(self).__name__ + " " + self.padre
+        if nome is not None and str(nome) != self.padre:
+            componente             += "/" + str(nome)
+        self.metriche               = metriche(componente)
+        self.metriche.registra_coda("ipc_entrata",    coda_ipc_entrata)
+        self.metriche.registra_coda("ipc_uscita",     coda_ipc_uscita)
+        self.metriche.registra_coda("segnali_entrata",coda_segnali_entrata)
+        self.metriche.registra_coda("segnali_uscita", coda_segnali_uscita)
+        # Profilatore avviato dal segnale "profila"
+        # Profiler started by the "profila" signal
+        self.profilatore            = profilatore(componente)
 
         # Stato iniziale
         self.stato                = "idle"
 
-        logging.info(type(self).__name__ + " " + self.padre + " inizializzato") # initialized
+        self.registro.info(type(self).__name__ + " " + self.padre + " inizializzato") # initialized
         ############## Fine Inizializzazione Gestore Segnali ##################
+    def start(self):
+        """
+        Avvia il Gestore Segnali come processo o come thread, secondo la
+        modalità scelta
+
+        Starts the Signal Manager as a process or as a thread, according to
+        the chosen mode
+        """
+        if self.modalita == MODALITA_THREAD:
+            self.thread = Thread(target = self.run,
+                                 name   = type(self).__name__ + " " + \
+                                          self.padre,
+                                 daemon = True)
+            self.thread.start()
+        else:
+            super().start()
+    def join(self,timeout=None):
+        if self.modalita == MODALITA_THREAD:
+            self.thread.join(timeout)
+        else:
+            super().join(timeout)
+    def is_alive(self):
+        if self.modalita == MODALITA_THREAD:
+            return self.thread is not None and self.thread.is_alive()
+        return super().is_alive()
+    def __getstate__(self):
+        # Con i metodi di avvio senza fork il Gestore Segnali viaggia
+        # serializzato verso il proprio processo (vedi avvio)
+        # With the start methods without fork the Signal Manager travels
+        # serialized towards its own process (see avvio)
+        return stato_processo(self)
+    def __setstate__(self,stato):
+        ripristina_processo(self,stato)
     def run(self):
         """initialized""" # initialized
         # Entra nello stato richiesto
         # Enter the required state
         while True:
-            logging.info(type(self).__name__ + " " + self.padre + \
+            self.registro.info(type(self).__name__ + " " + self.padre + \
                                                   " entrando in " + self.stato) # entering
             s = getattr(self,self.stato)()
             if isinstance(s,int):
@@ -155,16 +305,17 @@ class gestore_segnali(Process):
         waiting to be started.
         """
 
-        logging.info(type(self).__name__ + " " + self.padre + " idle")
+        self.registro.info(type(self).__name__ + " " + self.padre + " idle")
         segnale_spacchettato = []
         # Semplicemente due variabili per "facilitare" la gestione del segnale
         # Simply two variables to "facilitate" signal management
         self.segnale_uscita["segnale"]      = "" # signal
         self.segnale_uscita["destinatario"] = "" # recipient
 
-        with self.lock_ipc_uscita:
-            self.coda_ipc_uscita.put_nowait("idle:" + str(time())  + ":" + \
-                                                str(type(self).__name__) + ":")
+        inserisci(self.coda_ipc_uscita,impacchetta("idle",
+                                                   type(self).__name__,
+                                                   ""))
+        attesa = insieme_attesa([self.coda_segnali_uscita])
         while True:
             # Ripulisci il Segnale Spacchettato e le variabili
             # d'appoggio
@@ -179,13 +330,17 @@ class gestore_segnali(Process):
                 if not self.coda_segnali_uscita.empty():
                     segnale_spacchettato[:] = \
                                           self.coda_segnali_uscita.get_nowait()
-                    logging.info(segnale_spacchettato)
-                    logging.info("Lunghezza: " + \
-                                                str(len(segnale_spacchettato)))
+                    self.registro_segnali.debug("%s (lunghezza %d)", # length
+                                                segnale_spacchettato,
+                                                len(segnale_spacchettato))
             if len(segnale_spacchettato) == 0:
-                # Se non è arrivato nessun segnale, salta al prossimo ciclo
-                # If no signal arrived, skip to the next loop
-                sleep(ATTESA_CICLO_PRINCIPALE)
+                # Se non è arrivato nessun segnale, attendi e salta al prossimo
+                # ciclo
+                # If no signal arrived, wait and skip to the next loop
+                if self.attesa_bloccante:
+                    attesa.attendi(ATTESA_MASSIMA)
+                else:
+                    sleep(ATTESA_CICLO_PRINCIPALE)
                 continue
             if len(segnale_spacchettato) == 2:
                 # Se il segnale è formato da due parti, allora a posto
@@ -213,193 +368,484 @@ class gestore_segnali(Process):
                 elif self.segnale_uscita["segnale"] == "stop":
                     # Se il segnale è la richiesta di stop
                     # If the signal is the stop request
-                        with self.lock_ipc_uscita:
-                            self.coda_ipc_uscita.put_nowait("terminato:" + \
-                                                       str(time()) + ":" + \
-                                                       type(self).__name__ \
-                                                       + ":") # finished
+                        inserisci(self.coda_ipc_uscita,
+                                  impacchetta("terminato",
+                                              type(self).__name__,
+                                              "")) # finished
                         self.stato = "termina" # ends
     def avvia(self):
         """
         Avvia
 
         Ciclo principale del Gestore Segnali, una volta avviato.
-        Controlla continuamente la Coda IPC per i segnali in entrata e la Coda
-        Segnali Uscita per i segnali pronti ad essere inviati
+        Si sospende finché la Coda IPC non ha segnali in entrata o la Coda
+        Segnali Uscita non ha segnali pronti ad essere inviati, poi le svuota
 
         Start
 
         Main cycle of the Signal Manager, once started.
-        Continuously checks the IPC Queue for incoming signals and the Queue
-        Signals Output for signals ready to be sent
+        Sleeps until the IPC Queue has incoming signals or the Queue Signals
+        Output has signals ready to be sent, then drains them
+        """
+        self.registro.info(type(self).__name__ + " " + self.padre + " " + "avviato") # started
+        if not self.attesa_bloccante:
+            return self.avvia_interrogazione()
+        attesa = insieme_attesa([self.coda_ipc_entrata,
+                                 self.coda_segnali_uscita])
+        i = r = 0
+        while True:
+            self.profilatore.controlla()
+            # Sospenditi finché una delle due code non ha dei dati o finché non
+            # scade il ritardo massimo del lotto in uscita
+            # Sleep until one of the two queues has data or until the maximum
+            # delay of the outgoing batch expires
+            timeout = ATTESA_MASSIMA
+            if self.trame_uscita:
+                timeout = max(0,self.scadenza_lotto - monotonic())
+            # Segnali trattenuti finché l'oggetto è occupato
+            # Signals held while the object is busy
+            if self.segnali_entrata:
+                timeout = min(timeout,self.intervallo_coalescenza)
+            pronte = attesa.attendi(timeout)
+            # Smaltisci tutti i segnali in arrivo
+            # Drain all incoming signals
+            if self.coda_ipc_entrata in pronte:
+                with self.lock_ipc_entrata:
+                    while r != int(-1) and not self.coda_ipc_entrata.empty():
+                        r = self.ricevi_segnale()
+                        if len(self.segnali_entrata) >= self.lotto_massimo:
+                            self.consegna_segnali()
+            self.consegna_segnali()
+            # Smaltisci tutti i segnali in uscita
+            # Drain all outgoing signals
+            if self.coda_segnali_uscita in pronte:
+                with self.lock_segnali_uscita:
+                    while i != int(-1) and \
+                          not self.coda_segnali_uscita.empty():
+                        i = self.invia_segnale()
+                        if len(self.trame_uscita) >= self.lotto_massimo:
+                            self.spedisci_lotto()
+            if self.trame_uscita and \
+               (i == int(-1) or monotonic() >= self.scadenza_lotto):
+                self.spedisci_lotto()
+            if (i == int(-1)) or (r == int(-1)):
+                return int(-1)
+    def avvia_interrogazione(self):
+        """
+        Avvia Interrogazione
+
+        Ciclo principale a interrogazione ciclica, usato quando l'attesa
+        bloccante è disabilitata.
+
+        Start Polling
+
+        Polling main loop, used when blocking wait is disabled.
         """
-        logging.info(type(self).__name__ + " " + self.padre + " " + "avviato") # started
         i = r = 0
         while True:
+            self.profilatore.controlla()
             # Controlla segnali in arrivo
             # Check for incoming signals
             with self.lock_ipc_entrata:
                 if not self.coda_ipc_entrata.empty():
                      r = self.ricevi_segnale()
+            self.consegna_segnali()
             sleep(ATTESA_CICLO_PRINCIPALE)
             # Controlla segnali in uscita
             # Check outgoing signals
             with self.lock_segnali_uscita:
                 if not self.coda_segnali_uscita.empty():
                     i = self.invia_segnale()
+            self.spedisci_lotto()
             if (i == int(-1)) or (r == int(-1)):
                 return int(-1)
             sleep(ATTESA_CICLO_PRINCIPALE)
     def invia_segnale(self):
-        logging.info(self.padre + " Invia segnale") # Send signal
-        self.segnale_uscita["segnale"]      = \
-        self.segnale_uscita["destinatario"] = \
-        self.segnale_uscita["mittente"]     = ""
-        pacchetto_segnale                   = ""
-        segnale_spacchettato                = []
+        """
+        Invia Segnale
+
+        Preleva un elemento dalla Coda Segnali in Uscita, ne codifica i segnali
+        nel formato binario (vedi formato_segnale) e li aggiunge al lotto in
+        uscita, che spedisci_lotto() mette nella coda IPC in uscita. L'elemento
+        può essere un segnale singolo o un lotto di segnali.
+
+        Send Signal
+
+        Takes an item from the Outgoing Signals Queue, encodes its signals in
+        the binary format (see formato_segnale) and adds them to the outgoing
+        batch, which spedisci_lotto() puts in the outgoing IPC queue. The item
+        can be a single signal or a batch of signals.
+        """
         # Preleva il segnale da inviare dalla Coda Segnali in Uscita
         # Pick up the signal to send from the Outgoing Signal Queue
-        segnale_spacchettato[:] = self.coda_segnali_uscita.get_nowait()
-        logging.info(segnale_spacchettato)
+        esito = 0
+        for segnale_spacchettato in \
+            elementi(self.coda_segnali_uscita.get_nowait()):
+            esito = self.codifica_segnale(segnale_spacchettato)
+            if esito == int(-1):
+                break
+        return esito
+    def codifica_segnale(self,segnale_spacchettato):
+        """
+        Codifica Segnale
+
+        Controlla un segnale in uscita e, se va inviato, ne aggiunge la trama
+        al lotto in uscita. Il segnale è [segnale,destinatario] o, se il
+        Gestore Segnali inoltra segnali altrui, [segnale,destinatario,mittente];
+        in entrambi i casi può essere seguito dal dizionario delle estensioni.
+        Restituisce -1 se il segnale è lo stop del Gestore Segnali.
+
+        Encode Signal
+
+        Checks an outgoing signal and, if it must be sent, adds its frame to
+        the outgoing batch. The signal is [signal,recipient] or, if the Signal
+        Manager forwards signals of others, [signal,recipient,sender]; in both
+        cases it can be followed by the extensions dictionary. Returns -1 if
+        the signal is the Signal Manager stop.
+        """
+        self.registro_segnali.debug("%s invia %s",self.padre, # sends
+                                    segnale_spacchettato)
+        estensioni           = None
+        if len(segnale_spacchettato) > 0 and \
+           isinstance(segnale_spacchettato[-1],dict):
+            estensioni           = segnale_spacchettato[-1]
+            segnale_spacchettato = segnale_spacchettato[:-1]
         # Controlla che il segnale sia ben formato
         # Check that the signal is well formed
         if self.inoltra:
-            if len(segnale_spacchettato) == 3:
-                self.segnale_uscita["segnale"]      = segnale_spacchettato[0]
-                self.segnale_uscita["destinatario"] = segnale_spacchettato[1]
-                self.segnale_uscita["mittente"]     = segnale_spacchettato[2]
-                if self.segnale_uscita["segnale"] == "" or \
-                   self.segnale_uscita["destinatario"] == self.padre:
-                    pacchetto_segnale       = ""
-                    segnale_spacchettato[:] = []
-                    return 1
-                elif self.segnale_uscita["destinatario"] == \
-                                                      str(type(self).__name__):
-                    if self.segnale_uscita["segnale"] == "stop":
-                        return int(-1)
-                    else:
-                        pacchetto_segnale       = ""
-                        segnale_spacchettato[:] = []
-                        return 1
-                else:
-                    pacchetto_segnale = \
-                     str(self.segnale_uscita["segnale"]) + ":" + \
-                     str(time()) + ":" + \
-                     str(self.segnale_uscita["mittente"]) + ":" + \
-                     str(self.segnale_uscita["destinatario"])
-                    logging.info(pacchetto_segnale)
-                    self.coda_ipc_uscita.put_nowait(pacchetto_segnale)
-                    return 0
-            else:
-                self.segnale_uscita["segnale"] = \
-                self.segnale_uscita["destinatario"] = \
-                self.segnale_uscita["mittente"] = ""
-                pacchetto_segnale = ""
-                segnale_spacchettato[:] = []
+            if len(segnale_spacchettato) != 3:
                 return 0
+            segnale,destinatario,mittente = segnale_spacchettato
+            if segnale == "" or destinatario == self.padre:
+                return 1
         else:
-            if len(segnale_spacchettato) == 2:
-                self.segnale_uscita["segnale"]      = segnale_spacchettato[0]
-                self.segnale_uscita["destinatario"] = segnale_spacchettato[1]
-                if self.segnale_uscita["segnale"] == "" and \
-                   self.segnale_uscita["destinatario"] == "":
-                    segnale_spacchettato[:] = []
-                    return 1
-                elif self.segnale_uscita["destinatario"] == \
-                     str(type(self).__name__):
-                    if self.segnale_uscita["segnale"] == "stop":
-                        return int(-1)
-                    else:
-                        pacchetto_segnale       = ""
-                        segnale_spacchettato[:] = []
-                        return 1
-                elif self.segnale_uscita["destinatario"] == self.padre:
-                    pacchetto_segnale       = ""
-                    segnale_spacchettato[:] = []
-                    return 1
-                else:
-                    pacchetto_segnale = \
-                     str(self.segnale_uscita["segnale"]) + ":" + \
-                     str(time()) + ":" + \
-                     str(self.padre) + ":" + \
-                     str(self.segnale_uscita["destinatario"])
-                    logging.info(pacchetto_segnale)
-                    self.coda_ipc_uscita.put_nowait(pacchetto_segnale)
-                    return 0
+            if len(segnale_spacchettato) != 2:
+                return 0
+            segnale,destinatario = segnale_spacchettato
+            mittente             = self.padre
+            if segnale == "" and destinatario == "":
+                return 1
+            if destinatario == self.padre:
+                return 1
+        if destinatario == str(type(self).__name__):
+            if segnale == "stop":
+                return int(-1)
+            if segnale == SEGNALE_STATISTICHE:
+                self.rispondi_statistiche()
+            elif segnale == SEGNALE_PROFILA:
+                self.profilatore.avvia(estensioni)
             else:
-                self.segnale_uscita["segnale"] = \
-                self.segnale_uscita["destinatario"] = \
-                self.segnale_uscita["mittente"] = ""
-                pacchetto_segnale = ""
-                segnale_spacchettato[:] = []
+                return 1
+            # Il Gestore Segnali del Gestore Pipeline inoltra la richiesta
+            # anche al Gestore Segnali dell'operazione
+            # The Pipeline Manager's Signal Manager forwards the request to
+            # the operation's Signal Manager too
+            if self.inoltra:
+                try:
+                    trama = impacchetta(segnale,mittente,destinatario,
+                                        estensioni = estensioni)
+                except segnale_non_codificabile:
+                    self.metriche.conta("mal_formati")
+                    return 1
+                self.accoda_trama(trama,corsia_segnale(self.coda_ipc_uscita,
+                                                       segnale,estensioni))
+            return 1
+        self.metriche.conta("segnali_uscita")
+        if estensioni and CHIAVE_TRACCIA in estensioni and \
+           tracciamento_attivo():
+            registra_segnale(estensioni,self.metriche.componente,"codifica")
+            self.tracce_uscita.append(estensioni)
+        # Un segnale che non si può codificare viene scartato: il Gestore
+        # Segnali deve continuare a servire l'oggetto
+        # A signal that cannot be encoded is dropped: the Signal Manager must
+        # keep serving the object
+        try:
+            trama = impacchetta(segnale,
+                                mittente,
+                                destinatario,
+                                estensioni = estensioni)
+        except segnale_non_codificabile as e:
+            self.registro.error("Gestore Segnali %s: segnale %s non " + # signal ... not encodable
+                                "codificabile: %s",self.padre,segnale,e)
+            self.metriche.conta("mal_formati")
+            return 1
+        corsia = corsia_segnale(self.coda_ipc_uscita,segnale,estensioni)
+        # Un segnale coalescente prende il posto di quello già nel lotto
+        # A coalescing signal takes the place of the one already in the batch
+        if segnale in self.coalescenti:
+            chiave = (segnale,destinatario)
+            if chiave in self.posizioni_uscita:
+                posizione                     = self.posizioni_uscita[chiave]
+                self.trame_uscita[posizione]  = trama
+                self.corsie_uscita[posizione] = corsia
+                self.metriche.conta("coalesciti")
                 return 0
+            self.posizioni_uscita[chiave] = len(self.trame_uscita)
+        self.accoda_trama(trama,corsia)
+        return 0
+    def accoda_trama(self,trama,corsia=None):
+        """
+        Accoda Trama
+
+        Aggiunge una trama al lotto in uscita. Se la coda IPC in uscita è a
+        priorità la corsia è quella del segnale della trama (vedi
+        code_segnali.coda_priorita).
+
+        Queue Frame
+
+        Adds a frame to the outgoing batch. If the outgoing IPC queue is a
+        priority queue the lane is the one of the frame's signal (see
+        code_segnali.coda_priorita).
+        """
+        if not self.trame_uscita:
+            self.scadenza_lotto = monotonic() + self.ritardo_massimo_lotto
+        self.trame_uscita.append(trama)
+        self.corsie_uscita.append(corsia)
+    def rispondi_statistiche(self,richiedente=None):
+        """
+        Rispondi Statistiche
+
+        Risponde al segnale "statistiche" con l'istantanea delle metriche: al
+        richiedente, attraverso la coda IPC in uscita, o all'oggetto padre.
+
+        Answer Statistics
+
+        Answers the "statistiche" signal with the snapshot of the metrics: to
+        the requester, through the outgoing IPC queue, or to the parent
+        object.
+        """
+        estensioni = self.metriche.estensioni()
+        if richiedente is not None:
+            self.accoda_trama(impacchetta(SEGNALE_STATISTICHE,
+                                          type(self).__name__,
+                                          richiedente,
+                                          estensioni = estensioni),
+                              corsia_segnale(self.coda_ipc_uscita,
+                                             SEGNALE_STATISTICHE))
+        else:
+            inserisci(self.coda_segnali_entrata,[SEGNALE_STATISTICHE,
+                                                 type(self).__name__,
+                                                 self.padre,
+                                                 time(),
+                                                 estensioni])
+    def spedisci_lotto(self):
+        """
+        Spedisci Lotto
+
+        Mette le trame in attesa nella coda IPC in uscita come un unico
+        messaggio, uno per corsia se la coda è a priorità.
+
+        Ship Batch
+
+        Puts the waiting frames in the outgoing IPC queue as a single message,
+        one per lane if the queue is a priority queue.
+        """
+        if not self.trame_uscita:
+            return
+        gruppi = {}
+        for trama,corsia in zip(self.trame_uscita,self.corsie_uscita):
+            gruppi.setdefault(corsia,[]).append(trama)
+        self.trame_uscita  = []
+        self.corsie_uscita = []
+        self.posizioni_uscita.clear()
+        for estensioni in self.tracce_uscita:
+            registra_segnale(estensioni,self.metriche.componente,"spedisci")
+        self.tracce_uscita = []
+        for corsia in sorted(gruppi,key=lambda corsia: corsia or 0):
+            pacchetto_segnale = impacchetta_lotto(gruppi[corsia])
+            trame             = len(gruppi[corsia])
+            self.registro_segnali.debug("%s spedisce %d segnali in %d byte", # ships signals in bytes
+                                        self.padre,trame,len(pacchetto_segnale))
+            self.metriche.conta("messaggi_uscita")
+            if not inserisci(self.coda_ipc_uscita,pacchetto_segnale,corsia):
+                self.metriche.conta("scartati_uscita",trame)
     def ricevi_segnale(self):
-        logging.info(self.padre + " Ricevi segnale")
+        """
+        Ricevi Segnale
 
-        pacchetto_segnale                    = ""
-        segnale_spacchettato                 = []
-        self.mittente                        = ""
-        self.segnale_entrata["segnale"]      = ""
-        self.segnale_entrata["mittente"]     = ""
-        self.segnale_entrata["destinatario"] = ""
-        self.segnale_entrata["timestamp"]    = 0
+        Preleva un messaggio dalla coda IPC in entrata e lo decodifica. I
+        segnali destinati all'oggetto (o tutti, se il destinatario non va
+        controllato) vengono raccolti come [segnale,mittente,destinatario,
+        timestamp] più le eventuali estensioni, e consegna_segnali() li mette
+        nella Coda Segnali in Entrata.
 
+        Receive Signal
+
+        Takes a message from the incoming IPC queue and decodes it. The
+        signals addressed to the object (or all of them, if the recipient must
+        not be checked) are collected as [signal,sender,recipient,timestamp]
+        plus the extensions, if any, and consegna_segnali() puts them in the
+        Incoming Signals Queue.
+        """
         # Inizia ricezione segnale
         # Start receiving signal
         pacchetto_segnale = self.coda_ipc_entrata.get_nowait()
-        logging.info(self.padre)
-        logging.info(pacchetto_segnale)
-        segnale_spacchettato[:] = pacchetto_segnale.split(":")
-        logging.info(self.padre)
-        logging.info(segnale_spacchettato)
-        if len(segnale_spacchettato) == 4:
-            self.segnale_entrata["segnale"]      = segnale_spacchettato[0]
-            self.segnale_entrata["timestamp"]    = segnale_spacchettato[1]
-            self.segnale_entrata["mittente"]     = segnale_spacchettato[2]
-            self.segnale_entrata["destinatario"] = segnale_spacchettato[3]
-            logging.info("Gestore Segnali " + self.padre)
-            logging.info(self.segnale_entrata["segnale"])
-            logging.info(self.segnale_entrata["mittente"])
-            logging.info(self.segnale_entrata["destinatario"])
-            logging.info(self.segnale_entrata["timestamp"])
-        elif len(segnale_spacchettato) == 3:
-            self.segnale_entrata["segnale"]   = segnale_spacchettato[0]
-            self.segnale_entrata["timestamp"] = segnale_spacchettato[1]
-            self.segnale_entrata["mittente"]  = segnale_spacchettato[2]
-            logging.info("Gestore Segnali " + self.padre)
-            logging.info(self.segnale_entrata["segnale"])
-            logging.info(self.segnale_entrata["mittente"])
-            logging.info(self.segnale_entrata["timestamp"])
-        else:
+        try:
+            segnali = spacchetta_messaggio(pacchetto_segnale)
+        except segnale_mal_formato:
+            self.registro.info("Gestore Segnali %s: segnale mal formato", # badly formed signal
+                               self.padre)
+            self.metriche.conta("mal_formati")
             return 1
+        self.registro_segnali.debug("%s riceve %s",self.padre,segnali) # receives
+        self.metriche.conta("messaggi_entrata")
+        self.metriche.conta("segnali_entrata",len(segnali))
+
+        esito  = 0
+        adesso = time()
+        for segnale_spacchettato in segnali:
+            # Latenza del salto, dal mittente fino a qui
+            # Hop latency, from the sender up to here
+            self.metriche.registra_latenza(segnale_spacchettato[1],
+                                           segnale_spacchettato[3],
+                                           adesso)
+            if len(segnale_spacchettato) > 4:
+                registra_segnale(segnale_spacchettato[4],
+                                 self.metriche.componente,"ricevi",adesso)
+            destinatario = segnale_spacchettato[2]
+            if destinatario == type(self).__name__:
+                if segnale_spacchettato[0] == SEGNALE_STATISTICHE:
+                    self.rispondi_statistiche(segnale_spacchettato[1])
+                    continue
+                if segnale_spacchettato[0] == SEGNALE_PROFILA:
+                    self.profilatore.avvia(segnale_spacchettato[4] \
+                                           if len(segnale_spacchettato) > 4 \
+                                           else None)
+                    continue
+            if self.controlla_destinatario and \
+               destinatario != self.padre and destinatario != "":
+                self.metriche.conta("non_destinati")
+                continue
+            self.raccogli_segnale(segnale_spacchettato)
+            esito = 1
+        return esito
+    def raccogli_segnale(self,segnale_spacchettato):
+        """
+        Raccogli Segnale
 
-        if self.controlla_destinatario:
-            if self.segnale_entrata["destinatario"] == self.padre or \
-               self.segnale_entrata["destinatario"] == "":
-                logging.info("Gestore Segnali " + self.padre)
-                logging.info([self.segnale_entrata["segnale"],
-                              self.segnale_entrata["mittente"],
-                              self.segnale_entrata["destinatario"],
-                              self.segnale_entrata["timestamp"]])
-                if not self.coda_segnali_entrata.full():
-                    self.coda_segnali_entrata.put_nowait(
-                        [self.segnale_entrata["segnale"],
-                         self.segnale_entrata["mittente"],
-                         self.segnale_entrata["destinatario"],
-                         self.segnale_entrata["timestamp"]])
-                return 1
-            else:
-                return 0
+        Aggiunge un segnale ricevuto a quelli da consegnare all'oggetto. Con
+        dei segnali coalescenti, quelli delle corsie di controllo vengono
+        consegnati a parte, e un segnale coalescente prende il posto di
+        quello con lo stesso nome e destinatario ancora in attesa.
+
+        Collect Signal
+
+        Adds a received signal to the ones to deliver to the object. With
+        coalescing signals, the ones of the control lanes are delivered
+        apart, and a coalescing signal takes the place of the one with the
+        same name and recipient still waiting.
+        """
+        if not self.coalescenti:
+            self.segnali_entrata.append(segnale_spacchettato)
+            return
+        segnale    = segnale_spacchettato[0]
+        estensioni = segnale_spacchettato[4] \
+                     if len(segnale_spacchettato) > 4 else None
+        corsia     = corsia_segnale(self.coda_segnali_entrata,
+                                    segnale,estensioni)
+        if corsia is not None and corsia < PRIORITA_PREDEFINITA:
+            self.segnali_urgenti.append(segnale_spacchettato)
+            return
+        if segnale in self.coalescenti:
+            chiave = (segnale,segnale_spacchettato[2])
+            if chiave in self.attesa_entrata:
+                self.attesa_entrata[chiave][:] = segnale_spacchettato
+                self.metriche.conta("coalesciti")
+                return
+            segnale_spacchettato         = list(segnale_spacchettato)
+            self.attesa_entrata[chiave]  = segnale_spacchettato
+        self.segnali_entrata.append(segnale_spacchettato)
+    def consegna_segnali(self):
+        """
+        Consegna Segnali
+
+        Mette i segnali ricevuti nella Coda Segnali in Entrata come un unico
+        elemento. Con dei segnali coalescenti li consegna a lotti, e solo
+        finché nella coda ci sono meno di LOTTI_IN_ATTESA lotti: gli altri
+        restano nel Gestore Segnali, dove i più recenti possono ancora
+        sostituire quelli superati.
+
+        Deliver Signals
+
+        Puts the received signals in the Incoming Signals Queue as a single
+        item. With coalescing signals it delivers them in batches, and only
+        while the queue holds less than LOTTI_IN_ATTESA batches: the others
+        stay in the Signal Manager, where the newer ones can still replace
+        the superseded ones.
+
+        L'intervallo di controllo dei segnali trattenuti torna a quello
+        iniziale quando si consegna un lotto e raddoppia, fino a
+        INTERVALLO_COALESCENZA_MASSIMO, quando l'oggetto è ancora occupato.
+
+        The check interval of the held signals goes back to the initial one
+        when a batch is delivered and doubles, up to
+        INTERVALLO_COALESCENZA_MASSIMO, when the object is still busy.
+        """
+        if self.segnali_urgenti:
+            self.inserisci_entrata(self.segnali_urgenti)
+            self.segnali_urgenti = []
+        if not self.segnali_entrata:
+            return
+        if not self.coalescenti:
+            self.inserisci_entrata(self.segnali_entrata)
+            self.segnali_entrata = []
+            return
+        consegnati = False
+        while self.segnali_entrata and not self.entrata_occupata():
+            consegnati = True
+            segnali = self.segnali_entrata[:self.lotto_massimo]
+            del self.segnali_entrata[:self.lotto_massimo]
+            for segnale_spacchettato in segnali:
+                chiave = (segnale_spacchettato[0],segnale_spacchettato[2])
+                if self.attesa_entrata.get(chiave) is segnale_spacchettato:
+                    del self.attesa_entrata[chiave]
+            self.inserisci_entrata(segnali)
+        if consegnati or not self.segnali_entrata:
+            self.intervallo_coalescenza = INTERVALLO_COALESCENZA
         else:
-            logging.info("Gestore Segnali " + self.padre)
-            logging.info([self.segnale_entrata["segnale"],
-                          self.segnale_entrata["mittente"],
-                          self.segnale_entrata["destinatario"],
-                          self.segnale_entrata["timestamp"]])
-            if not self.coda_segnali_entrata.full():
-                self.coda_segnali_entrata.put_nowait( \
-                                          [self.segnale_entrata["segnale"],
-                                          self.segnale_entrata["mittente"],
-                                          self.segnale_entrata["destinatario"],
-                                          self.segnale_entrata["timestamp"]])
-                return 1
+            self.intervallo_coalescenza = min(2 * self.intervallo_coalescenza,
+                                              INTERVALLO_COALESCENZA_MASSIMO)
+    def entrata_occupata(self):
+        """
+        Entrata Occupata
+
+        Vero se la Coda Segnali in Entrata ha già LOTTI_IN_ATTESA lotti. Con
+        una coda limitata, la cui capacità si conta in lotti, i segnali
+        trattenuti non superano quelli di tanti lotti pieni quanti ne può
+        contenere (capacità per lotto_massimo): oltre, vengono consegnati
+        comunque e si applica la politica della coda.
+
+        Input Busy
+
+        True if the Incoming Signals Queue already holds LOTTI_IN_ATTESA
+        batches. With a bounded queue, whose capacity is counted in batches,
+        the held signals do not exceed those of as many full batches as it
+        can hold (capacity times lotto_massimo): beyond that, they are
+        delivered anyway and the queue policy applies.
+        """
+        capacita = getattr(self.coda_segnali_entrata,"capacita",0)
+        if capacita > 0 and \
+           len(self.segnali_entrata) >= capacita * self.lotto_massimo:
+            return False
+        try:
+            return self.coda_segnali_entrata.qsize() >= LOTTI_IN_ATTESA
+        except NotImplementedError:
+            return not self.coda_segnali_entrata.empty()
+    def inserisci_entrata(self,segnali):
+        """
+        Inserisci Entrata
+
+        Mette una lista di segnali nella Coda Segnali in Entrata.
+
+        Insert Input
+
+        Puts a list of signals in the Incoming Signals Queue.
+        """
+        if tracciamento_attivo():
+            for segnale_spacchettato in segnali:
+                if len(segnale_spacchettato) > 4:
+                    registra_segnale(segnale_spacchettato[4],
+                                     self.metriche.componente,"consegna")
+        if not inserisci(self.coda_segnali_entrata,
+                         impacchetta_elementi(segnali)):
+            self.metriche.conta("scartati_entrata",len(segnali))
@@ -0,0 +1,452 @@
+"""
+Autore: Francesco Antonetti Lamorgese Passeri
+
+This work is licensed under the Creative Commons Attribution 4.0 International
+License. To view a copy of this license, visit
+http://creativecommons.org/licenses/by/4.0/ or send a letter to Creative
+Commons, PO Box 1866, Mountain View, CA 94042, USA.
+
+Giornale
+
+Giornale dei segnali instradati dal Gestore Pipeline, per riprenderli dopo un
+arresto. Ogni segnale inoltrato a un'operazione riceve un numero di sequenza
+(estensione "sequenza") e viene aggiunto in coda a un segmento del giornale,
+un file di dimensione fissa mappato in memoria: la scrittura è una copia in
+memoria, e il contenuto sopravvive subito alla morte del processo. La
+sincronizzazione su disco (msync) si fa una volta per gruppo di segnali,
+prima di spedire i lotti alle operazioni, o al più ogni "intervallo_commit"
+secondi.
+
+Le operazioni confermano i segnali elaborati con il segnale "conferma", che
+porta la sequenza dell'ultimo segnale elaborato: per ogni operazione le
+sequenze crescono nell'ordine di consegna, quindi una conferma vale anche per
+tutti i segnali precedenti. Per questo i segnali registrati viaggiano tutti
+nella corsia di priorità predefinita (vedi code_segnali.coda_priorita). Il
+punto di controllo (checkpoint.json) salva le conferme a intervalli; i
+segmenti i cui segnali sono tutti confermati vengono cancellati. Alla
+ripartenza si leggono solo i segmenti rimasti, e i segnali non confermati
+vengono rispediti: il tempo di recupero è proporzionale alla coda non
+confermata, non all'intera esecuzione.
+
+Journal
+
+Journal of the signals routed by the Pipeline Manager, to resume them after
+a stop. Every signal forwarded to an operation gets a sequence number
+("sequenza" extension) and is appended to a journal segment, a fixed size
+memory mapped file: the write is a memory copy, and the content survives the
+death of the process at once. Syncing to disk (msync) is done once per group
+of signals, before shipping the batches to the operations, or at most every
+"intervallo_commit" seconds.
+
+Operations acknowledge the processed signals with the "conferma" signal,
+carrying the sequence of the last processed signal: for every operation
+sequences grow in delivery order, so an acknowledgement holds for all the
+previous signals too. This is why the recorded signals all travel in the
+default priority lane (see code_segnali.coda_priorita). The checkpoint
+(checkpoint.json) saves the acknowledgements at intervals; the segments whose
+signals are all acknowledged are deleted. On restart only the remaining
+segments are read, and the unacknowledged signals are sent again: recovery
+time is proportional to the unacknowledged tail, not to the whole run.
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+
+from time            import monotonic
+from zlib            import crc32
+
+#Framework
+import formato_segnale
+from formato_segnale import impacchetta,spacchetta,segnale_mal_formato
+from code_segnali    import CHIAVE_PRIORITA,PRIORITA_PREDEFINITA
+from richieste       import SEGNALE_RISPOSTA
+
+# Estensione con il numero di sequenza e segnale di conferma delle operazioni
+# Extension with the sequence number and acknowledgement signal of the
+# operations
+CHIAVE_SEQUENZA       = "sequenza"
+SEGNALE_CONFERMA      = "conferma"
+# Segnali di controllo che non vengono registrati: riprenderli ripeterebbe
+# l'arresto o una richiesta ormai scaduta; le risposte riprese non
+# troverebbero più il futuro della loro richiesta (vedi richieste)
+# Control signals that are not recorded: resuming them would repeat the stop
+# or an expired request; resumed responses would not find the future of
+# their request anymore (see richieste)
+SEGNALI_ESCLUSI       = frozenset(("stop","rallenta","statistiche","profila",
+                                   SEGNALE_RISPOSTA))
+# Dimensione predefinita dei segmenti, intervallo predefinito tra due
+# sincronizzazioni (0: prima di ogni spedizione) e tra due punti di controllo
+# Default segment size, default interval between two syncs (0: before every
+# shipping) and between two checkpoints
+DIMENSIONE_SEGMENTO   = 16 << 20
+INTERVALLO_COMMIT     = 0.0
+INTERVALLO_CHECKPOINT = 1.0
+# Intestazione di un record: lunghezza del contenuto, crc32 del contenuto,
+# sequenza. Una lunghezza nulla segna la fine dei record del segmento.
+# Il contenuto è il destinatario (preceduto dalla sua lunghezza) e la trama
+# Record header: content length, content crc32, sequence. A null length marks
+# the end of the records of the segment. The content is the recipient
+# (preceded by its length) and the frame
+INTESTAZIONE          = struct.Struct(">IIQ")
+LUNGHEZZA_NOME        = struct.Struct(">H")
+PREFISSO              = "giornale-"
+SUFFISSO              = ".seg"
+FILE_CHECKPOINT       = "checkpoint.json"
+
+class segmento:
+    """
+    Segmento
+
+    File del giornale mappato in memoria. Per ogni destinatario tiene la
+    sequenza più alta che contiene, per sapere quando può essere cancellato.
+
+    Segment
+
+    Memory mapped journal file. For every recipient it keeps the highest
+    sequence it contains, to know when it can be deleted.
+    """
+    def __init__(self,percorso,dimensione=None):
+        self.percorso     = percorso
+        self.destinatari  = {} # destinatario: sequenza massima - # recipient: maximum sequence
+        self.posizione    = 0
+        self.sporco       = None # inizio della parte non sincronizzata - # start of the unsynced part
+        with open(percorso,"r+b" if dimensione is None else "w+b") as f:
+            if dimensione is not None:
+                f.truncate(dimensione)
+            self.mappa    = mmap.mmap(f.fileno(),0)
+    def spazio(self):
+        """Byte liberi nel segmento - Free bytes in the segment"""
+        return len(self.mappa) - self.posizione
+    def aggiungi(self,sequenza,destinatario,trama):
+        """
+        Aggiungi
+
+        Aggiunge un record in coda al segmento.
+
+        Append
+
+        Appends a record to the segment.
+        """
+        nome      = destinatario.encode()
+        contenuto = LUNGHEZZA_NOME.pack(len(nome)) + nome + trama
+        fine      = self.posizione + INTESTAZIONE.size + len(contenuto)
+        self.mappa[self.posizione + INTESTAZIONE.size:fine] = contenuto
+        # L'intestazione si scrive per ultima: un record a metà ha lunghezza
+        # nulla o un crc sbagliato
+        # The header is written last: a half written record has null length
+        # or a wrong crc
+        INTESTAZIONE.pack_into(self.mappa,self.posizione,len(contenuto),
+                               crc32(contenuto),sequenza)
+        if self.sporco is None:
+            self.sporco   = self.posizione
+        self.posizione    = fine
+        self.destinatari[destinatario] = sequenza
+    def records(self):
+        """
+        Records
+
+        Legge i record validi del segmento, come tuple
+        (sequenza,destinatario,trama), fino al primo vuoto o danneggiato.
+
+        Records
+
+        Reads the valid records of the segment, as (sequence,recipient,frame)
+        tuples, up to the first empty or damaged one.
+        """
+        posizione = 0
+        while posizione + INTESTAZIONE.size <= len(self.mappa):
+            lunghezza,controllo,sequenza = INTESTAZIONE.unpack_from(self.mappa,
+                                                                    posizione)
+            inizio = posizione + INTESTAZIONE.size
+            if lunghezza == 0 or inizio + lunghezza > len(self.mappa):
+                break
+            contenuto = self.mappa[inizio:inizio + lunghezza]
+            if crc32(contenuto) != controllo:
+                break
+            lunghezza_nome, = LUNGHEZZA_NOME.unpack_from(contenuto)
+            fine_nome       = LUNGHEZZA_NOME.size + lunghezza_nome
+            destinatario    = contenuto[LUNGHEZZA_NOME.size:fine_nome].decode()
+            self.destinatari[destinatario] = sequenza
+            posizione       = inizio + lunghezza
+            yield sequenza,destinatario,contenuto[fine_nome:]
+        self.posizione = posizione
+    def sincronizza(self):
+        """
+        Sincronizza su disco la parte scritta dall'ultima volta
+        Syncs to disk the part written since the last time
+        """
+        if self.sporco is None:
+            return
+        inizio      = self.sporco - self.sporco % mmap.PAGESIZE
+        self.mappa.flush(inizio,self.posizione - inizio)
+        self.sporco = None
+    def chiudi(self):
+        self.sincronizza()
+        self.mappa.close()
+
+class giornale:
+    """
+    Giornale
+
+    Giornale dei segnali di un Gestore Pipeline. Va aperto (apri()) nel
+    processo del Gestore Pipeline, l'unico che vi scrive.
+
+    Journal
+
+    Signal journal of a Pipeline Manager. It must be opened (apri()) in the
+    Pipeline Manager process, the only one writing to it.
+    """
+    def __init__(self,cartella,dimensione_segmento=DIMENSIONE_SEGMENTO,
+                 intervallo_commit=INTERVALLO_COMMIT,
+                 intervallo_checkpoint=INTERVALLO_CHECKPOINT):
+        self.cartella              = cartella
+        self.dimensione_segmento   = dimensione_segmento
+        self.intervallo_commit     = intervallo_commit
+        self.intervallo_checkpoint = intervallo_checkpoint
+        self.registro              = logging.getLogger(__name__)
+        self.segmenti              = [] # dal più vecchio - # oldest first
+        self.conferme              = {} # destinatario: sequenza - # recipient: sequence
+        self.sequenza              = 0
+        self.da_sincronizzare      = False
+        self.ultimo_commit         = 0
+        self.prossimo_checkpoint   = 0
+    def apri(self):
+        """
+        Apri
+
+        Apre il giornale, legge il punto di controllo e i segmenti rimasti e
+        restituisce i segnali non confermati, nell'ordine in cui erano stati
+        registrati, come coppie (destinatario,inoltro) dove inoltro è
+        [segnale,destinatario,mittente,estensioni]. I nuovi segnali vanno in
+        un nuovo segmento.
+
+        Open
+
+        Opens the journal, reads the checkpoint and the remaining segments
+        and returns the unacknowledged signals, in the order they had been
+        recorded, as (recipient,forward) pairs where forward is
+        [signal,recipient,sender,extensions]. New signals go to a new segment.
+        """
+        os.makedirs(self.cartella,exist_ok=True)
+        try:
+            with open(os.path.join(self.cartella,FILE_CHECKPOINT)) as f:
+                punto_controllo = json.load(f)
+        except FileNotFoundError:
+            punto_controllo = {}
+        self.conferme = punto_controllo.get("conferme",{})
+        # Le trame usano gli indici della tabella dei nomi: con un'altra
+        # tabella verrebbero decodificate in modo errato
+        # Frames use the indices of the names table: with another table they
+        # would be decoded wrongly
+        if punto_controllo.get("nomi",formato_segnale.nomi) != \
+           formato_segnale.nomi:
+            raise ValueError("Il giornale " + self.cartella + " è stato " + # The journal has been written with another names table
+                             "scritto con un'altra tabella dei nomi " + \
+                             "(operazioni o segnali della configurazione)")
+        inizio          = monotonic()
+        da_riprodurre   = []
+        for nome in sorted(os.listdir(self.cartella)):
+            if not (nome.startswith(PREFISSO) and nome.endswith(SUFFISSO)):
+                continue
+            percorso = os.path.join(self.cartella,nome)
+            if os.path.getsize(percorso) == 0:
+                os.remove(percorso)
+                continue
+            vecchio = segmento(percorso)
+            for sequenza,destinatario,trama in vecchio.records():
+                self.sequenza = max(self.sequenza,sequenza)
+                if sequenza <= self.conferme.get(destinatario,-1):
+                    continue
+                try:
+                    segnale,mittente,destinatario_segnale,timestamp,\
+                    estensioni = (spacchetta(trama) + [{}])[:5]
+                except segnale_mal_formato:
+                    continue
+                da_riprodurre.append((destinatario,
+                                      [segnale,destinatario_segnale,mittente,
+                                       estensioni]))
+            self.segmenti.append(vecchio)
+        self.registro.info("giornale %s: %d segmenti, %d segnali da " + # segments, signals to replay in
+                           "riprendere in %.3f s",self.cartella,
+                           len(self.segmenti),len(da_riprodurre),
+                           monotonic() - inizio)
+        # Un segmento vuoto rimasto in coda viene riusato
+        # An empty segment left at the tail is reused
+        if not self.segmenti or self.segmenti[-1].posizione > 0:
+            self.nuovo_segmento(0)
+        self.checkpoint()
+        return da_riprodurre
+    def nuovo_segmento(self,dimensione_minima):
+        """Apre un nuovo segmento in coda - Opens a new segment at the tail"""
+        if self.segmenti:
+            self.segmenti[-1].sincronizza()
+        percorso = os.path.join(self.cartella,PREFISSO + \
+                                format(self.sequenza + 1,"020d") + SUFFISSO)
+        self.segmenti.append(segmento(percorso,
+                                      max(self.dimensione_segmento,
+                                          dimensione_minima + \
+                                          INTESTAZIONE.size)))
+    def registra(self,destinatario,inoltro):
+        """
+        Registra
+
+        Registra un segnale inoltrato a un'operazione e restituisce il segnale
+        da inoltrare, con il numero di sequenza nelle estensioni. I segnali
+        di controllo non vengono registrati e sono restituiti così come sono.
+
+        Record
+
+        Records a signal forwarded to an operation and returns the signal to
+        forward, with the sequence number in the extensions. Control signals
+        are not recorded and are returned as they are.
+        """
+        if inoltro[0] in SEGNALI_ESCLUSI:
+            return inoltro
+        self.sequenza += 1
+        estensioni = dict(inoltro[3]) if len(inoltro) > 3 else {}
+        estensioni[CHIAVE_SEQUENZA] = self.sequenza
+        estensioni[CHIAVE_PRIORITA] = PRIORITA_PREDEFINITA
+        inoltro    = [inoltro[0],inoltro[1],inoltro[2],estensioni]
+        trama      = impacchetta(inoltro[0],inoltro[2],inoltro[1],
+                                 estensioni = estensioni)
+        necessario = INTESTAZIONE.size + LUNGHEZZA_NOME.size + \
+                     len(destinatario.encode()) + len(trama)
+        # Resta sempre posto per un'intestazione vuota di fine segmento
+        # There is always room left for an empty end of segment header
+        if self.segmenti[-1].spazio() < necessario + INTESTAZIONE.size:
+            self.nuovo_segmento(necessario)
+        self.segmenti[-1].aggiungi(self.sequenza,destinatario,trama)
+        self.da_sincronizzare = True
+        return inoltro
+    def riprendi(self,vecchio_destinatario,destinatario,inoltro):
+        """
+        Riprendi
+
+        Segna un segnale ripreso, che resta nel suo segmento senza essere
+        scritto di nuovo. Se il destinatario non esiste più e il segnale va a
+        un'altra replica, per il vecchio destinatario vale come confermato e
+        la conferma passa al nuovo (None se il segnale è stato scartato).
+
+        Resume
+
+        Marks a resumed signal, which stays in its segment without being
+        written again. If the recipient does not exist anymore and the signal
+        goes to another replica, it counts as acknowledged for the old
+        recipient and the acknowledgement moves to the new one (None if the
+        signal has been dropped).
+        """
+        sequenza = inoltro[3].get(CHIAVE_SEQUENZA)
+        if sequenza is None or vecchio_destinatario == destinatario:
+            return
+        self.conferma(vecchio_destinatario,sequenza)
+        if destinatario is None:
+            return
+        coda = self.segmenti[-1].destinatari
+        coda[destinatario] = max(coda.get(destinatario,-1),sequenza)
+    def consolida(self,forza=False):
+        """
+        Consolida
+
+        Sincronizza su disco i record scritti dall'ultima volta, se ce ne sono
+        e, a meno di forzarla, se è passato almeno intervallo_commit.
+
+        Commit
+
+        Syncs to disk the records written since the last time, if any and,
+        unless forced, if at least intervallo_commit has elapsed.
+        """
+        if not self.da_sincronizzare:
+            return
+        adesso = monotonic()
+        if not forza and adesso - self.ultimo_commit < self.intervallo_commit:
+            return
+        self.segmenti[-1].sincronizza()
+        self.da_sincronizzare = False
+        self.ultimo_commit    = adesso
+    def conferma(self,destinatario,sequenza):
+        """
+        Conferma
+
+        Registra che il destinatario ha elaborato tutti i suoi segnali fino
+        alla sequenza indicata.
+
+        Acknowledge
+
+        Records that the recipient has processed all its signals up to the
+        given sequence.
+        """
+        if sequenza > self.conferme.get(destinatario,-1):
+            self.conferme[destinatario] = sequenza
+    def scadenza(self):
+        """
+        Istante del prossimo lavoro periodico - Instant of the next periodic work
+        """
+        if self.da_sincronizzare:
+            return min(self.prossimo_checkpoint,
+                       self.ultimo_commit + self.intervallo_commit)
+        return self.prossimo_checkpoint
+    def controlla(self):
+        """
+        Controlla
+
+        Lavoro periodico: sincronizza i record in attesa e, allo scadere
+        dell'intervallo, scrive il punto di controllo.
+
+        Check
+
+        Periodic work: syncs the waiting records and, when the interval
+        expires, writes the checkpoint.
+        """
+        self.consolida()
+        if monotonic() >= self.prossimo_checkpoint:
+            self.checkpoint()
+    def checkpoint(self):
+        """
+        Checkpoint
+
+        Scrive le conferme nel punto di controllo, in modo atomico, e
+        cancella i segmenti i cui segnali sono tutti confermati.
+
+        Checkpoint
+
+        Writes the acknowledgements to the checkpoint, atomically, and deletes
+        the segments whose signals are all acknowledged.
+        """
+        self.prossimo_checkpoint = monotonic() + self.intervallo_checkpoint
+        percorso   = os.path.join(self.cartella,FILE_CHECKPOINT)
+        temporaneo = percorso + ".tmp"
+        with open(temporaneo,"w") as f:
+            json.dump({"conferme": self.conferme,
+                       "sequenza": self.sequenza,
+                       "nomi":     formato_segnale.nomi},f)
+        os.replace(temporaneo,percorso)
+        # Il segmento in coda resta anche se è tutto confermato
+        # The tail segment stays even if it is all acknowledged
+        for vecchio in self.segmenti[:-1]:
+            if any(sequenza > self.conferme.get(destinatario,-1) \
+                   for destinatario,sequenza in vecchio.destinatari.items()):
+                continue
+            vecchio.chiudi()
+            os.remove(vecchio.percorso)
+            self.segmenti.remove(vecchio)
+    def chiudi(self):
+        """
+        Chiudi
+
+        Sincronizza i record, scrive il punto di controllo e chiude i
+        segmenti.
+
+        Close
+
+        Syncs the records, writes the checkpoint and closes the segments.
+        """
+        if not self.segmenti:
+            return
+        self.consolida(True)
+        self.checkpoint()
+        for aperto in self.segmenti:
+            aperto.chiudi()
+        self.segmenti = []
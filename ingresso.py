@@ -0,0 +1,450 @@
+"""
+Autore: Francesco Antonetti Lamorgese Passeri
+
+This work is licensed under the Creative Commons Attribution 4.0 International
+License. To view a copy of this license, visit
+http://creativecommons.org/licenses/by/4.0/ or send a letter to Creative
+Commons, PO Box 1866, Mountain View, CA 94042, USA.
+
+Ingresso
+
+Punto di ingresso e di uscita dei segnali per i programmi esterni sullo stesso
+host. Un processo dedicato ascolta su un socket Unix e fa da ponte verso le
+code IPC del Gestore Pipeline: i segnali scritti dai client entrano nella
+pipeline come quelli di main.py, i segnali che la pipeline manda all'esterno
+arrivano a tutti i client connessi.
+
+Il protocollo è una sequenza di messaggi, in entrambe le direzioni, ognuno
+preceduto dalla propria lunghezza (4 byte, big endian). Ogni messaggio è una
+trama o un lotto di formato_segnale. Il primo messaggio del server è la
+tabella dei nomi registrati (JSON), che il client registra a sua volta per
+codificare e decodificare i nomi come la pipeline. I messaggi letti insieme
+da un client entrano nella pipeline come un unico lotto, e i messaggi in
+attesa verso un client gli vengono spediti con un'unica scrittura.
+
+    python ingresso.py PERCORSO_SOCKET SEGNALE [DESTINATARIO] [JSON]
+    python ingresso.py PERCORSO_SOCKET --ascolta
+
+Ingress
+
+Entry and exit point of the signals for the external programs on the same
+host. A dedicated process listens on a Unix socket and bridges it to the IPC
+queues of the Pipeline Manager: the signals written by the clients enter the
+pipeline like the ones of main.py, the signals the pipeline sends outside
+reach every connected client.
+
+The protocol is a sequence of messages, in both directions, each one
+preceded by its own length (4 bytes, big endian). Every message is a frame or
+a batch of formato_segnale. The first message of the server is the table of
+the registered names (JSON), which the client registers in turn to encode and
+decode names like the pipeline. The messages read together from a client
+enter the pipeline as a single batch, and the messages waiting towards a
+client are shipped to it with a single write.
+"""
+
+import json
+import logging
+import os
+import socket
+import struct
+import sys
+import threading
+
+from collections     import deque
+from multiprocessing import Process
+from time            import monotonic
+
+#Framework
+import formato_segnale
+from formato_segnale import impacchetta,impacchetta_lotto,spacchetta_messaggio,\
+                            registra_nomi,segnale_mal_formato
+from avvio           import stato_processo,ripristina_processo
+
+# Lunghezza che precede ogni messaggio sul socket
+# Length preceding every message on the socket
+LUNGHEZZA_MESSAGGIO  = struct.Struct(">I")
+# Dimensione massima di un messaggio e byte letti alla volta
+# Maximum size of a message and bytes read at a time
+MESSAGGIO_MASSIMO    = 1 << 24
+LETTURA              = 1 << 16
+# Messaggi massimi di un lotto verso la pipeline
+# Maximum messages of a batch towards the pipeline
+LOTTO_INGRESSO       = 256
+# Messaggi in attesa verso un client oltre i quali si scartano i più vecchi
+# Messages waiting towards a client beyond which the oldest are dropped
+CAPACITA_CLIENT      = 100000
+# Byte in attesa oltre i quali il client spedisce senza attendere svuota()
+# Waiting bytes beyond which the client ships without waiting for svuota()
+SCRITTURA_CLIENT     = 1 << 16
+# Mittente predefinito dei segnali dei client
+# Default sender of the clients' signals
+MITTENTE             = "ingresso"
+
+def unisci_messaggi(messaggi):
+    """
+    Unisce dei messaggi con le loro lunghezze - Joins messages with their lengths
+    """
+    return b"".join(LUNGHEZZA_MESSAGGIO.pack(len(messaggio)) + messaggio \
+                    for messaggio in messaggi)
+
+def estrai_messaggi(buffer):
+    """
+    Estrai Messaggi
+
+    Estrae dal buffer i messaggi completi e li restituisce, lasciandovi
+    l'eventuale messaggio incompleto. Solleva ValueError se un messaggio
+    supera MESSAGGIO_MASSIMO.
+
+    Extract Messages
+
+    Extracts the complete messages from the buffer and returns them, leaving
+    the incomplete message, if any, in it. Raises ValueError if a message
+    exceeds MESSAGGIO_MASSIMO.
+    """
+    messaggi  = []
+    posizione = 0
+    while len(buffer) - posizione >= LUNGHEZZA_MESSAGGIO.size:
+        lunghezza, = LUNGHEZZA_MESSAGGIO.unpack_from(buffer,posizione)
+        if lunghezza > MESSAGGIO_MASSIMO:
+            raise ValueError("Messaggio troppo lungo: " + str(lunghezza)) # Message too long
+        fine = posizione + LUNGHEZZA_MESSAGGIO.size + lunghezza
+        if fine > len(buffer):
+            break
+        messaggi.append(bytes(buffer[posizione + LUNGHEZZA_MESSAGGIO.size:fine]))
+        posizione = fine
+    del buffer[:posizione]
+    return messaggi
+
+class processo_ingresso(Process):
+    """
+    Processo Ingresso
+
+    Processo che ascolta sul socket Unix e fa da ponte con le code IPC del
+    Gestore Pipeline: "coda_pipeline" è la coda in entrata del Gestore
+    Pipeline, "coda_esterna" quella in cui scrive i segnali per l'esterno (le
+    code che main.py gli passa). Va avviato dopo aver creato il Gestore
+    Pipeline, così che erediti (o riceva, vedi avvio) la tabella dei nomi.
+
+    Ingress Process
+
+    Process listening on the Unix socket and bridging it to the IPC queues of
+    the Pipeline Manager: "coda_pipeline" is the incoming queue of the
+    Pipeline Manager, "coda_esterna" the one it writes the signals for the
+    outside to (the queues main.py hands to it). It must be started after
+    creating the Pipeline Manager, so that it inherits (or receives, see avvio)
+    the names table.
+    """
+    def __init__(self,percorso,coda_pipeline,lock_pipeline,coda_esterna,
+                 lock_esterna):
+        super().__init__(name="ingresso",daemon=True)
+        self.percorso      = percorso
+        self.coda_pipeline = coda_pipeline
+        self.lock_pipeline = lock_pipeline
+        self.coda_esterna  = coda_esterna
+        self.lock_esterna  = lock_esterna
+    def __getstate__(self):
+        # Senza fork la tabella dei nomi viaggia con il processo (vedi avvio)
+        # Without fork the names table travels with the process (see avvio)
+        return stato_processo(self)
+    def __setstate__(self,stato):
+        ripristina_processo(self,stato)
+    def run(self):
+        self.registro   = logging.getLogger("ingresso")
+        self.client     = {} # socket: [deque,condizione] - # socket: [deque,condition]
+        self.lock       = threading.Lock()
+        self.benvenuto  = unisci_messaggi(
+                                   [json.dumps(formato_segnale.nomi).encode()])
+        try:
+            os.unlink(self.percorso)
+        except FileNotFoundError:
+            pass
+        ascoltatore = socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+        # Solo l'utente che esegue la pipeline può connettersi: il socket
+        # nasce già con i permessi 0600, così nessuno può connettersi prima
+        # del chmod. La maschera vale per tutto il processo, ma qui non ci
+        # sono ancora altri thread
+        # Only the user running the pipeline can connect: the socket is born
+        # with 0600 permissions already, so nobody can connect before the
+        # chmod. The mask holds for the whole process, but there are no other
+        # threads yet here
+        maschera = os.umask(0o177)
+        try:
+            ascoltatore.bind(self.percorso)
+        finally:
+            os.umask(maschera)
+        os.chmod(self.percorso,0o600)
+        ascoltatore.listen()
+        threading.Thread(target=self.diffondi,name="ingresso uscita",
+                         daemon=True).start()
+        self.registro.info("ingresso in ascolto su %s",self.percorso) # ingress listening on
+        try:
+            while True:
+                connessione,_ = ascoltatore.accept()
+                threading.Thread(target=self.servi,args=(connessione,),
+                                 name="ingresso client",daemon=True).start()
+        except (OSError,KeyboardInterrupt):
+            pass
+        finally:
+            ascoltatore.close()
+            try:
+                os.unlink(self.percorso)
+            except OSError:
+                pass
+    def servi(self,connessione):
+        """
+        Servi
+
+        Thread di un client: gli manda la tabella dei nomi, avvia il thread
+        che gli scrive e mette nella coda del Gestore Pipeline i messaggi che
+        legge, riuniti in lotti.
+
+        Serve
+
+        Thread of a client: sends it the names table, starts the thread
+        writing to it and puts the messages it reads in the Pipeline
+        Manager's queue, joined in batches.
+        """
+        uscita     = deque(maxlen=CAPACITA_CLIENT)
+        condizione = threading.Condition()
+        try:
+            connessione.sendall(self.benvenuto)
+        except OSError:
+            connessione.close()
+            return
+        with self.lock:
+            self.client[connessione] = (uscita,condizione)
+        threading.Thread(target=self.scrivi,args=(connessione,uscita,condizione),
+                         name="ingresso client",daemon=True).start()
+        buffer = bytearray()
+        try:
+            while True:
+                dati = connessione.recv(LETTURA)
+                if not dati:
+                    break
+                buffer += dati
+                messaggi = estrai_messaggi(buffer)
+                for inizio in range(0,len(messaggi),LOTTO_INGRESSO):
+                    self.inoltra(messaggi[inizio:inizio + LOTTO_INGRESSO])
+        except (OSError,ValueError) as e:
+            self.registro.warning("ingresso: %s",e)
+        with self.lock:
+            self.client.pop(connessione,None)
+        with condizione:
+            condizione.notify_all()
+        connessione.close()
+    def inoltra(self,messaggi):
+        """
+        Inoltra
+
+        Mette dei messaggi nella coda del Gestore Pipeline come un unico
+        elemento. I lotti arrivati già riuniti viaggiano da soli, perché un
+        lotto non ne può contenere altri.
+
+        Forward
+
+        Puts messages in the Pipeline Manager's queue as a single item.
+        Batches arriving already joined travel alone, because a batch cannot
+        contain other batches.
+        """
+        trame = []
+        for messaggio in messaggi:
+            if len(messaggio) > 1 and messaggio[1] & formato_segnale.FLAG_LOTTO:
+                with self.lock_pipeline:
+                    self.coda_pipeline.put(messaggio)
+            else:
+                trame.append(messaggio)
+        if trame:
+            with self.lock_pipeline:
+                self.coda_pipeline.put(impacchetta_lotto(trame))
+    def scrivi(self,connessione,uscita,condizione):
+        """
+        Scrivi
+
+        Thread di scrittura di un client: gli spedisce con un'unica scrittura
+        tutti i messaggi in attesa.
+
+        Write
+
+        Writing thread of a client: ships it all the waiting messages with a
+        single write.
+        """
+        while True:
+            with condizione:
+                while not uscita and connessione in self.client:
+                    condizione.wait()
+                if connessione not in self.client:
+                    return
+                messaggi = list(uscita)
+                uscita.clear()
+            try:
+                connessione.sendall(unisci_messaggi(messaggi))
+            except OSError:
+                return
+    def diffondi(self):
+        """
+        Diffondi
+
+        Preleva i segnali che il Gestore Pipeline manda all'esterno e li mette
+        in attesa verso tutti i client connessi. Un client che non legge perde
+        i messaggi più vecchi.
+
+        Broadcast
+
+        Takes the signals the Pipeline Manager sends outside and puts them
+        waiting towards every connected client. A client that does not read
+        loses the oldest messages.
+        """
+        while True:
+            try:
+                messaggio = self.coda_esterna.get()
+            except (EOFError,OSError):
+                return
+            if isinstance(messaggio,str):
+                messaggio = messaggio.encode()
+            with self.lock:
+                client = list(self.client.values())
+            for uscita,condizione in client:
+                with condizione:
+                    uscita.append(messaggio)
+                    condizione.notify()
+
+class client_ingresso:
+    """
+    Client Ingresso
+
+    Libreria per i programmi esterni: si connette al punto di ingresso della
+    pipeline, scrive segnali e legge quelli che la pipeline manda all'esterno.
+    I segnali scritti restano in un buffer fino a svuota() o finché il buffer
+    non supera SCRITTURA_CLIENT byte, così che molti segnali viaggino con una
+    sola scrittura. Usabile con "with", che svuota il buffer all'uscita.
+
+    Ingress Client
+
+    Library for the external programs: connects to the entry point of the
+    pipeline, writes signals and reads the ones the pipeline sends outside.
+    Written signals stay in a buffer until svuota() or until the buffer
+    exceeds SCRITTURA_CLIENT bytes, so that many signals travel with a single
+    write. Usable with "with", which flushes the buffer on exit.
+    """
+    def __init__(self,percorso,mittente=MITTENTE):
+        self.mittente  = mittente
+        self.socket    = socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+        self.socket.connect(percorso)
+        self.uscita    = []
+        self.byte      = 0
+        self.entrata   = bytearray()
+        self.messaggi  = deque()
+        self.ricevuti  = deque()
+        # La tabella dei nomi della pipeline deve estendere quella locale
+        # The pipeline's names table must extend the local one
+        nomi = json.loads(self.leggi_messaggio())
+        if nomi[:len(formato_segnale.nomi)] != formato_segnale.nomi:
+            self.socket.close()
+            raise ValueError("Tabella dei nomi incompatibile con la pipeline") # Names table incompatible with the pipeline
+        registra_nomi(nomi[len(formato_segnale.nomi):])
+    def __enter__(self):
+        return self
+    def __exit__(self,*eccezione):
+        self.chiudi()
+    def invia(self,segnale,destinatario="",estensioni=None):
+        """
+        Invia
+
+        Aggiunge un segnale al buffer in uscita.
+
+        Send
+
+        Adds a signal to the outgoing buffer.
+        """
+        trama = impacchetta(segnale,self.mittente,destinatario,
+                            estensioni = estensioni)
+        self.uscita.append(trama)
+        self.byte += len(trama)
+        if self.byte >= SCRITTURA_CLIENT:
+            self.svuota()
+    def svuota(self):
+        """
+        Svuota
+
+        Spedisce con un'unica scrittura i segnali nel buffer.
+
+        Flush
+
+        Ships the signals in the buffer with a single write.
+        """
+        if not self.uscita:
+            return
+        self.socket.sendall(unisci_messaggi(self.uscita))
+        self.uscita = []
+        self.byte   = 0
+    def leggi_messaggio(self,timeout=None):
+        """
+        Legge un messaggio dal socket, o None allo scadere del timeout
+        Reads a message from the socket, or None when the timeout expires
+        """
+        scadenza = None if timeout is None else monotonic() + timeout
+        while not self.messaggi:
+            if scadenza is None:
+                self.socket.settimeout(None)
+            else:
+                rimanente = scadenza - monotonic()
+                if rimanente <= 0:
+                    return None
+                self.socket.settimeout(rimanente)
+            try:
+                dati = self.socket.recv(LETTURA)
+            except socket.timeout:
+                return None
+            if not dati:
+                raise EOFError("Punto di ingresso chiuso") # Entry point closed
+            self.entrata += dati
+            self.messaggi.extend(estrai_messaggi(self.entrata))
+        return self.messaggi.popleft()
+    def ricevi(self,timeout=None):
+        """
+        Ricevi
+
+        Restituisce il prossimo segnale mandato dalla pipeline all'esterno,
+        come [segnale,mittente,destinatario,timestamp] più le eventuali
+        estensioni, o None allo scadere del timeout.
+
+        Receive
+
+        Returns the next signal sent by the pipeline outside, as
+        [signal,sender,recipient,timestamp] plus the extensions, if any, or
+        None when the timeout expires.
+        """
+        while not self.ricevuti:
+            messaggio = self.leggi_messaggio(timeout)
+            if messaggio is None:
+                return None
+            try:
+                self.ricevuti.extend(spacchetta_messaggio(messaggio))
+            except segnale_mal_formato:
+                continue
+        return self.ricevuti.popleft()
+    def chiudi(self):
+        """Svuota il buffer e chiude la connessione - Flushes the buffer and closes the connection"""
+        try:
+            self.svuota()
+        finally:
+            self.socket.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        sys.exit("uso: python ingresso.py PERCORSO_SOCKET SEGNALE " + # usage
+                 "[DESTINATARIO] [JSON]\n" + \
+                 "     python ingresso.py PERCORSO_SOCKET --ascolta")
+    with client_ingresso(sys.argv[1]) as client:
+        if sys.argv[2] == "--ascolta":
+            # Stampa i segnali che la pipeline manda all'esterno
+            # Print the signals the pipeline sends outside
+            try:
+                while True:
+                    print(client.ricevi(),flush=True)
+            except (EOFError,KeyboardInterrupt):
+                pass
+        else:
+            client.invia(sys.argv[2],
+                         sys.argv[3] if len(sys.argv) > 3 else "",
+                         json.loads(sys.argv[4]) if len(sys.argv) > 4 else None)
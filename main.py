@@ -8,39 +8,67 @@ Commons, PO Box 1866, Mountain View, CA 94042, USA.
 """
 
 from multiprocessing  import Process,Lock,Queue
-from time             import time,sleep
+from time             import time
 import logging
 import sys
 import readline
 
-from gestore_pipeline import gestore_pipeline
+from gestore_pipeline import gestore_pipeline,leggi_impostazioni
+from formato_segnale  import impacchetta
+from registro         import avvia_registro
+from ingresso         import processo_ingresso
+from avvio            import imposta_metodo_avvio
 
-ipc_entrata                 = Queue()
-lock_ipc_entrata            = Lock()
-ipc_uscita                  = Queue()
-lock_ipc_uscita             = Lock()
-file_configurazione         = "pipeline.conf"
-file_log                    = "shotstation.log"
+# Con i metodi di avvio "spawn" e "forkserver" i processi figli importano
+# questo modulo: il codice va eseguito solo nel processo principale
+# With the "spawn" and "forkserver" start methods the child processes import
+# this module: the code must run only in the main process
+if __name__ == "__main__":
+    file_configurazione         = "pipeline.conf"
+    # Il metodo di avvio dei processi va impostato prima di creare code e lock
+    # (vedi avvio)
+    # The processes start method must be set before creating queues and locks
+    # (see avvio)
+    imposta_metodo_avvio(leggi_impostazioni(file_configurazione))
 
-segnale_entrata             = ""
-segnale_uscita              = ""
-segnale_uscita_spacchettato = []
+    ipc_entrata                 = Queue()
+    lock_ipc_entrata            = Lock()
+    ipc_uscita                  = Queue()
+    lock_ipc_uscita             = Lock()
+    file_log                    = "shotstation.log"
+    # Socket Unix su cui i programmi esterni scrivono e leggono i segnali
+    # Unix socket on which the external programs write and read the signals
+    percorso_ingresso           = "pipeline.sock"
 
-logging.basicConfig(filename=file_log,level=logging.INFO)
-#logging.basicConfig(level=logging.DEBUG)
-######################## Codice Personale qui ##################################
-######################### Personal Code here ######################## ############
-p = gestore_pipeline(file_configurazione,
-                     ipc_uscita,
-                     lock_ipc_uscita,
-                     ipc_entrata,
-                     lock_ipc_entrata)
-p.start()
-sleep(0.001)
-with lock_ipc_uscita:
-    ipc_uscita.put_nowait("avvia:" + \
-                          str(time()) + ":" + \
-                          str(__name__) + \
-                          ":gestore_pipeline")
-sleep(0.001)
-p.join()
+    segnale_entrata             = ""
+    segnale_uscita              = ""
+    segnale_uscita_spacchettato = []
+
+    # I record di tutti i processi vengono scritti da un processo dedicato
+    # The records of every process are written by a dedicated process
+    avvia_registro(file_log,logging.INFO)
+    #avvia_registro(None,logging.DEBUG)
+    ######################## Codice Personale qui ##################################
+    ######################### Personal Code here ######################## ############
+    p = gestore_pipeline(file_configurazione,
+                         ipc_uscita,
+                         lock_ipc_uscita,
+                         ipc_entrata,
+                         lock_ipc_entrata)
+    p.start()
+    # I programmi esterni usano le code IPC del Gestore Pipeline tramite il punto
+    # di ingresso (vedi ingresso.py)
+    # External programs use the IPC queues of the Pipeline Manager through the
+    # entry point (see ingresso.py)
+    processo_ingresso(percorso_ingresso,
+                      ipc_uscita,
+                      lock_ipc_uscita,
+                      ipc_entrata,
+                      lock_ipc_entrata).start()
+    # Il segnale resta in coda finché il Gestore Pipeline non è pronto a leggerlo
+    # The signal stays queued until the Pipeline Manager is ready to read it
+    with lock_ipc_uscita:
+        ipc_uscita.put_nowait(impacchetta("avvia",
+                                          str(__name__),
+                                          "gestore_pipeline"))
+    p.join()
@@ -0,0 +1,236 @@
+"""
+Autore: Francesco Antonetti Lamorgese Passeri
+
+This work is licensed under the Creative Commons Attribution 4.0 International
+License. To view a copy of this license, visit
+http://creativecommons.org/licenses/by/4.0/ or send a letter to Creative
+Commons, PO Box 1866, Mountain View, CA 94042, USA.
+"""
+
+import atexit
+import logging
+import os
+
+from multiprocessing import Queue,shared_memory,resource_tracker
+from queue           import Empty
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Chiavi delle estensioni con cui un segnale fa riferimento a un blocco
+# Extension keys with which a signal refers to a block
+CHIAVE_MEMORIA   = "memoria"
+CHIAVE_BLOCCO    = "blocco"
+CHIAVE_LUNGHEZZA = "lunghezza"
+
+class memoria_esaurita(Exception):
+    """
+    Sollevata quando non ci sono blocchi liberi entro il timeout
+    Raised when there are no free blocks within the timeout
+    """
+
+class pool_memoria:
+    """
+    Pool Memoria
+
+    Canale dati in memoria condivisa tra le operazioni della pipeline. È un
+    segmento di memoria condivisa diviso in blocchi di uguale dimensione; gli
+    indici dei blocchi liberi stanno in una coda condivisa da tutti i processi.
+    Un'operazione alloca un blocco, ci scrive i dati e lo passa per riferimento
+    in un segnale (vedi riferimento()): il segnale porta solo l'intestazione,
+    i dati non vengono mai copiati né serializzati. Chi riceve il segnale
+    ottiene una memoryview (o un array NumPy) sul blocco e, quando ha finito,
+    lo rilascia perché torni libero.
+
+    Il pool deve essere creato prima di avviare i processi che lo usano. Il
+    segmento viene rimosso all'uscita del processo che lo ha creato.
+
+    Memory Pool
+
+    Shared memory data channel between the pipeline operations. It is a
+    shared memory segment split in blocks of equal size; the indexes of the
+    free blocks are in a queue shared by all the processes. An operation
+    allocates a block, writes the data in it and hands it off by reference in
+    a signal (see riferimento()): the signal carries only the header, the data
+    are never copied nor serialized. Whoever receives the signal gets a
+    memoryview (or a NumPy array) on the block and, when done, releases it so
+    that it becomes free again.
+
+    The pool must be created before starting the processes that use it. The
+    segment is removed when the process that created it exits.
+    """
+    def __init__(self,numero_blocchi,dimensione_blocco):
+        self.numero_blocchi    = int(numero_blocchi)
+        self.dimensione_blocco = int(dimensione_blocco)
+        self.memoria           = shared_memory.SharedMemory(
+                                   create = True,
+                                   size   = self.numero_blocchi * \
+                                            self.dimensione_blocco)
+        self.nome              = self.memoria.name
+        # Logger del componente (vedi registro)
+        # Logger of the component (see registro)
+        self.registro          = logging.getLogger(type(self).__name__)
+        self.proprietario      = os.getpid()
+        self.blocchi_liberi    = Queue()
+        for blocco in range(self.numero_blocchi):
+            self.blocchi_liberi.put_nowait(blocco)
+        atexit.register(self.chiudi)
+        self.registro.info(type(self).__name__ + " " + self.nome + ": " + \
+                           str(self.numero_blocchi) + " blocchi da " + \
+                           str(self.dimensione_blocco) + " byte") # blocks of bytes
+    def __getstate__(self):
+        # Il segmento viene riaperto per nome nel processo che lo riceve
+        # The segment is opened again by name in the receiving process
+        stato            = self.__dict__.copy()
+        stato["memoria"] = None
+        return stato
+    def segmento(self):
+        """
+        Restituisce il segmento di memoria condivisa, aprendolo se il pool è
+        arrivato al processo per serializzazione
+
+        Returns the shared memory segment, opening it if the pool reached the
+        process through serialization
+        """
+        if self.memoria is None:
+            self.memoria = shared_memory.SharedMemory(name=self.nome)
+            # Solo il proprietario deve rimuovere il segmento
+            # Only the owner must remove the segment
+            resource_tracker.unregister(self.memoria._name,"shared_memory")
+        return self.memoria
+    def alloca(self,timeout=None):
+        """
+        Alloca
+
+        Preleva un blocco libero e ne restituisce l'indice. Attende al più
+        timeout secondi (per sempre se None) che un blocco si liberi.
+
+        Allocate
+
+        Takes a free block and returns its index. Waits at most timeout
+        seconds (forever if None) for a block to become free.
+        """
+        try:
+            return self.blocchi_liberi.get(timeout=timeout)
+        except Empty:
+            raise memoria_esaurita(self.nome)
+    def rilascia(self,blocco):
+        """
+        Rilascia
+
+        Restituisce un blocco al pool. Le viste sul blocco non vanno più usate.
+
+        Release
+
+        Gives a block back to the pool. The views on the block must not be used
+        anymore.
+        """
+        if isinstance(blocco,dict):
+            blocco = blocco[CHIAVE_BLOCCO]
+        self.blocchi_liberi.put_nowait(int(blocco))
+    def vista(self,blocco,lunghezza=None):
+        """
+        Vista
+
+        Restituisce una memoryview sui primi lunghezza byte del blocco (su
+        tutto il blocco se None), senza copie.
+
+        View
+
+        Returns a memoryview on the first lunghezza bytes of the block (on the
+        whole block if None), without copies.
+        """
+        if lunghezza is None:
+            lunghezza = self.dimensione_blocco
+        if lunghezza > self.dimensione_blocco:
+            raise ValueError("Blocco troppo piccolo: " + str(lunghezza) + \
+                             " > " + str(self.dimensione_blocco)) # Block too small
+        inizio = int(blocco) * self.dimensione_blocco
+        return self.segmento().buf[inizio:inizio + lunghezza]
+    def scrivi(self,dati,timeout=None):
+        """
+        Scrivi
+
+        Alloca un blocco, ci copia i dati e restituisce il riferimento da
+        mettere nelle estensioni del segnale.
+
+        Write
+
+        Allocates a block, copies the data in it and returns the reference to
+        put in the signal extensions.
+        """
+        dati    = memoryview(dati).cast("B")
+        blocco  = self.alloca(timeout)
+        vista   = self.vista(blocco,len(dati))
+        vista[:] = dati
+        vista.release()
+        return self.riferimento(blocco,len(dati))
+    def riferimento(self,blocco,lunghezza):
+        """
+        Riferimento
+
+        Restituisce le estensioni con cui un segnale fa riferimento al blocco.
+
+        Reference
+
+        Returns the extensions with which a signal refers to the block.
+        """
+        return {CHIAVE_MEMORIA:   self.nome,
+                CHIAVE_BLOCCO:    int(blocco),
+                CHIAVE_LUNGHEZZA: int(lunghezza)}
+    def apri(self,estensioni):
+        """
+        Apri
+
+        Restituisce la memoryview sul blocco indicato dalle estensioni di un
+        segnale ricevuto.
+
+        Open
+
+        Returns the memoryview on the block referred by the extensions of a
+        received signal.
+        """
+        if estensioni.get(CHIAVE_MEMORIA) != self.nome:
+            raise ValueError("Il segnale non fa riferimento a questo pool") # The signal does not refer to this pool
+        return self.vista(estensioni[CHIAVE_BLOCCO],
+                          estensioni[CHIAVE_LUNGHEZZA])
+    def chiudi(self):
+        """
+        Chiudi
+
+        Chiude il segmento e, nel processo che lo ha creato, lo rimuove.
+
+        Close
+
+        Closes the segment and, in the process that created it, removes it.
+        """
+        if self.memoria is None:
+            return
+        try:
+            self.memoria.close()
+            if os.getpid() == self.proprietario:
+                self.memoria.unlink()
+        except (BufferError,FileNotFoundError) as e:
+            self.registro.warning(type(self).__name__ + " " + self.nome + \
+                                  ": " + str(e))
+        self.memoria = None
+
+def come_array(vista,tipo,forma=None):
+    """
+    Come Array
+
+    Restituisce un array NumPy costruito sulla vista, senza copie. Richiede
+    NumPy.
+
+    As Array
+
+    Returns a NumPy array built on the view, without copies. Requires NumPy.
+    """
+    if numpy is None:
+        raise ImportError("NumPy non è installato") # NumPy is not installed
+    array = numpy.frombuffer(vista,dtype=tipo)
+    if forma is not None:
+        array = array.reshape(forma)
+    return array
@@ -0,0 +1,200 @@
+"""
+Autore: Francesco Antonetti Lamorgese Passeri
+
+This work is licensed under the Creative Commons Attribution 4.0 International
+License. To view a copy of this license, visit
+http://creativecommons.org/licenses/by/4.0/ or send a letter to Creative
+Commons, PO Box 1866, Mountain View, CA 94042, USA.
+
+Metriche
+
+Metriche di esercizio dei Gestori Segnali e del Gestore Pipeline: contatori,
+profondità delle code e istogrammi delle latenze. La raccolta costa un
+incremento per evento e una sottrazione per segnale ricevuto, così da poter
+restare attiva in produzione; il resto del lavoro si fa solo quando qualcuno
+chiede un'istantanea con il segnale "statistiche".
+
+Metrics
+
+Runtime metrics of the Signal Managers and of the Pipeline Manager: counters,
+queue depths and latency histograms. Collection costs one increment per
+event and one subtraction per received signal, so that it can stay on in
+production; the rest of the work is done only when someone asks for a
+snapshot with the "statistiche" signal.
+"""
+
+import json
+import os
+
+from time            import time
+
+#Framework
+from code_segnali    import coda_limitata,coda_priorita
+
+# Segnale con cui si chiede un'istantanea delle metriche, ed estensione che la
+# porta nella risposta (in JSON)
+# Signal requesting a snapshot of the metrics, and extension carrying it in
+# the answer (as JSON)
+SEGNALE_STATISTICHE = "statistiche"
+CHIAVE_METRICHE     = "metriche"
+
+# Gli istogrammi delle latenze hanno intervalli a potenze di due di
+# microsecondi: l'intervallo i contiene le latenze tra 2^(i-1) e 2^i µs
+# Latency histograms have power of two microsecond buckets: bucket i holds
+# latencies between 2^(i-1) and 2^i µs
+INTERVALLI          = 32
+
+class metriche:
+    """
+    Metriche
+
+    Raccoglie le metriche di un componente. I contatori e gli istogrammi
+    vengono aggiornati dal thread del componente; le code registrate vengono
+    lette solo quando si chiede un'istantanea.
+
+    Metrics
+
+    Collects the metrics of a component. Counters and histograms are updated
+    by the component's thread; the registered queues are read only when a
+    snapshot is requested.
+    """
+    def __init__(self,componente):
+        self.componente = componente
+        self.contatori  = {}
+        self.latenze    = {} # canale: istogramma - # channel: histogram
+        self.code       = {} # canale: coda - # channel: queue
+    def conta(self,nome,quantita=1):
+        """Incrementa un contatore - Increments a counter"""
+        self.contatori[nome] = self.contatori.get(nome,0) + quantita
+    def registra_coda(self,canale,coda):
+        """Registra una coda di cui riportare la profondità - Registers a queue whose depth is reported"""
+        if coda is not None:
+            self.code[canale] = coda
+    def rimuovi_coda(self,canale):
+        """Smette di riportare la profondità di una coda - Stops reporting the depth of a queue"""
+        self.code.pop(canale,None)
+    def registra_latenza(self,canale,timestamp,adesso=None):
+        """
+        Registra Latenza
+
+        Aggiunge all'istogramma del canale il tempo trascorso dal timestamp
+        del segnale (l'istante in cui è stato impacchettato).
+
+        Record Latency
+
+        Adds to the channel histogram the time elapsed since the signal
+        timestamp (the instant it was packed).
+        """
+        if adesso is None:
+            adesso = time()
+        microsecondi = int((adesso - timestamp) * 1000000)
+        intervallo   = min(max(microsecondi,0).bit_length(),INTERVALLI - 1)
+        istogramma   = self.latenze.get(canale)
+        if istogramma is None:
+            istogramma = self.latenze[canale] = [0] * INTERVALLI
+        istogramma[intervallo] += 1
+    def istantanea(self):
+        """
+        Istantanea
+
+        Restituisce lo stato attuale delle metriche come dizionario
+        serializzabile in JSON.
+
+        Snapshot
+
+        Returns the current state of the metrics as a JSON serializable
+        dictionary.
+        """
+        return {"componente": self.componente,
+                "pid":        os.getpid(),
+                "istante":    time(),
+                "contatori":  dict(self.contatori),
+                "code":       {canale: profondita(coda) \
+                               for canale,coda in self.code.items()},
+                "latenze":    {canale: riassumi(istogramma) \
+                               for canale,istogramma in self.latenze.items()}}
+    def estensioni(self):
+        """
+        Estensioni della risposta al segnale "statistiche"
+        Extensions of the answer to the "statistiche" signal
+        """
+        return {CHIAVE_METRICHE: json.dumps(self.istantanea())}
+
+def profondita(coda):
+    """
+    Profondità
+
+    Profondità attuale della coda e, per le code limitate, capacità, eventi di
+    coda piena e segnali scartati; per le code a priorità anche la profondità
+    di ogni corsia. La profondità è None dove qsize() non è disponibile
+    (macOS).
+
+    Depth
+
+    Current depth of the queue and, for bounded queues, capacity, queue full
+    events and dropped signals; for priority queues also the depth of every
+    lane. Depth is None where qsize() is not available (macOS).
+    """
+    try:
+        valori = {"profondita": coda.qsize()}
+    except NotImplementedError:
+        valori = {"profondita": None}
+    if isinstance(coda,(coda_limitata,coda_priorita)):
+        valori["capacita"] = coda.capacita
+        valori["pieno"]    = coda.pieno.value
+        valori["scartati"] = coda.scartati.value
+    if isinstance(coda,coda_priorita) and valori["profondita"] is not None:
+        valori["corsie"]   = [corsia.qsize() for corsia in coda.corsie]
+    return valori
+
+def riassumi(istogramma):
+    """
+    Riassumi
+
+    Riassume un istogramma delle latenze: numero di campioni, p50, p99 e
+    massimo (in secondi, come limite superiore dell'intervallo) e intervalli
+    non vuoti.
+
+    Summarize
+
+    Summarizes a latency histogram: number of samples, p50, p99 and maximum
+    (in seconds, as upper bound of the bucket) and non empty buckets.
+    """
+    totale = sum(istogramma)
+    def percentile(frazione):
+        soglia    = frazione * totale
+        cumulato  = 0
+        for intervallo,conteggio in enumerate(istogramma):
+            cumulato += conteggio
+            if conteggio and cumulato >= soglia:
+                return (1 << intervallo) / 1000000
+        return None
+    massimo = None
+    for intervallo in range(INTERVALLI - 1,-1,-1):
+        if istogramma[intervallo]:
+            massimo = (1 << intervallo) / 1000000
+            break
+    return {"campioni":    totale,
+            "p50":         percentile(0.50),
+            "p99":         percentile(0.99),
+            "massimo":     massimo,
+            "istogramma":  {str(1 << intervallo): conteggio \
+                            for intervallo,conteggio in enumerate(istogramma) \
+                            if conteggio}}
+
+def scrivi_istantanee(file_istantanee,istantanee):
+    """
+    Scrivi Istantanee
+
+    Scrive le istantanee in un file JSON sostituendolo in modo atomico, così
+    che chi lo legge non trovi mai un file scritto a metà.
+
+    Write Snapshots
+
+    Writes the snapshots to a JSON file replacing it atomically, so that its
+    readers never find a half written file.
+    """
+    temporaneo = file_istantanee + ".tmp"
+    with open(temporaneo,"w") as f:
+        json.dump(istantanee,f,indent=2)
+    os.replace(temporaneo,file_istantanee)
@@ -0,0 +1,97 @@
+"""
+Autore: Francesco Antonetti Lamorgese Passeri
+
+This work is licensed under the Creative Commons Attribution 4.0 International
+License. To view a copy of this license, visit
+http://creativecommons.org/licenses/by/4.0/ or send a letter to Creative
+Commons, PO Box 1866, Mountain View, CA 94042, USA.
+
+Nodo
+
+Avvia su questo host un'operazione che la pipeline dichiara remota
+("remota X host:porta" in pipeline.conf). Il nodo legge lo stesso file di
+configurazione della pipeline, così che la tabella dei nomi e le impostazioni
+del framework coincidano, e collega il Gestore Segnali dell'operazione al
+Gestore Pipeline con un canale remoto (vedi trasporto.py). Il nodo può essere
+avviato prima o dopo la pipeline: il canale si riconnette da solo.
+
+    python nodo.py pipeline.conf OPERAZIONE[#REPLICA] [file_log]
+
+La chiave condivisa è "chiave_remota" nella configurazione o la variabile
+d'ambiente PIPELINE_CHIAVE_REMOTA.
+
+Node
+
+Starts on this host an operation the pipeline declares remote ("remota X
+host:porta" in pipeline.conf). The node reads the same configuration file of
+the pipeline, so that the names table and the framework settings match, and
+connects the Signal Manager of the operation to the Pipeline Manager with a
+remote channel (see trasporto.py). The node can be started before or after
+the pipeline: the channel reconnects by itself.
+
+The shared key is "chiave_remota" in the configuration or the
+PIPELINE_CHIAVE_REMOTA environment variable.
+"""
+
+import logging
+import sys
+
+from multiprocessing  import Lock
+from importlib        import import_module
+
+#Framework
+from oggetto          import oggetto
+from gestore_pipeline import leggi_impostazioni,imposta_framework,\
+                             operazioni_remote,SEPARATORE_REPLICA
+from registro         import avvia_registro
+from trasporto        import canale_remoto,chiave
+from avvio            import imposta_metodo_avvio
+
+def avvia_nodo(file_configurazione,nome):
+    """
+    Avvia Nodo
+
+    Crea ed avvia l'operazione remota indicata (o la sua replica) collegata
+    al Gestore Pipeline. Restituisce l'operazione.
+
+    Start Node
+
+    Creates and starts the given remote operation (or its replica) connected
+    to the Pipeline Manager. Returns the operation.
+    """
+    impostazioni    = leggi_impostazioni(file_configurazione)
+    capacita_code,_ = imposta_framework(impostazioni)
+    indirizzi       = operazioni_remote(impostazioni)
+    if nome not in indirizzi:
+        raise ValueError(nome + " non è un'operazione remota in " + # is not a remote operation in
+                         file_configurazione)
+    operazione = nome.split(SEPARATORE_REPLICA)[0]
+    canale     = canale_remoto(indirizzi[nome],
+                               chiave(next((valore \
+                                            for impostazione,valore in impostazioni \
+                                            if impostazione == "chiave_remota"),
+                                           None)),
+                               False,
+                               nome,
+                               capacita_code.get(operazione,
+                                                 oggetto.capacita_coda))
+    # Il canale fa da coda IPC in entrata e in uscita dell'operazione
+    # The channel is both the incoming and the outgoing IPC queue of the
+    # operation
+    ogg        = getattr(import_module(operazione),operazione)(
+                                                     str(operazione + ".conf"),
+                                                     canale,
+                                                     Lock(),
+                                                     canale,
+                                                     Lock())
+    ogg.nome   = nome
+    ogg.start()
+    return ogg
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3,4):
+        sys.exit("uso: python nodo.py pipeline.conf OPERAZIONE[#REPLICA] " + # usage
+                 "[file_log]")
+    imposta_metodo_avvio(leggi_impostazioni(sys.argv[1]))
+    avvia_registro(sys.argv[3] if len(sys.argv) > 3 else None,logging.INFO)
+    avvia_nodo(sys.argv[1],sys.argv[2]).join()
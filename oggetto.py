@@ -7,14 +7,46 @@ http://creativecommons.org/licenses/by/4.0/ or send a letter to Creative
 Commons, PO Box 1866, Mountain View, CA 94042, USA.
 """
 import logging
+import os
 import sys
+import threading
 
-from multiprocessing import Process,Lock,Queue
-from gestore_segnali import gestore_segnali
+from multiprocessing import Process,Lock
+from gestore_segnali import gestore_segnali,MODALITA_PROCESSO,MODALITA_THREAD,\
+                            LOTTO_MASSIMO,RITARDO_MASSIMO_LOTTO
+from code_segnali    import coda_limitata,coda_priorita,elementi,inserisci,\
+                            POLITICA_BLOCCA,PRIORITA_SEGNALI,\
+                            SOGLIA_PRECEDENZA
+from collections     import deque
 from contextlib      import contextmanager
-from time            import sleep
+from queue           import Empty
+from time            import sleep,time
+from registro        import registro_segnali
+from tracciamento    import traccia_segnale,registra_segnale
+from formato_segnale import verifica_estensioni
+from profilatore     import profilatore,SEGNALE_PROFILA
+from giornale        import CHIAVE_SEQUENZA,SEGNALE_CONFERMA
+from richieste       import richieste_in_corso,richiesta,estensioni_richiesta,\
+                            estensioni_risposta,SEGNALE_RISPOSTA,\
+                            ATTESA_RISPOSTA
+from avvio           import stato_processo,ripristina_processo,\
+                            versione_classe,aggiorna_classe
 
 ATTESA_CICLO_PRINCIPALE = 0.01
+# Attributi di classe impostati per tutto il framework (vedi
+# gestore_pipeline.imposta_framework), da ripristinare nei processi avviati
+# senza fork (vedi avvio)
+# Class attributes set for the whole framework (see
+# gestore_pipeline.imposta_framework), to restore in the processes started
+# without fork (see avvio)
+ATTRIBUTI_FRAMEWORK     = ("modalita_gestore_segnali",
+                           "lotto_massimo",
+                           "ritardo_massimo_lotto",
+                           "capacita_coda",
+                           "priorita_segnali",
+                           "soglia_precedenza",
+                           "segnali_coalescenti",
+                           "pool_memoria")
 
 class oggetto(Process):
     """
@@ -29,69 +61,259 @@ class oggetto(Process):
     Base class for all framework objects. It has the characteristics of
     basis for the management of the associated process and sets and starts the Manager
     Object signals
+
+    Il Gestore Segnali può girare come processo separato (predefinito) o come
+    thread nel processo dell'oggetto (modalita_gestore_segnali = "thread").
+
+    The Signal Manager can run as a separate process (default) or as a thread
+    inside the object's process (modalita_gestore_segnali = "thread").
     """
+    # Modalità del Gestore Segnali dell'oggetto (vedi gestore_segnali)
+    # Mode of the object's Signal Manager (see gestore_segnali)
+    modalita_gestore_segnali = MODALITA_PROCESSO
+    # Raggruppamento dei segnali del Gestore Segnali dell'oggetto
+    # Signal batching of the object's Signal Manager
+    lotto_massimo            = LOTTO_MASSIMO
+    ritardo_massimo_lotto    = RITARDO_MASSIMO_LOTTO
+    # Pool di memoria condivisa per i dati voluminosi (vedi memoria_condivisa)
+    # Shared memory pool for bulky data (see memoria_condivisa)
+    pool_memoria             = None
+    # Capacità delle code interne (0: illimitate); quando sono piene lo
+    # scrittore attende (vedi code_segnali.coda_limitata)
+    # Capacity of the internal queues (0: unbounded); when they are full the
+    # writer waits (see code_segnali.coda_limitata)
+    capacita_coda            = 0
+    # Corsia di priorità dei segnali nelle code in entrata e soglia oltre cui
+    # una corsia scavalcata viene servita comunque (vedi
+    # code_segnali.coda_priorita)
+    # Priority lane of the signals in the incoming queues and threshold past
+    # which a skipped lane is served anyway (see code_segnali.coda_priorita)
+    priorita_segnali         = PRIORITA_SEGNALI
+    soglia_precedenza        = SOGLIA_PRECEDENZA
+    # Segnali di cui conta solo l'ultimo valore: uno più recente prende il
+    # posto di quello ancora in coda (vedi gestore_segnali)
+    # Signals of which only the latest value matters: a newer one takes the
+    # place of the one still queued (see gestore_segnali)
+    segnali_coalescenti      = frozenset()
+    # Se il Gestore Segnali dell'oggetto scarta i segnali diretti ad altri
+    # (vedi gestore_segnali)
+    # Whether the object's Signal Manager drops the signals addressed to
+    # others (see gestore_segnali)
+    controlla_destinatario   = True
+    # Coda su cui segnalare di essere pronti, assegnata dal Gestore Pipeline
+    # (vedi segnala_pronto)
+    # Queue on which to report being ready, assigned by the Pipeline Manager
+    # (see segnala_pronto)
+    coda_pronti              = None
+    pronto_segnalato         = False
+
     def __init__(self,
                  coda_ipc_entrata,
                  lock_ipc_entrata,
                  coda_ipc_uscita,
-                 lock_ipc_uscita):
+                 lock_ipc_uscita,
+                 modalita_gestore_segnali = None):
 
         #################### Inizializzazione oggetto ##########################
 
         super().__init__()
-        logging.info(f"{type(self).__name__}: inizializzazione")  # initialization object
+        # Logger del componente e dei suoi record per singolo segnale (vedi
+        # registro)
+        # Logger of the component and of its per signal records (see
+        # registro)
+        self.registro          = logging.getLogger(type(self).__name__)
+        self.registro_segnali  = registro_segnali(type(self).__name__)
+        # Profilatore avviato dal segnale "profila"
+        # Profiler started by the "profila" signal
+        self.profilatore       = profilatore(type(self).__name__)
+        self.registro.info(f"{type(self).__name__}: inizializzazione")  # initialization object
         self.impostazioni_in_aggiornamento = 0
         self.stato = "idle"
+        # Nome dell'oggetto nella pipeline: è il nome della classe, seguito dal
+        # numero della replica se l'operazione è replicata
+        # Name of the object in the pipeline: it is the class name, followed by
+        # the replica number if the operation is replicated
+        self.nome  = type(self).__name__
+
+        # Code IPC con l'esterno, prese in carico dal Gestore Segnali
+        # IPC queues with the outside, handled by the Signal Manager
+
+        self.coda_ipc_entrata              = coda_ipc_entrata
+        self.lock_ipc_entrata              = lock_ipc_entrata
+        self.coda_ipc_uscita               = coda_ipc_uscita
+        self.lock_ipc_uscita               = lock_ipc_uscita
+
+        if modalita_gestore_segnali is not None:
+            self.modalita_gestore_segnali  = modalita_gestore_segnali
 
         # Coda in cui il Gestore Segali mette i segnali ricevuti
 
-        self.coda_segnali_entrata          = Queue()
-        self.lock_segnali_entrata          = Lock()
+        self.coda_segnali_entrata          = None
+        self.lock_segnali_entrata          = None
 
         # Coda in cui l'oggetto mette i segnali da inviare all'esterno. È presa
         # in carico dal Gestore Segnali
 
-        self.coda_segnali_uscita           = Queue()
-        self.lock_segnali_uscita           = Lock()
+        self.coda_segnali_uscita           = None
+        self.lock_segnali_uscita           = None
+
+        self.gestore_segnali               = None
+
+        # Estensioni dell'ultimo segnale letto
+        # Extensions of the last read signal
+
+        self.estensioni_segnale            = {}
+
+        # Segnali già prelevati dalla Coda Segnali Entrata, arrivati in un lotto
+        # Signals already taken from the Incoming Signals Queue, arrived in a
+        # batch
+
+        self.segnali_sospesi               = deque()
+
+        # Sequenza dell'ultimo segnale letto e dell'ultimo elaborato ancora da
+        # confermare, per i segnali registrati nel giornale del Gestore
+        # Pipeline (vedi giornale)
+        # Sequence of the last read signal and of the last processed one yet
+        # to acknowledge, for the signals recorded in the Pipeline Manager's
+        # journal (see giornale)
+
+        self.sequenza_letta                = None
+        self.sequenza_da_confermare        = None
+
+        # Richieste inviate in attesa di risposta, e richiesta (destinatario
+        # della risposta, correlazione) dell'ultimo segnale letto se ne porta
+        # una (vedi richieste)
+        # Sent requests waiting for a response, and request (recipient of the
+        # response, correlation) of the last read signal if it carries one
+        # (see richieste)
+
+        self.richieste                     = richieste_in_corso()
+        self.richiesta_segnale             = None
 
         ##### Impostazione, inizializzazione ed avvio del Gestore Segnali ######
 
+        # In modalità thread il Gestore Segnali deve girare nel processo
+        # dell'oggetto: viene avviato all'inizio di run()
+        # In thread mode the Signal Manager must run in the object's process:
+        # it is started at the beginning of run()
+        if self.modalita_gestore_segnali == MODALITA_PROCESSO:
+            self.avvia_gestore_segnali()
+
+        ################## Fine Inizializzazione oggetto #######################
+
+        self.registro.info(f"{type(self).__name__} inizializzato") # initialized
+
+    def __getstate__(self):
+        # Con i metodi di avvio senza fork l'oggetto viaggia serializzato
+        # verso il proprio processo (vedi avvio)
+        # With the start methods without fork the object travels serialized
+        # towards its own process (see avvio)
+        stato = stato_processo(self)
+        stato["_attributi_framework"] = {attributo: getattr(oggetto,attributo) \
+                                         for attributo in ATTRIBUTI_FRAMEWORK}
+        # Un'operazione sostituita con una nuova versione del suo modulo
+        # non deve partire con quella importata in anticipo
+        # An operation replaced with a new version of its module must not
+        # start with the one imported in advance
+        stato["_versione_classe"]     = versione_classe(type(self))
+        return stato
+    def __setstate__(self,stato):
+        stato = dict(stato)
+        for attributo,valore in stato.pop("_attributi_framework").items():
+            setattr(oggetto,attributo,valore)
+        aggiorna_classe(self,stato.pop("_versione_classe"))
+        ripristina_processo(self,stato)
+    def avvia_gestore_segnali(self):
+        """
+        Crea le code interne, imposta ed avvia il Gestore Segnali dell'oggetto.
+        In modalità thread le code interne sono code locali, senza
+        serializzazione dei segnali. La coda in entrata è a priorità, così che
+        i segnali di controllo non attendano i segnali ordinari già in coda;
+        quella in uscita resta in ordine, perché lo stop del Gestore Segnali
+        non scavalchi gli ultimi segnali dell'oggetto.
+
+        Creates the internal queues, sets up and starts the object's Signal
+        Manager. In thread mode the internal queues are local queues, with no
+        serialization of signals. The incoming queue is a priority queue, so
+        that control signals do not wait for the ordinary signals already
+        queued; the outgoing one stays in order, so that the Signal Manager
+        stop does not overtake the last signals of the object.
+        """
+        locale = self.modalita_gestore_segnali == MODALITA_THREAD
+        self.coda_segnali_entrata          = coda_priorita(self.capacita_coda,
+                                                           POLITICA_BLOCCA,
+                                                           locale,
+                                                           self.priorita_segnali,
+                                                           self.soglia_precedenza)
+        self.coda_segnali_uscita           = coda_limitata(self.capacita_coda,
+                                                           POLITICA_BLOCCA,
+                                                           locale)
+        if locale:
+            self.lock_segnali_entrata      = threading.Lock()
+            self.lock_segnali_uscita       = threading.Lock()
+        else:
+            self.lock_segnali_entrata      = Lock()
+            self.lock_segnali_uscita       = Lock()
+
         self.gestore_segnali      = gestore_segnali(type(self).__name__,
-                                                      coda_ipc_entrata,
-                                                      lock_ipc_entrata,
-                                                      coda_ipc_uscita,
-                                                      lock_ipc_uscita,
+                                                      self.coda_ipc_entrata,
+                                                      self.lock_ipc_entrata,
+                                                      self.coda_ipc_uscita,
+                                                      self.lock_ipc_uscita,
                                                       self.coda_segnali_entrata,
                                                       self.lock_segnali_entrata,
                                                       self.coda_segnali_uscita,
-                                                      self.lock_segnali_uscita)
+                                                      self.lock_segnali_uscita,
+                                                      controlla_destinatario = \
+                                                 self.controlla_destinatario,
+                                                      modalita = \
+                                                 self.modalita_gestore_segnali,
+                                                      lotto_massimo = \
+                                                 self.lotto_massimo,
+                                                      ritardo_massimo_lotto = \
+                                                 self.ritardo_massimo_lotto,
+                                                      coalescenti = \
+                                                 self.segnali_coalescenti)
         self.gestore_segnali.start()
-        sleep(0.01)
-        logging.info(f"{type(self).__name__}: avviando gestore segnali") # starting signal manager
-        with self.lock_segnali_uscita:
-            self.coda_segnali_uscita.put_nowait(["avvia","gestore_segnali"]) # start "," signal_manager "
-        
-        ################## Fine Inizializzazione oggetto #######################
-
-        logging.info(f"{type(self).__name__} inizializzato") # initialized
+        self.registro.info(f"{type(self).__name__}: avviando gestore segnali") # starting signal manager
+        inserisci(self.coda_segnali_uscita,["avvia","gestore_segnali"]) # start "," signal_manager "
 
     def run(self):
         """
         Punto d'entrata del processo/thread
         Entry point of the process / thread
         """
-        logging.info(f"{type(self).__name__} creato")
+        self.registro.info(f"{type(self).__name__} creato")
+
+        if self.modalita_gestore_segnali == MODALITA_THREAD:
+            self.avvia_gestore_segnali()
+        self.segnala_pronto()
 
         # Entra nello stato richiesto
 
         while True:
-            logging.info(f"{type(self).__name__} entrando in {self.stato}")
+            self.registro.info(f"{type(self).__name__} entrando in {self.stato}")
             s = getattr(self,self.stato)()
             if isinstance(s,int):
                 if s != 0:
                     break
         return int(s)
 
+    def segnala_pronto(self):
+        """
+        Segnala al Gestore Pipeline che l'oggetto è pronto a ricevere segnali.
+        Va chiamata all'inizio di run(), dopo aver avviato il Gestore Segnali;
+        le operazioni che ridefiniscono run() devono chiamarla a loro volta.
+
+        Reports to the Pipeline Manager that the object is ready to receive
+        signals. It must be called at the start of run(), after starting the
+        Signal Manager; operations overriding run() must call it themselves.
+        """
+        if self.coda_pronti is None or self.pronto_segnalato:
+            return
+        self.pronto_segnalato = True
+        self.coda_pronti.put([self.nome,os.getpid(),time()])
+
     def idle(self):
         """Stato Idle 
         This version of the function uses a single call 
@@ -105,25 +327,27 @@ class oggetto(Process):
         instead of raising an exception. 
         This allows the caller to handle the error gracefully.
         """
-        logging.info(f"{type(self).__name__} idle")
+        self.registro.info(f"{type(self).__name__} idle")
         try:
             self.scrivi_segnale("idle", "")
         except Exception as e:
-            logging.error(f"{type(self).__name__} {e}")
+            self.registro.error(f"{type(self).__name__} {e}")
             return -1
         
         while True:
             try:
                 segnale, mittente, destinatario, timestamp = self.leggi_segnale()
+            except Empty:
+                continue
             except Exception as e:
-                logging.error(f"{type(self).__name__} {e}")
+                self.registro.error(f"{type(self).__name__} {e}")
                 return -1
             
             if segnale == "stop":
                 try:
                     self.scrivi_segnale(segnale, "gestore_segnali")
                 except Exception as e:
-                    logging.error(f"{type(self).__name__} {e}")
+                    self.registro.error(f"{type(self).__name__} {e}")
                     return -1
                 
                 return -1
@@ -135,7 +359,7 @@ class oggetto(Process):
             try:
                 self.scrivi_segnale("segnale non valido", "")
             except Exception as e:
-                logging.error(f"{type(self).__name__} {e}")
+                self.registro.error(f"{type(self).__name__} {e}")
                 return -1
             
             sleep(ATTESA_CICLO_PRINCIPALE)
@@ -160,38 +384,275 @@ class oggetto(Process):
     def leggi_segnale(self, timeout=1):
         """
         Lettura del primo segnale in entrata - Reading of the first incoming signal
+
+        Restituisce [segnale, mittente, destinatario, timestamp]; le eventuali
+        estensioni del segnale restano in self.estensioni_segnale. Solleva
+        queue.Empty se non arriva nessun segnale entro il timeout.
+
+        Returns [signal, sender, recipient, timestamp]; the signal extensions,
+        if any, are left in self.estensioni_segnale. Raises queue.Empty if no
+        signal arrives within the timeout.
+
+        Il segnale "profila" viene gestito qui e non viene restituito.
+
+        The "profila" signal is handled here and is not returned.
+
+        Anche le risposte alle richieste inviate (vedi richiedi) vengono
+        consegnate qui ai loro futuri e non vengono restituite.
+
+        Responses to the sent requests (see richiedi) are also delivered here
+        to their futures and are not returned.
+
+        Chiamarla vuol dire aver elaborato il segnale letto in precedenza: i
+        segnali registrati nel giornale vengono confermati al Gestore Pipeline
+        con un solo segnale "conferma" per lotto ricevuto.
+
+        Calling it means having processed the previously read signal: the
+        signals recorded in the journal are acknowledged to the Pipeline
+        Manager with a single "conferma" signal per received batch.
         """
-        try:
-            pacchetto_segnale = self.coda_segnali_entrata.get(timeout=timeout)
-        except Queue.Empty:
-            raise Exception("Coda segnali entrata vuota - Entry queue empty")
-        except Exception as e:
-            logging.error(f"{type(self).__name__} {e}")
-        raise
-    
-        segnale, mittente, destinatario, timestamp = pacchetto_segnale + [""] * (4 - len(pacchetto_segnale))
-    
+        self.profilatore.controlla()
+        if self.sequenza_letta is not None:
+            self.sequenza_da_confermare,self.sequenza_letta = \
+                                                     self.sequenza_letta,None
+        while True:
+            if self.richieste:
+                self.richieste.scadi()
+            if not self.segnali_sospesi:
+                if self.sequenza_da_confermare is not None:
+                    self.conferma_segnali()
+                self.segnali_sospesi.extend(
+                      elementi(self.coda_segnali_entrata.get(timeout=timeout)))
+            pacchetto_segnale = self.segnali_sospesi.popleft()
+
+            segnale, mittente, destinatario, timestamp = \
+                             (list(pacchetto_segnale[:4]) + [""] * 4)[:4]
+            self.estensioni_segnale = pacchetto_segnale[4] \
+                                      if len(pacchetto_segnale) > 4 else {}
+            registra_segnale(self.estensioni_segnale, self.nome, "leggi")
+            if self.estensioni_segnale:
+                self.sequenza_letta = self.estensioni_segnale.get(
+                                                              CHIAVE_SEQUENZA)
+            if segnale == SEGNALE_PROFILA:
+                self.avvia_profilazione(self.estensioni_segnale)
+            elif segnale != SEGNALE_RISPOSTA or \
+                 not self.richieste.risolvi(self.estensioni_segnale):
+                break
+
+        self.richiesta_segnale = richiesta(mittente, self.estensioni_segnale)
+
         if segnale == "stop":
             try:
                 self.scrivi_segnale(segnale, "gestore_segnali")
             except Exception as e:
-                logging.error(f"{type(self).__name__} {e}")
-            raise
-    
+                self.registro.error(f"{type(self).__name__} {e}")
+
         return [segnale, mittente, destinatario, timestamp]
 
 
-    def scrivi_segnale(self, segnale, destinatario):
+    def scrivi_segnale(self, segnale, destinatario, estensioni=None):
         """
-        Scrittura del segnale in uscita
+        Scrittura del segnale in uscita - Writing of the outgoing signal
+
+        Le estensioni, se indicate, sono un dizionario che viaggia insieme al
+        segnale (vedi formato_segnale); se non possono essere codificate
+        solleva formato_segnale.segnale_non_codificabile.
+
+        The extensions, if given, are a dictionary that travels together with
+        the signal (see formato_segnale); if they cannot be encoded it raises
+        formato_segnale.segnale_non_codificabile.
         """
-        try:
-            self.coda_segnali_uscita.put([segnale, destinatario], timeout=1)
-        except Queue.Full:
+        self.profilatore.controlla()
+        estensioni        = traccia_segnale(estensioni)
+        pacchetto_segnale = [segnale, destinatario]
+        if estensioni:
+            verifica_estensioni(estensioni)
+            pacchetto_segnale.append(estensioni)
+            registra_segnale(estensioni, self.nome, "scrivi")
+        if not inserisci(self.coda_segnali_uscita, pacchetto_segnale):
             raise Exception("Coda Segnali Uscita piena")
-        except Exception as e:
-            logging.error(f"{type(self).__name__} {e}")
-        raise
-    
+
         return 0
 
+    def richiedi(self, segnale, destinatario, estensioni=None,
+                 timeout=ATTESA_RISPOSTA):
+        """
+        Invio di una richiesta - Sending of a request
+
+        Scrive il segnale come richiesta (vedi richieste) e restituisce il
+        futuro della risposta, senza attenderla: si possono avere molte
+        richieste in corso insieme. Il futuro viene risolto quando la risposta
+        viene letta (leggi_segnale, attendi_risposta) e riceve TimeoutError
+        se la risposta non arriva entro il timeout (None: nessun limite).
+
+        Writes the signal as a request (see richieste) and returns the future
+        of the response, without waiting for it: many requests can be in
+        flight at once. The future is resolved when the response is read
+        (leggi_segnale, attendi_risposta) and receives TimeoutError if the
+        response does not arrive within the timeout (None: no limit).
+        """
+        correlazione,futuro = self.richieste.nuova(timeout)
+        try:
+            self.scrivi_segnale(segnale, destinatario,
+                                estensioni_richiesta(estensioni, correlazione,
+                                                     self.nome))
+        except Exception:
+            del self.richieste.futuri[correlazione]
+            raise
+        return futuro
+
+    def attendi_risposta(self, futuro):
+        """
+        Attesa della risposta a una richiesta - Wait for the response to a request
+
+        Legge i segnali in entrata finché il futuro non viene risolto o la
+        sua richiesta non scade, e ne restituisce il valore (o ne solleva
+        l'eccezione). Gli altri segnali letti restano in attesa per
+        leggi_segnale, nello stesso ordine.
+
+        Reads the incoming signals until the future is resolved or its
+        request expires, and returns its value (or raises its exception). The
+        other read signals are kept for leggi_segnale, in the same order.
+        """
+        if not futuro.done():
+            self.segnali_sospesi = deque(self.estrai_risposte(
+                                                         self.segnali_sospesi))
+        while not futuro.done():
+            if futuro not in self.richieste.futuri.values():
+                raise ValueError("Futuro non associato a una richiesta in corso") # Future not tied to a request in flight
+            self.raccogli_risposte(self.richieste.attesa())
+            self.richieste.scadi()
+        return futuro.result()
+
+    def chiama(self, segnale, destinatario, estensioni=None,
+               timeout=ATTESA_RISPOSTA):
+        """
+        Richiesta con attesa della risposta - Request waiting for the response
+        """
+        return self.attendi_risposta(self.richiedi(segnale, destinatario,
+                                                   estensioni, timeout))
+
+    def rispondi(self, valore=None, errore=None, richiesta=None):
+        """
+        Risposta a una richiesta - Response to a request
+
+        Invia il valore, che deve poter essere codificato in JSON, o il
+        messaggio d'errore direttamente alla replica che ha inviato la
+        richiesta: quella dell'ultimo segnale letto o quella indicata (come
+        self.richiesta_segnale, da conservare se si risponde più tardi).
+
+        Sends the value, which must be encodable as JSON, or the error
+        message straight to the replica that sent the request: the one of
+        the last read signal or the given one (as self.richiesta_segnale, to
+        keep when answering later).
+        """
+        destinatario,correlazione = self.richiesta_da_rispondere(richiesta)
+        return self.scrivi_segnale(SEGNALE_RISPOSTA, destinatario,
+                                   estensioni_risposta(correlazione, valore,
+                                                       errore))
+
+    def richiesta_da_rispondere(self, richiesta=None):
+        """Richiesta a cui rispondere - Request to answer"""
+        richiesta = richiesta or self.richiesta_segnale
+        if richiesta is None:
+            raise ValueError("Nessuna richiesta a cui rispondere") # No request to answer
+        return richiesta
+
+    def raccogli_risposte(self, timeout=None):
+        """
+        Preleva al più un elemento dalla Coda Segnali Entrata entro il timeout
+        (0: senza attendere), consegna le risposte ai loro futuri e mette gli
+        altri segnali in attesa per leggi_segnale
+
+        Takes at most one element from the Incoming Signals Queue within the
+        timeout (0: without waiting), delivers the responses to their futures
+        and keeps the other signals for leggi_segnale
+
+        Restituisce True se ha prelevato un elemento - Returns True if it took
+        an element
+        """
+        try:
+            elemento = self.coda_segnali_entrata.get(timeout != 0, timeout)
+        except Empty:
+            return False
+        self.segnali_sospesi.extend(self.estrai_risposte(elementi(elemento)))
+        return True
+
+    def estrai_risposte(self, segnali):
+        """
+        Consegna ai futuri le risposte tra i segnali e restituisce gli altri
+        Delivers to the futures the responses among the signals and returns
+        the others
+        """
+        return [pacchetto_segnale for pacchetto_segnale in segnali \
+                if pacchetto_segnale[0] != SEGNALE_RISPOSTA or \
+                   len(pacchetto_segnale) < 5 or \
+                   not self.richieste.risolvi(pacchetto_segnale[4])]
+
+    def conferma_segnali(self):
+        """
+        Conferma dei segnali elaborati - Acknowledgement of the processed signals
+
+        Conferma al Gestore Pipeline tutti i segnali registrati nel giornale
+        fino all'ultimo elaborato.
+
+        Acknowledges to the Pipeline Manager all the signals recorded in the
+        journal up to the last processed one.
+        """
+        sequenza,self.sequenza_da_confermare = self.sequenza_da_confermare,None
+        self.scrivi_segnale(SEGNALE_CONFERMA, "gestore_pipeline",
+                            {CHIAVE_SEQUENZA: sequenza})
+
+    def avvia_profilazione(self, estensioni=None):
+        """
+        Avvio della profilazione dell'oggetto - Start of the object profiling
+
+        Avvia il profilatore come richiesto dalle estensioni del segnale
+        "profila" (vedi profilatore). Il profilo deterministico si ferma alla
+        prima lettura o scrittura di un segnale dopo la scadenza.
+
+        Starts the profiler as requested by the extensions of the "profila"
+        signal (see profilatore). The deterministic profile stops on the first
+        read or write of a signal after the deadline.
+        """
+        self.profilatore.nome = self.nome
+        return self.profilatore.avvia(estensioni)
+
+    def scrivi_buffer(self, segnale, destinatario, dati, estensioni=None):
+        """
+        Scrittura di un segnale con dati voluminosi - Writing of a signal with bulky data
+
+        Copia i dati in un blocco del pool di memoria condivisa e invia il
+        segnale con il solo riferimento al blocco. Il destinatario legge i dati
+        con leggi_buffer() e li libera con rilascia_buffer().
+
+        Copies the data in a block of the shared memory pool and sends the
+        signal with just the reference to the block. The recipient reads the
+        data with leggi_buffer() and frees them with rilascia_buffer().
+        """
+        riferimento = self.pool_memoria.scrivi(dati)
+        if estensioni:
+            riferimento = dict(estensioni, **riferimento)
+        try:
+            return self.scrivi_segnale(segnale, destinatario, riferimento)
+        except Exception:
+            self.pool_memoria.rilascia(riferimento)
+            raise
+
+    def leggi_buffer(self, estensioni=None):
+        """
+        Lettura dei dati voluminosi di un segnale - Reading of the bulky data of a signal
+
+        Restituisce una memoryview, senza copie, sui dati dell'ultimo segnale
+        letto (o di quello con le estensioni indicate).
+
+        Returns a memoryview, without copies, on the data of the last read
+        signal (or of the one with the given extensions).
+        """
+        return self.pool_memoria.apri(estensioni or self.estensioni_segnale)
+
+    def rilascia_buffer(self, estensioni=None):
+        """
+        Rilascio dei dati voluminosi di un segnale - Release of the bulky data of a signal
+        """
+        self.pool_memoria.rilascia(estensioni or self.estensioni_segnale)
@@ -0,0 +1,375 @@
+"""
+Autore: Francesco Antonetti Lamorgese Passeri
+
+This work is licensed under the Creative Commons Attribution 4.0 International
+License. To view a copy of this license, visit
+http://creativecommons.org/licenses/by/4.0/ or send a letter to Creative
+Commons, PO Box 1866, Mountain View, CA 94042, USA.
+"""
+
+import asyncio
+import logging
+
+from collections     import deque
+from multiprocessing import Process
+from queue           import Empty,Full
+from time            import monotonic
+
+#Framework
+from oggetto         import oggetto
+from gestore_segnali import MODALITA_THREAD
+from code_segnali    import lettori,coda_limitata,incrementa,\
+                            ATTESA_MASSIMA_INSERIMENTO
+from tracciamento    import traccia_segnale,registra_segnale
+from formato_segnale import verifica_estensioni
+from richieste       import estensioni_risposta,SEGNALE_RISPOSTA,\
+                            ATTESA_RISPOSTA
+
+# Intervallo tra i tentativi di scrittura su una Coda Segnali Uscita piena
+# Interval between write attempts on a full Outgoing Signals Queue
+ATTESA_CODA_PIENA      = 0.005
+# Attesa massima dei segnali da parte di un task che aspetta una risposta
+# mentre altri segnali attendono di essere letti
+# Maximum wait for signals of a task awaiting a response while other signals
+# are waiting to be read
+ATTESA_SEGNALI_SOSPESI = 0.01
+
+async def attendi_lettori(lettori_coda,timeout=None):
+    """
+    Attendi Lettori
+
+    Sospende il task corrente, senza bloccare il ciclo di eventi, finché uno
+    dei lettori non ha dei dati o finché non scade il timeout.
+
+    Wait Readers
+
+    Suspends the current task, without blocking the event loop, until one of
+    the readers has data or the timeout expires.
+    """
+    ciclo  = asyncio.get_running_loop()
+    futuro = ciclo.create_future()
+    def pronto():
+        if not futuro.done():
+            futuro.set_result(None)
+    for lettore in lettori_coda:
+        ciclo.add_reader(lettore,pronto)
+    try:
+        await asyncio.wait_for(futuro,timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        for lettore in lettori_coda:
+            ciclo.remove_reader(lettore)
+
+class oggetto_asincrono(oggetto):
+    """
+    Oggetto Asincrono
+
+    Classe base per le operazioni basate su asyncio. Mantiene la macchina a
+    stati di oggetto (idle, avvia, ferma, ...), ma gli stati sono coroutine
+    eseguite da un ciclo di eventi: un'operazione può quindi servire molte
+    attività di I/O concorrenti (file, socket) nello stesso processo. I
+    segnali si leggono e si scrivono con leggi_segnale_asincrono() e
+    scrivi_segnale_asincrono(), che attendono senza bloccare il ciclo; le code
+    e il Gestore Segnali sono quelli di oggetto, quindi l'operazione parla con
+    il resto della pipeline con lo stesso protocollo.
+
+    Uno stato può essere anche un metodo sincrono, che però blocca il ciclo
+    finché non termina. Più operazioni asincrone possono condividere un
+    unico processo e ciclo di eventi (vedi ciclo_condiviso).
+
+    Asynchronous Object
+
+    Base class for asyncio based operations. It keeps the state machine of
+    oggetto (idle, avvia, ferma, ...), but the states are coroutines run by an
+    event loop: an operation can then serve many concurrent I/O activities
+    (files, sockets) in the same process. Signals are read and written with
+    leggi_segnale_asincrono() and scrivi_segnale_asincrono(), which wait
+    without blocking the loop; the queues and the Signal Manager are the ones
+    of oggetto, so the operation talks to the rest of the pipeline with the
+    same protocol.
+
+    A state can also be a synchronous method, which however blocks the loop
+    until it ends. Many asynchronous operations can share a single process
+    and event loop (see ciclo_condiviso).
+    """
+    def run(self):
+        """
+        Punto d'entrata del processo: esegue l'oggetto in un proprio ciclo di
+        eventi
+        Entry point of the process: runs the object in its own event loop
+        """
+        self.registro.info(f"{type(self).__name__} creato")
+        return asyncio.run(self.esegui())
+
+    async def esegui(self):
+        """
+        Esegui
+
+        Coroutine principale dell'oggetto: avvia il Gestore Segnali se serve,
+        segnala di essere pronto ed entra negli stati richiesti.
+
+        Run
+
+        Main coroutine of the object: starts the Signal Manager if needed,
+        reports it is ready and enters the required states.
+        """
+        if self.modalita_gestore_segnali == MODALITA_THREAD:
+            self.avvia_gestore_segnali()
+        # Un solo task alla volta può attendere sulla Coda Segnali Entrata
+        # Only one task at a time can wait on the Incoming Signals Queue
+        self.lock_lettura = asyncio.Lock()
+        self.segnala_pronto()
+
+        # Entra nello stato richiesto
+        # Enter the required state
+        while True:
+            self.registro.info(f"{type(self).__name__} entrando in {self.stato}")
+            s = getattr(self,self.stato)()
+            if asyncio.iscoroutine(s):
+                s = await s
+            if isinstance(s,int):
+                if s != 0:
+                    break
+        return int(s)
+
+    async def idle(self):
+        """Stato Idle - Idle Status"""
+        self.registro.info(f"{type(self).__name__} idle")
+        try:
+            await self.scrivi_segnale_asincrono("idle", "")
+        except Exception as e:
+            self.registro.error(f"{type(self).__name__} {e}")
+            return -1
+        return await self.attendi_stato()
+
+    async def avvia(self):
+        """Stato Avviato - Status Started"""
+        return await self.attendi_stato()
+
+    async def ferma(self):
+        """Stato Fermato - Status Stopped"""
+        return await self.attendi_stato()
+
+    async def attendi_stato(self):
+        """
+        Attendi Stato
+
+        Attende il segnale che porta l'oggetto in un altro stato. Restituisce
+        -1 sul segnale di stop, 0 quando lo stato è cambiato.
+
+        Wait State
+
+        Waits for the signal that moves the object to another state. Returns
+        -1 on the stop signal, 0 when the state has changed.
+        """
+        while True:
+            try:
+                segnale = (await self.leggi_segnale_asincrono())[0]
+            except Exception as e:
+                self.registro.error(f"{type(self).__name__} {e}")
+                return -1
+
+            # leggi_segnale() ha già inoltrato lo stop al Gestore Segnali
+            # leggi_segnale() has already forwarded the stop to the Signal
+            # Manager
+            if segnale == "stop":
+                return -1
+
+            if hasattr(self, segnale):
+                self.stato = segnale
+                return 0
+
+            try:
+                await self.scrivi_segnale_asincrono("segnale non valido", "")
+            except Exception as e:
+                self.registro.error(f"{type(self).__name__} {e}")
+                return -1
+
+    async def leggi_segnale_asincrono(self, timeout=None):
+        """
+        Lettura asincrona del primo segnale in entrata - Asynchronous reading of the first incoming signal
+
+        Come leggi_segnale(), ma attende il segnale senza bloccare il ciclo di
+        eventi. Con timeout None attende per sempre.
+
+        Like leggi_segnale(), but waits for the signal without blocking the
+        event loop. With timeout None it waits forever.
+        """
+        scadenza = None if timeout is None else monotonic() + timeout
+        async with self.lock_lettura:
+            while True:
+                try:
+                    return self.leggi_segnale(0)
+                except Empty:
+                    pass
+                rimanente = None
+                if scadenza is not None:
+                    rimanente = scadenza - monotonic()
+                    if rimanente <= 0:
+                        raise Empty
+                await attendi_lettori(lettori(self.coda_segnali_entrata),
+                                      rimanente)
+
+    async def richiedi_asincrono(self, segnale, destinatario, estensioni=None,
+                                 timeout=ATTESA_RISPOSTA):
+        """
+        Richiesta asincrona con attesa della risposta - Asynchronous request waiting for the response
+
+        Come chiama(), ma attende la risposta senza bloccare il ciclo di
+        eventi; più task possono avere richieste in corso insieme.
+
+        Like chiama(), but waits for the response without blocking the event
+        loop; many tasks can have requests in flight at once.
+        """
+        return await self.attendi_risposta_asincrona(
+                    self.richiedi(segnale, destinatario, estensioni, timeout))
+
+    async def attendi_risposta_asincrona(self, futuro):
+        """
+        Attesa asincrona della risposta a una richiesta - Asynchronous wait for the response to a request
+
+        Come attendi_risposta(), ma senza bloccare il ciclo di eventi. Se un
+        altro task sta già leggendo i segnali, le risposte le consegna lui:
+        qui si attende il futuro, o che la lettura si liberi, fino alla
+        scadenza della prossima richiesta.
+
+        Like attendi_risposta(), but without blocking the event loop. If
+        another task is already reading the signals, it delivers the
+        responses: here the future, or the reading becoming free, is awaited
+        until the deadline of the next request.
+        """
+        attesa = asyncio.wrap_future(futuro)
+        while not futuro.done():
+            if futuro not in self.richieste.futuri.values():
+                raise ValueError("Futuro non associato a una richiesta in corso") # Future not tied to a request in flight
+            acquisizione = asyncio.ensure_future(self.lock_lettura.acquire())
+            await asyncio.wait((attesa,acquisizione),
+                               timeout=self.richieste.attesa(),
+                               return_when=asyncio.FIRST_COMPLETED)
+            if not acquisizione.done():
+                acquisizione.cancel()
+                try:
+                    await acquisizione
+                except asyncio.CancelledError:
+                    pass
+            if acquisizione.done() and not acquisizione.cancelled():
+                try:
+                    self.raccogli_risposte_asincrono(futuro)
+                    if not futuro.done():
+                        # Con dei segnali in attesa si lascia presto la
+                        # lettura a chi li aspetta
+                        # With signals waiting the reading is soon left to
+                        # whoever waits for them
+                        await attendi_lettori(lettori(self.coda_segnali_entrata),
+                                              ATTESA_SEGNALI_SOSPESI \
+                                              if self.segnali_sospesi \
+                                              else self.richieste.attesa())
+                        self.raccogli_risposte_asincrono(futuro)
+                finally:
+                    self.lock_lettura.release()
+            self.richieste.scadi()
+        return await attesa
+
+    def raccogli_risposte_asincrono(self, futuro):
+        """
+        Consegna le risposte già arrivate, senza attendere, finché il futuro
+        non viene risolto; va chiamata con lock_lettura acquisito
+
+        Delivers the responses already arrived, without waiting, until the
+        future is resolved; it must be called with lock_lettura acquired
+        """
+        self.segnali_sospesi = deque(self.estrai_risposte(self.segnali_sospesi))
+        while not futuro.done() and self.raccogli_risposte(0):
+            pass
+
+    async def rispondi_asincrono(self, valore=None, errore=None, richiesta=None):
+        """
+        Risposta asincrona a una richiesta - Asynchronous response to a request
+
+        Come rispondi(), con scrivi_segnale_asincrono(). I task che
+        rispondono dopo aver atteso altro devono conservare
+        self.richiesta_segnale e passarla come richiesta.
+
+        Like rispondi(), with scrivi_segnale_asincrono(). Tasks answering
+        after awaiting something else must keep self.richiesta_segnale and
+        pass it as richiesta.
+        """
+        destinatario,correlazione = self.richiesta_da_rispondere(richiesta)
+        return await self.scrivi_segnale_asincrono(
+                            SEGNALE_RISPOSTA, destinatario,
+                            estensioni_risposta(correlazione, valore, errore))
+
+    async def scrivi_segnale_asincrono(self, segnale, destinatario, estensioni=None):
+        """
+        Scrittura asincrona del segnale in uscita - Asynchronous writing of the outgoing signal
+
+        Come scrivi_segnale(), ma se la Coda Segnali Uscita è piena attende
+        senza bloccare il ciclo di eventi.
+
+        Like scrivi_segnale(), but if the Outgoing Signals Queue is full it
+        waits without blocking the event loop.
+        """
+        self.profilatore.controlla()
+        estensioni        = traccia_segnale(estensioni)
+        pacchetto_segnale = [segnale, destinatario]
+        if estensioni:
+            verifica_estensioni(estensioni)
+            pacchetto_segnale.append(estensioni)
+            registra_segnale(estensioni, self.nome, "scrivi")
+        coda     = self.coda_segnali_uscita
+        limitata = isinstance(coda, coda_limitata)
+        scadenza = None
+        while True:
+            try:
+                coda.put_nowait(pacchetto_segnale)
+                return 0
+            except Full:
+                pass
+            if scadenza is None:
+                scadenza = monotonic() + ATTESA_MASSIMA_INSERIMENTO
+                if limitata:
+                    incrementa(coda.pieno)
+            elif monotonic() >= scadenza:
+                if limitata:
+                    incrementa(coda.scartati)
+                raise Exception("Coda Segnali Uscita piena")
+            await asyncio.sleep(ATTESA_CODA_PIENA)
+
+class ciclo_condiviso(Process):
+    """
+    Ciclo Condiviso
+
+    Processo che esegue più operazioni asincrone in un unico ciclo di eventi.
+    Le operazioni vanno aggiunte prima di avviarlo e non vanno avviate a loro
+    volta: ognuna conserva le proprie code e il proprio Gestore Segnali.
+
+    Shared Loop
+
+    Process running many asynchronous operations in a single event loop. The
+    operations must be added before starting it and must not be started
+    themselves: each one keeps its own queues and Signal Manager.
+    """
+    def __init__(self,nome):
+        super().__init__(name=nome)
+        self.nome       = nome
+        self.operazioni = []
+        # Logger del componente (vedi registro)
+        # Logger of the component (see registro)
+        self.registro   = logging.getLogger(nome)
+    def aggiungi(self,operazione):
+        """Aggiunge un'operazione al ciclo - Adds an operation to the loop"""
+        if not isinstance(operazione,oggetto_asincrono):
+            raise TypeError(operazione.nome + " non è un oggetto asincrono") # is not an asynchronous object
+        self.operazioni.append(operazione)
+    def run(self):
+        self.registro.info(type(self).__name__ + " " + self.nome + " creato") # created
+        asyncio.run(self.esegui())
+    async def esegui(self):
+        esiti = await asyncio.gather(*(operazione.esegui() \
+                                       for operazione in self.operazioni),
+                                     return_exceptions=True)
+        for operazione,esito in zip(self.operazioni,esiti):
+            if isinstance(esito,BaseException):
+                self.registro.error(type(self).__name__ + " " + self.nome + \
+                                    " " + operazione.nome + ": " + repr(esito))
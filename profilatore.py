@@ -0,0 +1,205 @@
+"""
+Autore: Francesco Antonetti Lamorgese Passeri
+
+This work is licensed under the Creative Commons Attribution 4.0 International
+License. To view a copy of this license, visit
+http://creativecommons.org/licenses/by/4.0/ or send a letter to Creative
+Commons, PO Box 1866, Mountain View, CA 94042, USA.
+
+Profilatore
+
+Profilazione su richiesta di un processo del framework in esecuzione. Il
+segnale "profila" avvia un profilatore nel thread che lo riceve, per la durata
+indicata nelle sue estensioni:
+
+    modalita    "deterministico" (cProfile, file .pstats) o "campionamento"
+                (stack campionati da un thread, file .collapsed nel formato
+                dei flame graph)
+    durata      secondi di profilazione
+    cartella    cartella dei file, chiamati <nome>-<pid>.<estensione>
+    intervallo  intervallo di campionamento in secondi
+
+Il profilatore deterministico va fermato dal thread che lo ha avviato: chi lo
+usa chiama controlla() nel proprio ciclo, e la profilazione termina alla prima
+chiamata dopo la scadenza.
+
+Profiler
+
+On demand profiling of a running framework process. The "profila" signal
+starts a profiler in the thread receiving it, for the duration given in its
+extensions (see above): "deterministico" (cProfile, .pstats file) or
+"campionamento" (stacks sampled by a thread, .collapsed file in the flame
+graph format), duration, directory of the files, named <nome>-<pid>.<ext>, and
+sampling interval.
+
+The deterministic profiler must be stopped by the thread that started it:
+its user calls controlla() in its own loop, and profiling ends on the first
+call after the deadline.
+"""
+
+import cProfile
+import logging
+import os
+import re
+import sys
+import threading
+
+from collections import Counter
+from time        import monotonic,sleep
+
+# Segnale di profilazione e modalità del profilatore
+# Profiling signal and profiler modes
+SEGNALE_PROFILA           = "profila"
+MODALITA_DETERMINISTICA   = "deterministico"
+MODALITA_CAMPIONAMENTO    = "campionamento"
+# Valori predefiniti delle estensioni del segnale
+# Default values of the signal extensions
+DURATA                    = 10.0
+CARTELLA                  = "."
+INTERVALLO_CAMPIONAMENTO  = 0.005
+
+def file_profilo(cartella,nome,estensione):
+    """
+    Nome del file di un profilo: nome del processo e pid
+    Name of a profile file: process name and pid
+    """
+    nome = re.sub(r"[^\w.-]+","_",nome)
+    return os.path.join(cartella,nome + "-" + str(os.getpid()) + "." + \
+                                 estensione)
+
+class profilatore:
+    """
+    Profilatore
+
+    Profilatore di un componente, avviato dal segnale "profila". Una sola
+    profilazione alla volta.
+
+    Profiler
+
+    Profiler of a component, started by the "profila" signal. One profiling
+    at a time.
+    """
+    def __init__(self,nome):
+        self.nome         = nome
+        self.profilo      = None
+        self.campionatore = None
+        self.scadenza     = 0
+        self.file         = None
+    def attivo(self):
+        """Vero durante una profilazione - True while profiling"""
+        return self.profilo is not None or \
+               (self.campionatore is not None and self.campionatore.is_alive())
+    def avvia(self,estensioni=None):
+        """
+        Avvia
+
+        Avvia la profilazione descritta dalle estensioni del segnale
+        "profila". Restituisce False se una profilazione è già in corso o
+        se la modalità non è valida.
+
+        Start
+
+        Starts the profiling described by the extensions of the "profila"
+        signal. Returns False if a profiling is already in progress or if
+        the mode is not valid.
+        """
+        if self.attivo():
+            return False
+        estensioni = estensioni or {}
+        modalita   = estensioni.get("modalita",MODALITA_DETERMINISTICA)
+        durata     = float(estensioni.get("durata",DURATA))
+        cartella   = estensioni.get("cartella",CARTELLA)
+        if modalita == MODALITA_CAMPIONAMENTO:
+            self.file         = file_profilo(cartella,self.nome,"collapsed")
+            self.campionatore = threading.Thread(
+                         target=campiona,
+                         args=(threading.get_ident(),durata,
+                               float(estensioni.get("intervallo",
+                                                    INTERVALLO_CAMPIONAMENTO)),
+                               self.file),
+                         name="profilatore " + self.nome,
+                         daemon=True)
+            self.campionatore.start()
+        elif modalita == MODALITA_DETERMINISTICA:
+            self.file     = file_profilo(cartella,self.nome,"pstats")
+            self.scadenza = monotonic() + durata
+            self.profilo  = cProfile.Profile()
+            self.profilo.enable()
+        else:
+            logging.getLogger(__name__).warning(
+                                 "%s modalità profilatore non valida: %s", # invalid profiler mode
+                                 self.nome,modalita)
+            return False
+        logging.getLogger(__name__).info("%s profilazione %s per %s s in %s", # profiling for s in
+                                         self.nome,modalita,durata,self.file)
+        return True
+    def controlla(self):
+        """
+        Controlla
+
+        Ferma la profilazione deterministica se è scaduta. Va chiamata dal
+        thread che l'ha avviata.
+
+        Check
+
+        Stops the deterministic profiling if it has expired. It must be called
+        by the thread that started it.
+        """
+        if self.profilo is not None and monotonic() >= self.scadenza:
+            self.ferma()
+    def ferma(self):
+        """
+        Ferma
+
+        Ferma la profilazione deterministica e ne scrive il file pstats.
+
+        Stop
+
+        Stops the deterministic profiling and writes its pstats file.
+        """
+        profilo,self.profilo = self.profilo,None
+        if profilo is None:
+            return
+        profilo.disable()
+        try:
+            profilo.dump_stats(self.file)
+        except OSError as e:
+            logging.getLogger(__name__).warning("%s: %s",self.file,e)
+
+def campiona(identificativo,durata,intervallo,file_campioni):
+    """
+    Campiona
+
+    Campiona per la durata indicata lo stack del thread indicato e scrive i
+    conteggi degli stack nel formato "collapsed" (funzioni separate da ";"
+    dalla più esterna, seguite dal numero di campioni), leggibile da
+    flamegraph.pl, speedscope e simili.
+
+    Sample
+
+    Samples for the given duration the stack of the given thread and writes
+    the stack counts in the "collapsed" format (functions separated by ";"
+    from the outermost, followed by the number of samples), readable by
+    flamegraph.pl, speedscope and the like.
+    """
+    campioni  = Counter()
+    scadenza  = monotonic() + durata
+    while monotonic() < scadenza:
+        quadro = sys._current_frames().get(identificativo)
+        if quadro is None:
+            break
+        funzioni = []
+        while quadro is not None:
+            codice = quadro.f_code
+            funzioni.append(codice.co_name + " (" + \
+                            os.path.basename(codice.co_filename) + ":" + \
+                            str(codice.co_firstlineno) + ")")
+            quadro = quadro.f_back
+        campioni[";".join(reversed(funzioni))] += 1
+        sleep(intervallo)
+    try:
+        with open(file_campioni,"w") as f:
+            for stack,numero in campioni.most_common():
+                f.write(stack + " " + str(numero) + "\n")
+    except OSError as e:
+        logging.getLogger(__name__).warning("%s: %s",file_campioni,e)
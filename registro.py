@@ -0,0 +1,335 @@
+"""
+Autore: Francesco Antonetti Lamorgese Passeri
+
+This work is licensed under the Creative Commons Attribution 4.0 International
+License. To view a copy of this license, visit
+http://creativecommons.org/licenses/by/4.0/ or send a letter to Creative
+Commons, PO Box 1866, Mountain View, CA 94042, USA.
+
+Registro
+
+Registro del framework. I record di tutti i processi vengono messi, senza
+attendere, in una coda verso un processo dedicato che è l'unico a formattarli
+e a scriverli sul file: nessun processo contende più il file e la
+formattazione dei messaggi si paga solo per i record davvero scritti. Ogni
+componente ha un proprio logger (il nome della classe dell'operazione,
+"gestore_pipeline", "gestore_segnali.<padre>"), così che il livello si possa
+impostare per componente; i record per singolo segnale vanno nel logger figlio
+"<componente>.segnali", a livello DEBUG e campionati.
+
+Log
+
+Log of the framework. The records of every process are put, without waiting,
+in a queue towards a dedicated process which is the only one formatting them
+and writing them to the file: no process contends the file anymore and
+message formatting is paid only for the records actually written. Every
+component has its own logger (the class name of the operation,
+"gestore_pipeline", "gestore_segnali.<padre>"), so that the level can be set
+per component; the per signal records go to the child logger
+"<componente>.segnali", at DEBUG level and sampled.
+"""
+
+import atexit
+import logging
+
+from multiprocessing import Process,Queue
+from queue           import Full
+
+# Formato predefinito dei record e capacità della coda verso il processo di
+# registro (oltre la quale i record vengono persi, non attesi)
+# Default record format and capacity of the queue towards the log process
+# (beyond which records are lost, not waited for)
+FORMATO                   = "%(asctime)s %(levelname)s %(processName)s " + \
+                            "%(name)s: %(message)s"
+CAPACITA_CODA_REGISTRO    = 10000
+# Suffisso dei logger dei record per singolo segnale
+# Suffix of the loggers of the per signal records
+SUFFISSO_SEGNALI          = ".segnali"
+
+# Argomenti che possono viaggiare nella coda senza essere formattati
+# Arguments that can travel in the queue without being formatted
+TIPI_SEMPLICI             = (str,bytes,int,float,bool,type(None),
+                             list,tuple,dict)
+
+# Coda e processo di registro attivi, e filtro di campionamento condiviso da
+# tutti i logger dei segnali
+# Active log queue and process, and sampling filter shared by every signal
+# logger
+coda_registro             = None
+processo                  = None
+# Livelli impostati per componente e componenti con il registro dei segnali,
+# da ripristinare nei processi avviati senza fork (vedi avvio)
+# Levels set per component and components with the signals log, to restore
+# in the processes started without fork (see avvio)
+livelli                   = {}
+componenti_segnali        = set()
+
+class filtro_campionamento(logging.Filter):
+    """
+    Filtro Campionamento
+
+    Lascia passare un record ogni "periodo" (tutti con periodo 1). Il
+    conteggio è per processo.
+
+    Sampling Filter
+
+    Lets through one record every "periodo" (all of them with period 1). The
+    count is per process.
+    """
+    def __init__(self,periodo=1):
+        super().__init__()
+        self.periodo   = periodo
+        self.contatore = 0
+    def filter(self,record):
+        self.contatore += 1
+        if self.contatore >= self.periodo:
+            self.contatore = 0
+            return True
+        return False
+
+campionamento             = filtro_campionamento()
+
+class gestore_coda_registro(logging.Handler):
+    """
+    Gestore Coda Registro
+
+    Handler che mette i record nella coda del processo di registro senza
+    formattarli e senza attendere: se la coda è piena il record viene perso e
+    contato, e al primo record successivo che entra in coda ne viene segnalato
+    il numero.
+
+    Log Queue Handler
+
+    Handler putting records in the queue of the log process without
+    formatting them and without waiting: if the queue is full the record is
+    lost and counted, and its number is reported with the first following
+    record that fits in the queue.
+    """
+    def __init__(self,coda):
+        super().__init__()
+        self.coda  = coda
+        self.persi = 0
+    def prepara(self,record):
+        """
+        Prepara
+
+        Rende il record serializzabile: gli argomenti semplici viaggiano così
+        come sono (copiando le liste e i dizionari, che il chiamante potrebbe
+        modificare prima che il record lasci il processo), gli altri vengono
+        formattati qui. Le eccezioni vengono formattate qui.
+
+        Prepare
+
+        Makes the record serializable: simple arguments travel as they are
+        (copying lists and dictionaries, which the caller could change before
+        the record leaves the process), the other ones are formatted here.
+        Exceptions are formatted here.
+        """
+        argomenti = record.args
+        if isinstance(argomenti,dict):
+            argomenti = (argomenti,)
+        if not isinstance(record.msg,str) or \
+           (argomenti and not all(isinstance(a,TIPI_SEMPLICI) \
+                                  for a in argomenti)):
+            record.msg  = record.getMessage()
+            record.args = None
+        elif argomenti:
+            record.args = tuple(a.copy() if isinstance(a,(list,dict)) else a \
+                                for a in argomenti)
+            if isinstance(record.args[0],dict) and len(record.args) == 1:
+                record.args = record.args[0]
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                                                              record.exc_info)
+            record.exc_info = None
+        return record
+    def emit(self,record):
+        try:
+            self.coda.put_nowait(self.prepara(record))
+        except Full:
+            self.persi += 1
+            return
+        except Exception:
+            self.handleError(record)
+            return
+        if self.persi:
+            persi,self.persi = self.persi,0
+            logging.getLogger(__name__).warning("%d record persi", persi) # records lost
+
+class processo_registro(Process):
+    """
+    Processo Registro
+
+    Processo che preleva i record dalla coda e li formatta e scrive con il
+    proprio handler (su file o, senza file, su stderr). Termina ricevendo
+    None.
+
+    Log Process
+
+    Process taking the records from the queue, formatting and writing them
+    with its own handler (to file or, with no file, to stderr). It ends on
+    receiving None.
+    """
+    def __init__(self,coda,file_log=None,formato=FORMATO):
+        super().__init__(name="registro",daemon=True)
+        self.coda     = coda
+        self.file_log = file_log
+        self.formato  = formato
+    def run(self):
+        handler = logging.FileHandler(self.file_log) if self.file_log \
+                  else logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(self.formato))
+        while True:
+            try:
+                record = self.coda.get()
+            except (EOFError,OSError,KeyboardInterrupt):
+                break
+            if record is None:
+                break
+            handler.handle(record)
+        handler.close()
+
+def avvia_registro(file_log=None,livello=logging.INFO,formato=FORMATO,
+                   capacita=CAPACITA_CODA_REGISTRO):
+    """
+    Avvia Registro
+
+    Avvia il processo di registro e sostituisce gli handler del logger radice
+    con quello verso la sua coda. Va chiamata nel processo principale prima di
+    creare il Gestore Pipeline, così che tutti i processi lo ereditino.
+    Restituisce il processo di registro.
+
+    Start Log
+
+    Starts the log process and replaces the handlers of the root logger with
+    the one towards its queue. It must be called in the main process before
+    creating the Pipeline Manager, so that every process inherits it. Returns
+    the log process.
+    """
+    global coda_registro,processo
+    coda_registro = Queue(capacita)
+    processo      = processo_registro(coda_registro,file_log,formato)
+    processo.start()
+    radice = logging.getLogger()
+    for handler in radice.handlers[:]:
+        radice.removeHandler(handler)
+    radice.addHandler(gestore_coda_registro(coda_registro))
+    radice.setLevel(livello)
+    atexit.register(ferma_registro)
+    return processo
+
+def ferma_registro():
+    """
+    Ferma Registro
+
+    Scrive i record ancora in coda e ferma il processo di registro.
+
+    Stop Log
+
+    Writes the records still in the queue and stops the log process.
+    """
+    global processo
+    if processo is None:
+        return
+    try:
+        coda_registro.put(None)
+        processo.join()
+    except (OSError,ValueError,AssertionError):
+        pass
+    processo = None
+
+def registro_segnali(componente):
+    """
+    Registro Segnali
+
+    Restituisce il logger dei record per singolo segnale del componente, con
+    il filtro di campionamento.
+
+    Signals Log
+
+    Returns the logger of the per signal records of the component, with the
+    sampling filter.
+    """
+    componenti_segnali.add(componente)
+    registro = logging.getLogger(componente + SUFFISSO_SEGNALI)
+    if campionamento not in registro.filters:
+        registro.addFilter(campionamento)
+    return registro
+
+def imposta_livello(componente,livello):
+    """
+    Imposta Livello
+
+    Imposta il livello del logger di un componente (e dei suoi figli che non
+    hanno un livello proprio). Il livello è un nome (DEBUG, INFO, ...) o un
+    numero.
+
+    Set Level
+
+    Sets the level of a component's logger (and of its children without a
+    level of their own). The level is a name (DEBUG, INFO, ...) or a number.
+    """
+    if isinstance(livello,str) and livello.isdigit():
+        livello = int(livello)
+    elif isinstance(livello,str):
+        livello = livello.upper()
+    livelli[componente] = livello
+    logging.getLogger(componente).setLevel(livello)
+
+def imposta_campionamento(periodo):
+    """
+    Imposta Campionamento
+
+    Registra un record per singolo segnale ogni "periodo".
+
+    Set Sampling
+
+    Logs one per signal record every "periodo".
+    """
+    campionamento.periodo = max(1,int(periodo))
+
+def stato_registro():
+    """
+    Stato Registro
+
+    Restituisce la coda di registro e le impostazioni del registro di questo
+    processo, da ripristinare con ripristina_registro nei processi avviati
+    senza fork, che non le ereditano.
+
+    Log State
+
+    Returns the log queue and the log settings of this process, to restore
+    with ripristina_registro in the processes started without fork, which do
+    not inherit them.
+    """
+    return {"coda":          coda_registro,
+            "livello":       logging.getLogger().level,
+            "livelli":       dict(livelli),
+            "componenti":    sorted(componenti_segnali),
+            "campionamento": campionamento.periodo}
+
+def ripristina_registro(stato):
+    """
+    Ripristina Registro
+
+    Collega il logger radice alla coda del processo di registro e applica le
+    impostazioni restituite da stato_registro.
+
+    Restore Log
+
+    Connects the root logger to the queue of the log process and applies the
+    settings returned by stato_registro.
+    """
+    global coda_registro
+    radice = logging.getLogger()
+    if stato["coda"] is not None:
+        coda_registro = stato["coda"]
+        for handler in radice.handlers[:]:
+            radice.removeHandler(handler)
+        radice.addHandler(gestore_coda_registro(coda_registro))
+    radice.setLevel(stato["livello"])
+    for componente,livello in stato["livelli"].items():
+        imposta_livello(componente,livello)
+    for componente in stato["componenti"]:
+        registro_segnali(componente)
+    imposta_campionamento(stato["campionamento"])
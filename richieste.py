@@ -0,0 +1,211 @@
+"""
+Autore: Francesco Antonetti Lamorgese Passeri
+
+This work is licensed under the Creative Commons Attribution 4.0 International
+License. To view a copy of this license, visit
+http://creativecommons.org/licenses/by/4.0/ or send a letter to Creative
+Commons, PO Box 1866, Mountain View, CA 94042, USA.
+
+Richieste
+
+Richieste e risposte sui segnali. Una richiesta è un segnale qualsiasi con
+le estensioni "correlazione" (un numero diverso per ogni richiesta in corso
+di chi la invia) e "rispondi_a" (il nome della replica che la invia). La
+risposta è il segnale "risposta", indirizzato direttamente a quella replica,
+con la stessa correlazione e il valore (codificato in JSON nell'estensione
+"valore") o il messaggio d'errore (estensione "errore").
+
+Chi invia una richiesta ottiene un futuro (concurrent.futures.Future), che
+riceve il valore, l'eccezione errore_remoto o TimeoutError allo scadere del
+tempo della richiesta. Le risposte vengono consegnate ai futuri mentre
+l'oggetto legge i segnali (vedi oggetto.richiedi), quindi da una stessa
+operazione possono essere in corso molte richieste insieme. Una risposta
+la cui richiesta è scaduta viene scartata.
+
+Requests
+
+Requests and responses over signals. A request is any signal with the
+"correlazione" extension (a number that differs for every request in flight
+of its sender) and the "rispondi_a" one (the name of the sending replica).
+The response is the "risposta" signal, addressed straight to that replica,
+with the same correlation and the value (encoded as JSON in the "valore"
+extension) or the error message ("errore" extension).
+
+Whoever sends a request gets a future (concurrent.futures.Future), which
+receives the value, the errore_remoto exception or TimeoutError when the
+request time expires. Responses are delivered to the futures while the
+object reads signals (see oggetto.richiedi), so many requests can be in
+flight at once from the same operation. A response whose request has
+expired is dropped.
+"""
+
+import heapq
+import json
+
+from concurrent.futures import Future
+from time               import monotonic
+
+# Segnale di risposta ed estensioni di richieste e risposte
+# Response signal and extensions of requests and responses
+SEGNALE_RISPOSTA    = "risposta"
+CHIAVE_CORRELAZIONE = "correlazione"
+CHIAVE_RISPONDI_A   = "rispondi_a"
+CHIAVE_VALORE       = "valore"
+CHIAVE_ERRORE       = "errore"
+# Tempo massimo predefinito di attesa di una risposta
+# Default maximum wait time for a response
+ATTESA_RISPOSTA     = 10.0
+
+class errore_remoto(Exception):
+    """
+    Errore restituito da chi ha ricevuto la richiesta
+    Error returned by the receiver of the request
+    """
+
+def richiesta(mittente,estensioni):
+    """
+    Richiesta
+
+    Restituisce (destinatario della risposta, correlazione) se il segnale
+    con il mittente e le estensioni indicate è una richiesta, altrimenti
+    None.
+
+    Request
+
+    Returns (recipient of the response, correlation) if the signal with the
+    given sender and extensions is a request, None otherwise.
+    """
+    if not estensioni or CHIAVE_CORRELAZIONE not in estensioni:
+        return None
+    return (estensioni.get(CHIAVE_RISPONDI_A) or mittente,
+            estensioni[CHIAVE_CORRELAZIONE])
+
+def estensioni_richiesta(estensioni,correlazione,rispondi_a):
+    """
+    Estensioni di una richiesta - Extensions of a request
+    """
+    estensioni = dict(estensioni or {})
+    estensioni[CHIAVE_CORRELAZIONE] = correlazione
+    estensioni[CHIAVE_RISPONDI_A]   = rispondi_a
+    return estensioni
+
+def estensioni_risposta(correlazione,valore=None,errore=None):
+    """
+    Estensioni Risposta
+
+    Estensioni della risposta a una richiesta: il valore, che deve poter
+    essere codificato in JSON, o il messaggio d'errore. Senza correlazione
+    la risposta non corrisponde a nessuna richiesta in corso.
+
+    Response Extensions
+
+    Extensions of the response to a request: the value, which must be
+    encodable as JSON, or the error message. Without correlation the
+    response does not match any request in flight.
+    """
+    estensioni = {}
+    if correlazione is not None:
+        estensioni[CHIAVE_CORRELAZIONE] = correlazione
+    if errore is not None:
+        estensioni[CHIAVE_ERRORE] = str(errore)
+    else:
+        estensioni[CHIAVE_VALORE] = json.dumps(valore)
+    return estensioni
+
+def valore_risposta(estensioni):
+    """
+    Valore di una risposta; solleva errore_remoto se è un errore
+    Value of a response; raises errore_remoto if it is an error
+    """
+    if CHIAVE_ERRORE in estensioni:
+        raise errore_remoto(estensioni[CHIAVE_ERRORE])
+    return json.loads(estensioni.get(CHIAVE_VALORE,"null"))
+
+class richieste_in_corso:
+    """
+    Richieste In Corso
+
+    Futuri delle richieste inviate da un oggetto e non ancora risolte, con
+    le loro scadenze.
+
+    Requests In Flight
+
+    Futures of the requests sent by an object and not resolved yet, with
+    their deadlines.
+    """
+    def __init__(self):
+        self.futuri       = {} # correlazione: futuro - # correlation: future
+        self.scadenze     = [] # heap di (scadenza,correlazione) - # heap of (deadline,correlation)
+        self.correlazione = 0
+    def __len__(self):
+        return len(self.futuri)
+    def __getstate__(self):
+        # I futuri restano nel processo che ha inviato le richieste
+        # Futures stay in the process that sent the requests
+        return {"futuri": {},"scadenze": [],"correlazione": self.correlazione}
+    def nuova(self,timeout=ATTESA_RISPOSTA):
+        """
+        Registra una nuova richiesta e ne restituisce correlazione e futuro;
+        con timeout None la richiesta non scade
+
+        Registers a new request and returns its correlation and future; with
+        timeout None the request does not expire
+        """
+        self.correlazione += 1
+        futuro = Future()
+        futuro.set_running_or_notify_cancel()
+        self.futuri[self.correlazione] = futuro
+        if timeout is not None:
+            heapq.heappush(self.scadenze,(monotonic() + timeout,
+                                          self.correlazione))
+        return self.correlazione,futuro
+    def risolvi(self,estensioni):
+        """
+        Risolvi
+
+        Consegna una risposta al futuro della sua richiesta. Restituisce True
+        se la risposta apparteneva a una richiesta, anche già scaduta, e
+        quindi non va consegnata all'oggetto.
+
+        Resolve
+
+        Delivers a response to the future of its request. Returns True if the
+        response belonged to a request, even an already expired one, and so
+        it must not be delivered to the object.
+        """
+        if not estensioni or CHIAVE_CORRELAZIONE not in estensioni:
+            return False
+        futuro = self.futuri.pop(estensioni[CHIAVE_CORRELAZIONE],None)
+        if futuro is None:
+            return True
+        try:
+            futuro.set_result(valore_risposta(estensioni))
+        except errore_remoto as errore:
+            futuro.set_exception(errore)
+        except ValueError as errore:
+            futuro.set_exception(errore_remoto("Risposta non valida: " + # Invalid response
+                                               str(errore)))
+        return True
+    def attesa(self):
+        """
+        Secondi fino alla prossima scadenza, None se nessuna richiesta scade
+        Seconds until the next deadline, None if no request expires
+        """
+        while self.scadenze and self.scadenze[0][1] not in self.futuri:
+            heapq.heappop(self.scadenze)
+        if not self.scadenze:
+            return None
+        return max(0,self.scadenze[0][0] - monotonic())
+    def scadi(self):
+        """
+        Fa scadere con TimeoutError le richieste oltre la loro scadenza
+        Expires with TimeoutError the requests past their deadline
+        """
+        adesso = monotonic()
+        while self.scadenze and self.scadenze[0][0] <= adesso:
+            _,correlazione = heapq.heappop(self.scadenze)
+            futuro = self.futuri.pop(correlazione,None)
+            if futuro is not None:
+                futuro.set_exception(TimeoutError("Richiesta " + # Request
+                                                  str(correlazione) + \
+                                                  " scaduta")) # expired
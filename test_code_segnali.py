@@ -0,0 +1,222 @@
+"""
+Autore: Francesco Antonetti Lamorgese Passeri
+
+This work is licensed under the Creative Commons Attribution 4.0 International
+License. To view a copy of this license, visit
+http://creativecommons.org/licenses/by/4.0/ or send a letter to Creative
+Commons, PO Box 1866, Mountain View, CA 94042, USA.
+
+Test Code Segnali
+
+Code locali, politiche delle code limitate piene con i loro contatori e
+corsie delle code a priorità (vedi code_segnali).
+
+Signal Queues Test
+
+Local queues, policies of full bounded queues with their counters and lanes
+of the priority queues (see code_segnali).
+"""
+
+import threading
+import unittest
+
+from multiprocessing.connection import wait
+from queue                      import Empty,Full
+
+#Framework
+import code_segnali
+from code_segnali import coda_locale,coda_limitata,coda_priorita,lotto,\
+                         elementi,inserisci,impacchetta_elementi,\
+                         POLITICA_BLOCCA,POLITICA_SCARTA_VECCHI,\
+                         POLITICA_SCARTA_NUOVI,POLITICA_RALLENTA
+
+# Attesa breve per la politica blocca, per non rallentare i test
+# Short wait for the blocca policy, not to slow the tests down
+ATTESA_INSERIMENTO = 0.05
+
+def svuota(coda):
+    """Elementi rimasti in una coda - Items left in a queue"""
+    rimasti = []
+    while True:
+        try:
+            rimasti.append(coda.get(True,ATTESA_INSERIMENTO))
+        except Empty:
+            return rimasti
+
+class test_coda_locale(unittest.TestCase):
+    """Coda locale - Local queue"""
+    def test_ordine(self):
+        coda = coda_locale()
+        for elemento in range(5):
+            coda.put(elemento)
+        self.assertEqual(coda.qsize(),5)
+        self.assertEqual([coda.get() for _ in range(5)],list(range(5)))
+        self.assertTrue(coda.empty())
+    def test_vuota(self):
+        coda = coda_locale()
+        with self.assertRaises(Empty):
+            coda.get_nowait()
+        with self.assertRaises(Empty):
+            coda.get(True,ATTESA_INSERIMENTO)
+    def test_piena(self):
+        coda = coda_locale(1)
+        coda.put(1)
+        self.assertTrue(coda.full())
+        with self.assertRaises(Full):
+            coda.put_nowait(2)
+        with self.assertRaises(Full):
+            coda.put(2,True,ATTESA_INSERIMENTO)
+    def test_lettori(self):
+        # Il lettore è pronto solo finché la coda non è vuota
+        # The reader is ready only while the queue is not empty
+        coda = coda_locale()
+        self.assertEqual(wait(coda.lettori(),0),[])
+        coda.put(1)
+        coda.put(2)
+        self.assertEqual(len(wait(coda.lettori(),0)),1)
+        coda.get()
+        self.assertEqual(len(wait(coda.lettori(),0)),1)
+        coda.get()
+        self.assertEqual(wait(coda.lettori(),0),[])
+    def test_attesa_di_spazio(self):
+        coda = coda_locale(1)
+        coda.put(1)
+        threading.Timer(ATTESA_INSERIMENTO,coda.get).start()
+        coda.put(2,True,10)
+        self.assertEqual(coda.get(),2)
+
+class test_coda_limitata(unittest.TestCase):
+    """
+    Politiche delle code limitate locali
+    Policies of local bounded queues
+    """
+    locale = True
+    def setUp(self):
+        self.attesa = code_segnali.ATTESA_MASSIMA_INSERIMENTO
+        code_segnali.ATTESA_MASSIMA_INSERIMENTO = ATTESA_INSERIMENTO
+    def tearDown(self):
+        code_segnali.ATTESA_MASSIMA_INSERIMENTO = self.attesa
+    def piena(self,politica):
+        coda = coda_limitata(2,politica,self.locale)
+        self.assertTrue(coda.inserisci(1))
+        self.assertTrue(coda.inserisci(2))
+        return coda
+    def contatori(self,coda):
+        return coda.pieno.value,coda.scartati.value
+    def attendi_dati(self,coda):
+        pass
+    def test_blocca(self):
+        coda = self.piena(POLITICA_BLOCCA)
+        # Scaduta l'attesa il nuovo segnale è scartato
+        # When the wait expires the new signal is dropped
+        self.assertFalse(coda.inserisci(3))
+        self.assertEqual(self.contatori(coda),(1,1))
+        self.assertEqual(svuota(coda),[1,2])
+    def test_blocca_fino_allo_spazio(self):
+        coda = self.piena(POLITICA_BLOCCA)
+        threading.Timer(ATTESA_INSERIMENTO / 5,coda.get).start()
+        self.assertTrue(coda.inserisci(3))
+        self.assertEqual(self.contatori(coda),(1,0))
+        self.assertEqual(svuota(coda),[2,3])
+    def test_scarta_nuovi(self):
+        coda = self.piena(POLITICA_SCARTA_NUOVI)
+        self.assertFalse(coda.inserisci(3))
+        self.assertEqual(self.contatori(coda),(1,1))
+        self.assertEqual(svuota(coda),[1,2])
+    def test_rallenta(self):
+        # Come scarta_nuovi: chiedere di rallentare spetta a chi inserisce
+        # Like scarta_nuovi: asking to slow down is up to the inserter
+        coda = self.piena(POLITICA_RALLENTA)
+        self.assertFalse(coda.inserisci(3))
+        self.assertEqual(self.contatori(coda),(1,1))
+        self.assertEqual(svuota(coda),[1,2])
+    def test_illimitata(self):
+        coda = coda_limitata(0,POLITICA_SCARTA_NUOVI,self.locale)
+        for elemento in range(100):
+            self.assertTrue(inserisci(coda,elemento))
+        self.assertEqual(self.contatori(coda),(0,0))
+        self.assertEqual(svuota(coda),list(range(100)))
+    def test_lotto(self):
+        # Un lotto occupa un solo posto
+        # A batch takes a single place
+        coda = coda_limitata(1,POLITICA_SCARTA_NUOVI,self.locale)
+        self.assertTrue(coda.inserisci(lotto([1,2,3])))
+        self.assertFalse(coda.inserisci(4))
+        self.assertEqual([list(elementi(elemento)) for elemento in svuota(coda)],
+                         [[1,2,3]])
+    def test_politica_non_valida(self):
+        with self.assertRaises(ValueError):
+            coda_limitata(1,"aspetta",self.locale)
+    def test_scarta_vecchi(self):
+        coda = self.piena(POLITICA_SCARTA_VECCHI)
+        for elemento in (3,4):
+            self.attendi_dati(coda)
+            self.assertTrue(coda.inserisci(elemento))
+        self.assertEqual(self.contatori(coda),(2,2))
+        self.assertEqual(svuota(coda),[3,4])
+
+class test_coda_limitata_processi(test_coda_limitata):
+    """
+    Politiche delle code limitate tra processi
+    Policies of bounded queues between processes
+    """
+    locale = False
+    def attendi_dati(self,coda):
+        # Il thread di una coda di multiprocessing scrive nella pipe in
+        # ritardo: finché non lo ha fatto non c'è un vecchio da scartare
+        # The thread of a multiprocessing queue writes to the pipe late:
+        # until it has, there is no old item to drop
+        wait(coda.lettori(),ATTESA_INSERIMENTO * 20)
+
+class test_coda_priorita(unittest.TestCase):
+    """Corsie delle code a priorità - Lanes of the priority queues"""
+    def coda(self,**parametri):
+        return coda_priorita(locale = True,**parametri)
+    def test_controllo_prima(self):
+        coda = self.coda()
+        for segnale in (["a",1],["b",2],["stop",3],["c",4]):
+            coda.inserisci(segnale)
+        self.assertEqual([coda.get_nowait()[0] for _ in range(4)],
+                         ["stop","a","b","c"])
+        with self.assertRaises(Empty):
+            coda.get_nowait()
+    def test_estensione_priorita(self):
+        coda = self.coda()
+        coda.inserisci(["a",1])
+        coda.inserisci(["b",2,{"priorita": 0}])
+        self.assertEqual(coda.get_nowait()[0],"b")
+        self.assertEqual(coda.corsia("a",{"priorita": 99}),
+                         len(coda.corsie) - 1)
+    def test_lotto_diviso(self):
+        coda = self.coda()
+        coda.inserisci(lotto([["a",1],["stop",2],["b",3]]))
+        self.assertEqual(list(elementi(coda.get_nowait())),[["stop",2]])
+        self.assertEqual(list(elementi(coda.get_nowait())),
+                         [["a",1],["b",3]])
+    def test_soglia_precedenza(self):
+        # Una corsia scavalcata per soglia elementi viene servita comunque
+        # A lane skipped for soglia items is served anyway
+        coda = self.coda(soglia = 2)
+        coda.inserisci(["a",0])
+        for numero in range(5):
+            coda.inserisci(["stop",numero])
+        self.assertEqual([coda.get_nowait()[0] for _ in range(6)],
+                         ["stop","stop","a","stop","stop","stop"])
+    def test_corsia_indicata(self):
+        coda = self.coda()
+        coda.inserisci(b"trama",1)
+        coda.inserisci(b"controllo",0)
+        self.assertEqual(coda.get(True,ATTESA_INSERIMENTO),b"controllo")
+        self.assertEqual(coda.get(True,ATTESA_INSERIMENTO),b"trama")
+    def test_contatori_comuni(self):
+        coda = self.coda(capacita = 1,politica = POLITICA_SCARTA_NUOVI)
+        for segnale in (["a",1],["a",2],["stop",1],["stop",2]):
+            coda.inserisci(segnale)
+        self.assertEqual((coda.pieno.value,coda.scartati.value),(2,2))
+        self.assertEqual(coda.qsize(),2)
+    def test_impacchetta_elementi(self):
+        self.assertEqual(impacchetta_elementi([["a",1]]),["a",1])
+        self.assertIsInstance(impacchetta_elementi([["a",1],["b",2]]),lotto)
+
+if __name__ == "__main__":
+    unittest.main()
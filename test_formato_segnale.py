@@ -0,0 +1,161 @@
+"""
+Autore: Francesco Antonetti Lamorgese Passeri
+
+This work is licensed under the Creative Commons Attribution 4.0 International
+License. To view a copy of this license, visit
+http://creativecommons.org/licenses/by/4.0/ or send a letter to Creative
+Commons, PO Box 1866, Mountain View, CA 94042, USA.
+
+Test Formato Segnale
+
+Andata e ritorno delle trame, limiti del formato e trame troncate o mal
+formate (vedi formato_segnale).
+
+Signal Format Test
+
+Round trip of the frames, format limits and truncated or badly formed frames
+(see formato_segnale).
+"""
+
+import unittest
+
+#Framework
+from formato_segnale import impacchetta,spacchetta,impacchetta_lotto,\
+                            spacchetta_messaggio,verifica_estensioni,\
+                            segnale_mal_formato,segnale_non_codificabile,\
+                            INTESTAZIONE,INTERO_MINIMO,INTERO_MASSIMO,\
+                            LUNGHEZZA_MASSIMA_CHIAVE,LUNGHEZZA_MASSIMA_NOME,\
+                            TIPO_BOOLEANO,VERSIONE
+
+ESTENSIONI = {"nullo":    None,
+              "vero":     True,
+              "falso":    False,
+              "intero":   -42,
+              "minimo":   INTERO_MINIMO,
+              "massimo":  INTERO_MASSIMO,
+              "reale":    1.5,
+              "testo":    "però ✓",
+              "vuoto":    "",
+              "byte":     b"\x00\xff",
+              "chiavè":   0}
+
+class test_andata_ritorno(unittest.TestCase):
+    """Andata e ritorno delle trame - Round trip of the frames"""
+    def test_nomi_registrati(self):
+        self.assertEqual(spacchetta(impacchetta("stop","__main__",
+                                                "gestore_pipeline",12.5)),
+                         ["stop","__main__","gestore_pipeline",12.5])
+    def test_nomi_estesi(self):
+        self.assertEqual(spacchetta(impacchetta("però","calc#1","",1.0)),
+                         ["però","calc#1","",1.0])
+    def test_estensioni(self):
+        segnale = spacchetta(impacchetta("s","m","d",2.0,ESTENSIONI))
+        self.assertEqual(segnale[:4],["s","m","d",2.0])
+        self.assertEqual(segnale[4],ESTENSIONI)
+        # I booleani restano booleani e gli interi interi
+        # Booleans stay booleans and integers integers
+        for chiave,valore in ESTENSIONI.items():
+            self.assertIs(type(segnale[4][chiave]),type(valore),chiave)
+    def test_byte(self):
+        for valore in (bytearray(b"ab"),memoryview(b"ab")):
+            self.assertEqual(spacchetta(impacchetta("s","m","d",0.0,
+                                                    {"b": valore}))[4],
+                             {"b": b"ab"})
+    def test_senza_estensioni(self):
+        self.assertEqual(len(spacchetta(impacchetta("s","m","d",0.0,{}))),4)
+    def test_lotto(self):
+        trame = [impacchetta("s" + str(i),"m","d",float(i),{"i": i}) \
+                 for i in range(3)]
+        self.assertEqual(spacchetta_messaggio(impacchetta_lotto(trame)),
+                         [["s" + str(i),"m","d",float(i),{"i": i}] \
+                          for i in range(3)])
+        self.assertIs(impacchetta_lotto(trame[:1]),trame[0])
+    def test_testo(self):
+        self.assertEqual(spacchetta("s:3.5:m:d"),["s","m","d",3.5])
+        self.assertEqual(spacchetta_messaggio("s:3.5:m"),[["s","m","",3.5]])
+
+class test_limiti(unittest.TestCase):
+    """Limiti del formato - Format limits"""
+    def impacchetta(self,estensioni):
+        return spacchetta(impacchetta("s","m","d",0.0,estensioni))[4]
+    def test_interi(self):
+        for valore in (INTERO_MINIMO,INTERO_MASSIMO):
+            self.assertEqual(self.impacchetta({"n": valore}),{"n": valore})
+        for valore in (INTERO_MINIMO - 1,INTERO_MASSIMO + 1,2 ** 70):
+            with self.assertRaises(segnale_non_codificabile):
+                impacchetta("s","m","d",0.0,{"n": valore})
+            with self.assertRaises(segnale_non_codificabile):
+                verifica_estensioni({"n": valore})
+    def test_chiavi(self):
+        chiave = "k" * LUNGHEZZA_MASSIMA_CHIAVE
+        self.assertEqual(self.impacchetta({chiave: 1}),{chiave: 1})
+        # La lunghezza si conta in byte UTF-8
+        # The length is counted in UTF-8 bytes
+        for chiave in ("k" * (LUNGHEZZA_MASSIMA_CHIAVE + 1),
+                       "è" * (LUNGHEZZA_MASSIMA_CHIAVE // 2 + 1)):
+            with self.assertRaises(segnale_non_codificabile):
+                impacchetta("s","m","d",0.0,{chiave: 1})
+            with self.assertRaises(segnale_non_codificabile):
+                verifica_estensioni({chiave: 1})
+    def test_nomi(self):
+        nome = "n" * LUNGHEZZA_MASSIMA_NOME
+        self.assertEqual(spacchetta(impacchetta(nome,"m","d",0.0))[0],nome)
+        with self.assertRaises(segnale_non_codificabile):
+            impacchetta(nome + "n","m","d",0.0)
+    def test_tipi_non_ammessi(self):
+        for valore in ([1],{"a": 1},(1,),object(),"\ud800"):
+            with self.assertRaises(segnale_non_codificabile):
+                impacchetta("s","m","d",0.0,{"v": valore})
+        for valore in ([1],{"a": 1},(1,),object()):
+            with self.assertRaises(segnale_non_codificabile):
+                verifica_estensioni({"v": valore})
+    def test_errore_di_valore(self):
+        # Chi gestiva ValueError continua a intercettarlo
+        # Whoever handled ValueError keeps catching it
+        self.assertTrue(issubclass(segnale_non_codificabile,ValueError))
+
+class test_trame_mal_formate(unittest.TestCase):
+    """Trame troncate o mal formate - Truncated or badly formed frames"""
+    def test_troncate(self):
+        trama = impacchetta("però","calc#1","x",0.0,ESTENSIONI)
+        for lunghezza in range(len(trama)):
+            with self.assertRaises(segnale_mal_formato,msg=lunghezza):
+                spacchetta(trama[:lunghezza])
+    def test_lotto_troncato(self):
+        lotto = impacchetta_lotto([impacchetta("s","m","d",0.0,{"t": "abc"}),
+                                   impacchetta("s","m","d",0.0,{"t": "def"})])
+        for lunghezza in range(2,len(lotto)):
+            with self.assertRaises(segnale_mal_formato,msg=lunghezza):
+                spacchetta_messaggio(lotto[:lunghezza])
+    def test_versione(self):
+        trama = bytearray(impacchetta("s","m","d",0.0))
+        trama[0] = VERSIONE + 1
+        with self.assertRaises(segnale_mal_formato):
+            spacchetta(bytes(trama))
+    def test_tipo_sconosciuto(self):
+        trama = bytearray(impacchetta("stop","__main__","",0.0,{"b": True}))
+        # Il tipo del valore segue l'intestazione, il numero di estensioni,
+        # la lunghezza della chiave e la chiave
+        # The value type follows the header, the number of extensions, the
+        # key length and the key
+        posizione = INTESTAZIONE.size + 2 + 1 + 1
+        self.assertEqual(trama[posizione],TIPO_BOOLEANO)
+        trama[posizione] = 99
+        with self.assertRaises(segnale_mal_formato):
+            spacchetta(bytes(trama))
+    def test_nome_sconosciuto(self):
+        trama = bytearray(impacchetta("stop","__main__","",0.0))
+        trama[2:4] = (0xFFFE).to_bytes(2,"big")
+        with self.assertRaises(segnale_mal_formato):
+            spacchetta(bytes(trama))
+    def test_utf8_non_valido(self):
+        trama = impacchetta("ab","__main__","",0.0).replace(b"ab",b"\xff\xfe")
+        with self.assertRaises(segnale_mal_formato):
+            spacchetta(trama)
+    def test_testo(self):
+        for testo in ("s","s:m","s:x:m:d"):
+            with self.assertRaises(segnale_mal_formato):
+                spacchetta(testo)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,197 @@
+"""
+Autore: Francesco Antonetti Lamorgese Passeri
+
+This work is licensed under the Creative Commons Attribution 4.0 International
+License. To view a copy of this license, visit
+http://creativecommons.org/licenses/by/4.0/ or send a letter to Creative
+Commons, PO Box 1866, Mountain View, CA 94042, USA.
+
+Test Giornale
+
+Registrazione dei segnali, conferme, punto di controllo e ripresa dei
+segnali non confermati alla riapertura (vedi giornale).
+
+Journal Test
+
+Recording of the signals, acknowledgements, checkpoint and resumption of the
+unacknowledged signals on reopening (see giornale).
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+#Framework
+from giornale     import giornale,CHIAVE_SEQUENZA,FILE_CHECKPOINT,INTESTAZIONE,\
+                         PREFISSO,SUFFISSO
+from code_segnali import CHIAVE_PRIORITA,PRIORITA_PREDEFINITA
+
+# Segmenti piccoli, per averne più d'uno con pochi segnali
+# Small segments, to have more than one with few signals
+DIMENSIONE_SEGMENTO = 256
+
+class test_giornale(unittest.TestCase):
+    """Giornale dei segnali - Signal journal"""
+    def setUp(self):
+        self.cartella = tempfile.mkdtemp()
+        self.aperti   = []
+    def tearDown(self):
+        for aperto in self.aperti:
+            aperto.chiudi()
+        shutil.rmtree(self.cartella)
+    def apri(self,dimensione_segmento=DIMENSIONE_SEGMENTO):
+        """
+        Apre il giornale e restituisce i segnali da riprendere
+        Opens the journal and returns the signals to resume
+        """
+        self.giornale = giornale(self.cartella,dimensione_segmento)
+        self.aperti.append(self.giornale)
+        return self.giornale.apri()
+    def riapri(self):
+        self.giornale.chiudi()
+        return self.apri()
+    def interrompi(self):
+        """
+        Chiude il giornale come alla morte del processo: i record restano,
+        il punto di controllo no
+
+        Closes the journal as on the death of the process: records stay, the
+        checkpoint does not
+        """
+        for aperto in self.giornale.segmenti:
+            aperto.mappa.close()
+        self.giornale.segmenti = []
+        return self.apri()
+    def registra(self,destinatario,valore):
+        return self.giornale.registra(destinatario,
+                                      ["dato",destinatario,"sorgente",
+                                       {"v": valore}])
+    def segmenti(self):
+        return sorted(nome for nome in os.listdir(self.cartella) \
+                      if nome.startswith(PREFISSO) and nome.endswith(SUFFISSO))
+    def test_registra(self):
+        self.assertEqual(self.apri(),[])
+        inoltro = self.registra("a",1)
+        self.assertEqual(inoltro[:3],["dato","a","sorgente"])
+        self.assertEqual(inoltro[3],{"v":              1,
+                                     CHIAVE_SEQUENZA:  1,
+                                     CHIAVE_PRIORITA:  PRIORITA_PREDEFINITA})
+        self.assertEqual(self.registra("b",2)[3][CHIAVE_SEQUENZA],2)
+    def test_segnali_esclusi(self):
+        self.apri()
+        inoltro = ["stop","a","__main__"]
+        self.assertIs(self.giornale.registra("a",inoltro),inoltro)
+        self.assertEqual(self.giornale.sequenza,0)
+        self.assertEqual(self.riapri(),[])
+    def test_ripresa(self):
+        self.apri()
+        for valore in range(3):
+            self.registra("a",valore)
+            self.registra("b",valore)
+        # Una conferma vale anche per le sequenze precedenti
+        # An acknowledgement holds for the previous sequences too
+        self.giornale.conferma("a",3)
+        self.giornale.conferma("a",1)
+        ripresi = self.riapri()
+        self.assertEqual([(destinatario,inoltro[3]["v"],
+                           inoltro[3][CHIAVE_SEQUENZA]) \
+                          for destinatario,inoltro in ripresi],
+                         [("b",0,2),("b",1,4),("a",2,5),("b",2,6)])
+        destinatario,inoltro = ripresi[0]
+        self.assertEqual(inoltro[:3],["dato","b","sorgente"])
+        # Le nuove sequenze proseguono quelle del giornale
+        # New sequences continue the ones of the journal
+        self.assertEqual(self.registra("a",3)[3][CHIAVE_SEQUENZA],7)
+    def test_conferme_nel_punto_di_controllo(self):
+        self.apri()
+        for valore in range(4):
+            self.registra("a",valore)
+        self.giornale.conferma("a",2)
+        self.giornale.checkpoint()
+        with open(os.path.join(self.cartella,FILE_CHECKPOINT)) as f:
+            self.assertEqual(json.load(f)["conferme"],{"a": 2})
+        # Morto il processo, si riprende dalle conferme dell'ultimo punto di
+        # controllo
+        # Once the process died, it resumes from the acknowledgements of the
+        # last checkpoint
+        self.giornale.conferma("a",4)
+        ripresi = self.interrompi()
+        self.assertEqual([inoltro[3]["v"] for _,inoltro in ripresi],[2,3])
+    def test_interruzione_senza_punto_di_controllo(self):
+        self.apri()
+        for valore in range(3):
+            self.registra("a",valore)
+        self.giornale.conferma("a",3)
+        ripresi = self.interrompi()
+        self.assertEqual([inoltro[3]["v"] for _,inoltro in ripresi],[0,1,2])
+    def test_cancellazione_segmenti(self):
+        self.apri()
+        for valore in range(20):
+            self.registra("a",valore)
+        self.assertGreater(len(self.segmenti()),2)
+        self.giornale.conferma("a",15)
+        self.giornale.checkpoint()
+        # Restano solo i segmenti con segnali non confermati
+        # Only the segments with unacknowledged signals stay
+        rimasti = self.segmenti()
+        self.assertEqual(rimasti,
+                         [os.path.basename(aperto.percorso) \
+                          for aperto in self.giornale.segmenti])
+        self.assertEqual([inoltro[3]["v"] for _,inoltro in self.riapri()],
+                         list(range(15,20)))
+        self.giornale.conferma("a",20)
+        self.giornale.checkpoint()
+        self.assertEqual(len(self.giornale.segmenti),1)
+        self.assertEqual(self.riapri(),[])
+    def test_segnale_grande(self):
+        # Un segnale più grande di un segmento ne ottiene uno apposta
+        # A signal larger than a segment gets a segment of its own
+        self.apri()
+        self.registra("a","x" * (4 * DIMENSIONE_SEGMENTO))
+        ripresi = self.riapri()
+        self.assertEqual(ripresi[0][1][3]["v"],"x" * (4 * DIMENSIONE_SEGMENTO))
+    def test_record_danneggiato(self):
+        self.apri()
+        for valore in range(3):
+            self.registra("a",valore)
+        self.giornale.chiudi()
+        # La lettura di un segmento si ferma al primo record con un crc
+        # sbagliato; i segmenti successivi vengono letti comunque
+        # Reading a segment stops at the first record with a wrong crc; the
+        # following segments are read anyway
+        percorso = os.path.join(self.cartella,self.segmenti()[0])
+        with open(percorso,"r+b") as f:
+            dati = bytearray(f.read())
+            lunghezza = int.from_bytes(dati[:4],"big")
+            posizione = 2 * (INTESTAZIONE.size + lunghezza) - 1
+            dati[posizione] ^= 0xFF
+            f.seek(0)
+            f.write(dati)
+        self.assertEqual(len(self.segmenti()),2)
+        self.assertEqual([inoltro[3]["v"] for _,inoltro in self.apri()],[0,2])
+    def test_riprendi_su_altra_replica(self):
+        self.apri()
+        self.registra("calc#0",1)
+        destinatario,inoltro = self.riapri()[0]
+        # Il segnale passa a un'altra replica: la conferma va a lei
+        # The signal moves to another replica: the acknowledgement goes to it
+        self.giornale.riprendi(destinatario,"calc#1",inoltro)
+        self.assertEqual(self.giornale.conferme["calc#0"],1)
+        self.giornale.conferma("calc#1",1)
+        self.assertEqual(self.riapri(),[])
+    def test_altra_tabella_dei_nomi(self):
+        self.apri()
+        self.giornale.chiudi()
+        percorso = os.path.join(self.cartella,FILE_CHECKPOINT)
+        with open(percorso) as f:
+            punto_controllo = json.load(f)
+        punto_controllo["nomi"] = punto_controllo["nomi"] + ["altro"]
+        with open(percorso,"w") as f:
+            json.dump(punto_controllo,f)
+        with self.assertRaises(ValueError):
+            giornale(self.cartella).apri()
+
+if __name__ == "__main__":
+    unittest.main()
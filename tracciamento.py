@@ -0,0 +1,265 @@
+"""
+Autore: Francesco Antonetti Lamorgese Passeri
+
+This work is licensed under the Creative Commons Attribution 4.0 International
+License. To view a copy of this license, visit
+http://creativecommons.org/licenses/by/4.0/ or send a letter to Creative
+Commons, PO Box 1866, Mountain View, CA 94042, USA.
+
+Tracciamento
+
+Tracciamento dei segnali lungo la pipeline. Un segnale tracciato porta
+nell'estensione "traccia" un identificativo; ogni salto che lo attraversa
+(l'operazione che lo scrive, il suo Gestore Segnali, il Gestore Segnali
+dell'operazione nel Gestore Pipeline, l'instradamento, e così via fino
+all'operazione che lo legge) registra un evento con l'istante in un buffer
+circolare in memoria condivisa, comune a tutti i processi. Il buffer si
+esporta come file di traccia di Chrome/Perfetto: una traccia per segnale, con
+un intervallo per ogni salto, e gli eventi sulle tracce dei componenti.
+
+Il buffer va creato prima di avviare i processi (vedi attiva_tracciamento);
+se non è stato creato i segnali non vengono tracciati e le funzioni di
+registrazione non fanno nulla.
+
+Tracing
+
+Tracing of the signals along the pipeline. A traced signal carries an
+identifier in the "traccia" extension; every hop it goes through (the
+operation writing it, its Signal Manager, the operation's Signal Manager in
+the Pipeline Manager, the routing, and so on up to the operation reading it)
+records an event with its instant in a ring buffer in shared memory, common to
+every process. The buffer is exported as a Chrome/Perfetto trace file: one
+track per signal, with a slice for every hop, and the events on the tracks of
+the components.
+
+The buffer must be created before starting the processes (see
+attiva_tracciamento); if it has not been created signals are not traced and
+the recording functions do nothing.
+"""
+
+import ctypes
+import json
+import os
+
+from itertools                    import count
+from multiprocessing              import Value
+from multiprocessing.sharedctypes import RawArray
+from time                         import time
+
+# Estensione che porta l'identificativo della traccia
+# Extension carrying the trace identifier
+CHIAVE_TRACCIA        = "traccia"
+# Numero predefinito di eventi nel buffer circolare e lunghezza massima del
+# nome di un componente
+# Default number of events in the ring buffer and maximum length of a
+# component name
+EVENTI                = 16384
+LUNGHEZZA_COMPONENTE  = 48
+
+class evento_traccia(ctypes.Structure):
+    """
+    Evento di una traccia nel buffer circolare
+    Trace event in the ring buffer
+    """
+    _fields_ = [("traccia",    ctypes.c_int64),
+                ("istante",    ctypes.c_double),
+                ("pid",        ctypes.c_int32),
+                ("evento",     ctypes.c_char * 16),
+                ("componente", ctypes.c_char * LUNGHEZZA_COMPONENTE)]
+
+# Buffer circolare, indice del prossimo evento (totale degli eventi
+# registrati) e periodo di campionamento dei segnali da tracciare
+# Ring buffer, index of the next event (total of the recorded events) and
+# sampling period of the signals to trace
+eventi                = None
+indice                = None
+periodo               = 0
+contatore             = count()
+
+def attiva_tracciamento(campionamento=1,numero_eventi=EVENTI):
+    """
+    Attiva Tracciamento
+
+    Crea il buffer circolare degli eventi e traccia un segnale ogni
+    "campionamento" tra quelli scritti dalle operazioni. Va chiamata prima di
+    avviare i processi, così che tutti ereditino lo stesso buffer.
+
+    Enable Tracing
+
+    Creates the ring buffer of the events and traces one signal every
+    "campionamento" among the ones written by the operations. It must be
+    called before starting the processes, so that every one inherits the
+    same buffer.
+    """
+    global eventi,indice,periodo
+    eventi  = RawArray(evento_traccia,max(1,int(numero_eventi)))
+    indice  = Value("Q",0)
+    periodo = max(1,int(campionamento))
+
+def tracciamento_attivo():
+    """Vero se il buffer degli eventi esiste - True if the events buffer exists"""
+    return eventi is not None
+
+def stato_tracciamento():
+    """
+    Buffer degli eventi e periodo di campionamento, da ripristinare nei
+    processi avviati senza fork (vedi avvio)
+
+    Events buffer and sampling period, to restore in the processes started
+    without fork (see avvio)
+    """
+    return eventi,indice,periodo
+
+def ripristina_tracciamento(stato):
+    """
+    Usa il buffer degli eventi restituito da stato_tracciamento
+    Uses the events buffer returned by stato_tracciamento
+    """
+    global eventi,indice,periodo
+    eventi,indice,periodo = stato
+
+def traccia_segnale(estensioni):
+    """
+    Traccia Segnale
+
+    Restituisce le estensioni di un nuovo segnale, con un nuovo
+    identificativo di traccia se il segnale va tracciato. Le estensioni del
+    chiamante non vengono modificate.
+
+    Trace Signal
+
+    Returns the extensions of a new signal, with a new trace identifier if
+    the signal must be traced. The caller's extensions are not changed.
+    """
+    if eventi is None or (estensioni and CHIAVE_TRACCIA in estensioni):
+        return estensioni
+    numero = next(contatore)
+    if numero % periodo:
+        return estensioni
+    estensioni = dict(estensioni) if estensioni else {}
+    estensioni[CHIAVE_TRACCIA] = (os.getpid() << 32) | (numero & 0xFFFFFFFF)
+    return estensioni
+
+def registra_evento(traccia,componente,evento,istante=None):
+    """
+    Registra Evento
+
+    Registra nel buffer circolare un evento di una traccia.
+
+    Record Event
+
+    Records a trace event in the ring buffer.
+    """
+    if eventi is None:
+        return
+    with indice.get_lock():
+        posizione    = indice.value
+        indice.value = posizione + 1
+    voce            = eventi[posizione % len(eventi)]
+    voce.traccia    = traccia
+    voce.istante    = time() if istante is None else istante
+    voce.pid        = os.getpid()
+    voce.evento     = evento.encode()[:16]
+    voce.componente = componente.encode()[:LUNGHEZZA_COMPONENTE]
+
+def registra_segnale(estensioni,componente,evento,istante=None):
+    """
+    Registra Segnale
+
+    Registra un evento se il segnale, date le sue estensioni, è tracciato.
+    Costa un controllo quando il tracciamento non è attivo.
+
+    Record Signal
+
+    Records an event if the signal, given its extensions, is traced. It
+    costs one check when tracing is not enabled.
+    """
+    if eventi is None or not estensioni:
+        return
+    traccia = estensioni.get(CHIAVE_TRACCIA)
+    if traccia is not None:
+        registra_evento(traccia,componente,evento,istante)
+
+def leggi_eventi():
+    """
+    Leggi Eventi
+
+    Restituisce gli eventi presenti nel buffer, dal più vecchio, come tuple
+    (traccia,istante,pid,evento,componente).
+
+    Read Events
+
+    Returns the events in the buffer, oldest first, as tuples
+    (traccia,istante,pid,evento,componente).
+    """
+    if eventi is None:
+        return []
+    totale    = indice.value
+    numero    = min(totale,len(eventi))
+    risultato = []
+    for posizione in range(totale - numero,totale):
+        voce = eventi[posizione % len(eventi)]
+        risultato.append((voce.traccia,voce.istante,voce.pid,
+                          voce.evento.decode(errors="replace"),
+                          voce.componente.decode(errors="replace")))
+    return risultato
+
+def esporta_chrome(file_traccia,eventi_traccia=None):
+    """
+    Esporta Chrome
+
+    Scrive gli eventi nel formato JSON delle tracce di Chrome, leggibile da
+    chrome://tracing e da Perfetto. Ogni componente è un thread del proprio
+    processo, con un evento istantaneo per ogni passaggio di un segnale; ogni
+    segnale tracciato ha una propria traccia nel processo "segnali", con un
+    intervallo per ogni salto tra due eventi consecutivi, così che si veda
+    quale salto domina la latenza. Restituisce il numero di segnali esportati.
+
+    Export Chrome
+
+    Writes the events in the JSON format of Chrome traces, readable by
+    chrome://tracing and by Perfetto. Every component is a thread of its own
+    process, with an instant event for every passage of a signal; every
+    traced signal has its own track in the "segnali" process, with a slice for
+    every hop between two consecutive events, so that it shows which hop
+    dominates latency. Returns the number of exported signals.
+    """
+    if eventi_traccia is None:
+        eventi_traccia = leggi_eventi()
+    uscita     = []
+    thread     = {}  # (pid,componente): tid
+    tracce     = {}  # traccia: [(istante,evento,componente)]
+    for traccia,istante,pid,evento,componente in eventi_traccia:
+        if (pid,componente) not in thread:
+            thread[(pid,componente)] = len(thread) + 1
+            uscita.append({"name": "thread_name", "ph": "M", "pid": pid,
+                           "tid": thread[(pid,componente)],
+                           "args": {"name": componente}})
+        uscita.append({"name": evento, "ph": "i", "s": "t",
+                       "ts": istante * 1000000, "pid": pid,
+                       "tid": thread[(pid,componente)],
+                       "args": {"traccia": traccia}})
+        tracce.setdefault(traccia,[]).append((istante,evento,componente))
+    # Le tracce dei segnali stanno in un processo fittizio con pid 0
+    # Signal tracks live in a dummy process with pid 0
+    uscita.append({"name": "process_name", "ph": "M", "pid": 0,
+                   "args": {"name": "segnali"}})
+    for numero,(traccia,passaggi) in enumerate(tracce.items(),1):
+        passaggi.sort()
+        uscita.append({"name": "thread_name", "ph": "M", "pid": 0,
+                       "tid": numero, "args": {"name": hex(traccia)}})
+        for (inizio,evento,componente),(fine,evento_successivo,
+                                        componente_successivo) in \
+            zip(passaggi,passaggi[1:]):
+            uscita.append({"name": componente + " " + evento + " -> " + \
+                                   componente_successivo + " " + \
+                                   evento_successivo,
+                           "ph": "X", "ts": inizio * 1000000,
+                           "dur": (fine - inizio) * 1000000,
+                           "pid": 0, "tid": numero,
+                           "args": {"traccia": traccia}})
+    temporaneo = file_traccia + ".tmp"
+    with open(temporaneo,"w") as f:
+        json.dump({"traceEvents": uscita, "displayTimeUnit": "ms"},f)
+    os.replace(temporaneo,file_traccia)
+    return len(tracce)
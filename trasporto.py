@@ -0,0 +1,463 @@
+"""
+Autore: Francesco Antonetti Lamorgese Passeri
+
+This work is licensed under the Creative Commons Attribution 4.0 International
+License. To view a copy of this license, visit
+http://creativecommons.org/licenses/by/4.0/ or send a letter to Creative
+Commons, PO Box 1866, Mountain View, CA 94042, USA.
+
+Trasporto
+
+Trasporto dei messaggi IPC tra Gestori Segnali su host diversi. Un canale
+remoto ha la stessa interfaccia delle code usate dai Gestori Segnali e
+sostituisce entrambe le code IPC di un'operazione: ciò che vi si inserisce
+arriva all'altro capo della connessione, ciò che arriva dall'altro capo si
+legge dal canale. I messaggi sono le trame binarie di formato_segnale, quindi
+la semantica dei segnali non cambia.
+
+La connessione è TCP, tramite multiprocessing.connection, autenticata con una
+chiave condivisa (HMAC a sfida e risposta); i due capi verificano poi di avere
+la stessa tabella dei nomi. Un thread scrive su socket tutti i messaggi in
+attesa con un'unica scrittura, un altro legge. Il capo client si riconnette
+da solo con attese crescenti, il capo server torna ad accettare connessioni:
+i messaggi inseriti mentre la connessione è assente restano in attesa, e un
+lotto la cui scrittura fallisce viene rispedito (può quindi arrivare due
+volte).
+
+Il canale si avvia al primo uso nel processo che lo usa: può essere creato
+nel processo principale e passato ai processi figli come le altre code.
+
+Transport
+
+Transport of the IPC messages between Signal Managers on different hosts. A
+remote channel has the same interface of the queues used by the Signal
+Managers and replaces both IPC queues of an operation: what is put in it
+arrives at the other end of the connection, what arrives from the other end
+is read from the channel. Messages are the binary frames of formato_segnale,
+so the semantics of the signals do not change.
+
+The connection is TCP, through multiprocessing.connection, authenticated
+with a shared key (challenge and response HMAC); then the two ends check
+they have the same names table. One thread writes to the socket all the
+waiting messages with a single write, another one reads. The client end
+reconnects by itself with growing waits, the server end goes back to
+accepting connections: messages put while the connection is missing stay
+waiting, and a batch whose write fails is sent again (so it can arrive
+twice).
+
+The channel starts on first use in the process using it: it can be created
+in the main process and handed to the child processes like the other queues.
+"""
+
+import logging
+import os
+import struct
+import threading
+
+from collections                import deque
+from multiprocessing            import AuthenticationError
+from multiprocessing.connection import Listener,Client
+from multiprocessing.util       import Finalize
+from time                       import monotonic,sleep
+from zlib                       import crc32
+
+#Framework
+from code_segnali    import coda_locale,ATTESA_MASSIMA_INSERIMENTO
+import formato_segnale
+
+# Attesa iniziale e massima tra due tentativi di connessione
+# Initial and maximum wait between two connection attempts
+ATTESA_RICONNESSIONE         = 0.1
+ATTESA_MASSIMA_RICONNESSIONE = 5.0
+# Byte massimi di messaggi raccolti in un'unica scrittura
+# Maximum bytes of messages gathered in a single write
+SCRITTURA_MASSIMA            = 1 << 20
+# Tempo massimo per spedire i messaggi in attesa alla chiusura
+# Maximum time to ship the waiting messages on close
+ATTESA_CHIUSURA              = 2.0
+# Lunghezza di ogni messaggio in una scrittura, firma della tabella dei nomi
+# Length of every message in a write, signature of the names table
+LUNGHEZZA_MESSAGGIO          = struct.Struct(">I")
+FIRMA                        = struct.Struct(">I")
+# Variabile d'ambiente con la chiave condivisa, se non è nella configurazione
+# Environment variable with the shared key, if it is not in the configuration
+VARIABILE_CHIAVE             = "PIPELINE_CHIAVE_REMOTA"
+
+def firma_nomi():
+    """
+    Firma della tabella dei nomi del formato binario
+    Signature of the names table of the binary format
+    """
+    return crc32("\0".join(formato_segnale.nomi).encode())
+
+def indirizzo(testo):
+    """
+    Indirizzo
+
+    Converte "host:porta" nell'indirizzo di una connessione.
+
+    Address
+
+    Converts "host:porta" into the address of a connection.
+    """
+    host,porta = testo.rsplit(":",1)
+    return (host.strip("[]") or "localhost",int(porta))
+
+def chiave(valore=None):
+    """
+    Chiave
+
+    Chiave condivisa dei canali remoti: quella data o, in sua assenza, quella
+    nella variabile d'ambiente. Solleva ValueError se manca.
+
+    Key
+
+    Shared key of the remote channels: the given one or, if missing, the one
+    in the environment variable. Raises ValueError if it is missing.
+    """
+    valore = valore or os.environ.get(VARIABILE_CHIAVE)
+    if not valore:
+        raise ValueError("Chiave dei canali remoti mancante: " + # Missing remote channel key
+                         "chiave_remota o " + VARIABILE_CHIAVE)
+    return valore.encode() if isinstance(valore,str) else valore
+
+def unisci_messaggi(messaggi):
+    """
+    Unisce i messaggi di una scrittura - Joins the messages of a write
+    """
+    return b"".join(LUNGHEZZA_MESSAGGIO.pack(len(messaggio)) + messaggio \
+                    for messaggio in messaggi)
+
+def dividi_messaggi(dati):
+    """
+    Divide i messaggi di una scrittura - Splits the messages of a write
+    """
+    messaggi  = []
+    posizione = 0
+    while posizione < len(dati):
+        lunghezza,  = LUNGHEZZA_MESSAGGIO.unpack_from(dati,posizione)
+        posizione  += LUNGHEZZA_MESSAGGIO.size
+        messaggi.append(bytes(dati[posizione:posizione + lunghezza]))
+        posizione  += lunghezza
+    return messaggi
+
+class canale_remoto:
+    """
+    Canale Remoto
+
+    Capo di una connessione verso un Gestore Segnali remoto, con
+    l'interfaccia delle code IPC. Il capo server (nel Gestore Pipeline)
+    ascolta sull'indirizzo, il capo client (nel nodo che ospita l'operazione)
+    vi si connette. "nome" è il nome dell'operazione servita dal canale, che i
+    due capi devono condividere; "capacita" limita i messaggi in attesa in
+    ciascuna direzione (0 senza limite).
+
+    Inserire in un canale pieno attende come la politica "blocca" delle code
+    limitate e poi scarta il messaggio, contandolo.
+
+    Remote Channel
+
+    End of a connection towards a remote Signal Manager, with the interface
+    of the IPC queues. The server end (in the Pipeline Manager) listens on the
+    address, the client end (in the node hosting the operation) connects to
+    it. "nome" is the name of the operation served by the channel, which the
+    two ends must share; "capacita" bounds the waiting messages in each
+    direction (0 for no bound).
+
+    Putting in a full channel waits like the "blocca" policy of the bounded
+    queues and then drops the message, counting it.
+    """
+    def __init__(self,indirizzo,chiave,server,nome="",capacita=0):
+        self.indirizzo = indirizzo
+        self.chiave    = chiave
+        self.server    = server
+        self.nome      = nome
+        self.capacita  = capacita
+        self.pid       = None
+    def __repr__(self):
+        return type(self).__name__ + "(" + self.nome + " " + \
+               ("ascolta " if self.server else "verso ") + \
+               self.indirizzo[0] + ":" + str(self.indirizzo[1]) + ")"
+    def __getstate__(self):
+        # Solo la configurazione viaggia verso un altro processo
+        # Only the configuration travels towards another process
+        return {"indirizzo": self.indirizzo, "chiave": self.chiave,
+                "server": self.server, "nome": self.nome,
+                "capacita": self.capacita, "pid": None}
+    def avvia(self):
+        """
+        Avvia
+
+        Avvia i thread del canale nel processo corrente, se non sono già
+        avviati. Viene chiamata al primo uso.
+
+        Start
+
+        Starts the channel threads in the current process, if they are not
+        started yet. It is called on first use.
+        """
+        if self.pid == os.getpid():
+            return
+        self.pid          = os.getpid()
+        self.registro     = logging.getLogger(__name__ + "." + self.nome)
+        self.entrata      = coda_locale(self.capacita)
+        self.uscita       = deque()
+        self.condizione   = threading.Condition()
+        self.connessione  = None
+        self.ascoltatore  = None
+        self.in_volo      = 0
+        self.chiuso       = False
+        self.scartati     = 0
+        self.connessioni  = 0
+        threading.Thread(target=self.ricevi,name="canale " + self.nome,
+                         daemon=True).start()
+        threading.Thread(target=self.scrivi,name="canale " + self.nome,
+                         daemon=True).start()
+        # Alla terminazione del processo i messaggi in attesa vengono spediti
+        # When the process ends the waiting messages are shipped
+        Finalize(self,self.chiudi,exitpriority=10)
+    ########################## Interfaccia delle code ##########################
+    ############################ Queue interface ###############################
+    def lettori(self):
+        self.avvia()
+        return self.entrata.lettori()
+    def qsize(self):
+        # Un processo che non usa il canale non lo avvia per misurarlo
+        # A process not using the channel does not start it to measure it
+        if self.pid != os.getpid():
+            return 0
+        return self.entrata.qsize() + len(self.uscita)
+    def empty(self):
+        self.avvia()
+        return self.entrata.empty()
+    def full(self):
+        self.avvia()
+        return 0 < self.capacita <= len(self.uscita)
+    def get(self,block=True,timeout=None):
+        self.avvia()
+        return self.entrata.get(block,timeout)
+    def get_nowait(self):
+        return self.get(False)
+    def put(self,messaggio,block=True,timeout=None):
+        self.inserisci(messaggio,ATTESA_MASSIMA_INSERIMENTO if block else 0)
+    def put_nowait(self,messaggio):
+        self.inserisci(messaggio,0)
+    def inserisci(self,messaggio,attesa=ATTESA_MASSIMA_INSERIMENTO):
+        """
+        Inserisci
+
+        Mette un messaggio in attesa di essere spedito, attendendo al più
+        "attesa" secondi che ci sia posto. Restituisce False se il messaggio è
+        stato scartato.
+
+        Insert
+
+        Puts a message waiting to be shipped, waiting at most "attesa"
+        seconds for room. Returns False if the message has been dropped.
+        """
+        if not isinstance(messaggio,(bytes,bytearray,memoryview)):
+            raise TypeError("Un canale remoto trasporta solo trame binarie") # A remote channel carries only binary frames
+        self.avvia()
+        with self.condizione:
+            if 0 < self.capacita <= len(self.uscita):
+                scadenza = monotonic() + attesa
+                while 0 < self.capacita <= len(self.uscita):
+                    rimanente = scadenza - monotonic()
+                    if rimanente <= 0:
+                        self.scartati += 1
+                        return False
+                    self.condizione.wait(rimanente)
+            self.uscita.append(bytes(messaggio))
+            self.condizione.notify_all()
+        return True
+    ######################## Fine interfaccia delle code #######################
+    ########################## End of queue interface ##########################
+    def connetti(self,attesa):
+        """
+        Connetti
+
+        Stabilisce una connessione autenticata (accettandola o aprendola) e
+        scambia con l'altro capo il nome dell'operazione e la firma della
+        tabella dei nomi. Restituisce la connessione, o None se va ritentata.
+
+        Connect
+
+        Establishes an authenticated connection (accepting or opening it) and
+        exchanges with the other end the operation name and the signature of
+        the names table. Returns the connection, or None if it must be
+        retried.
+        """
+        try:
+            if self.server:
+                if self.ascoltatore is None:
+                    self.ascoltatore = Listener(self.indirizzo,
+                                                authkey=self.chiave)
+                connessione = self.ascoltatore.accept()
+            else:
+                connessione = Client(self.indirizzo,authkey=self.chiave)
+        except AuthenticationError as e:
+            self.registro.warning("%s autenticazione fallita: %s",self,e) # authentication failed
+            sleep(attesa)
+            return None
+        except (OSError,EOFError) as e:
+            if self.server:
+                self.registro.warning("%s: %s",self,e)
+            sleep(attesa)
+            return None
+        try:
+            connessione.send_bytes(FIRMA.pack(firma_nomi()) + self.nome.encode())
+            risposta = connessione.recv_bytes()
+        except (OSError,EOFError) as e:
+            self.registro.warning("%s: %s",self,e)
+            connessione.close()
+            return None
+        firma, = FIRMA.unpack_from(risposta)
+        nome   = risposta[FIRMA.size:].decode()
+        if firma != firma_nomi() or nome != self.nome:
+            # L'altro capo usa un'altra configurazione: i nomi dei segnali
+            # sarebbero decodificati in modo errato
+            # The other end uses another configuration: signal names would be
+            # decoded wrongly
+            self.registro.error("%s rifiuta %s: tabella dei nomi %08x invece " + # refuses: names table instead of
+                                "di %08x",self,nome,firma,firma_nomi())
+            connessione.close()
+            sleep(attesa)
+            return None
+        return connessione
+    def ricevi(self):
+        """
+        Ricevi
+
+        Thread di lettura: mantiene la connessione e mette nel canale i
+        messaggi ricevuti. Se il canale in entrata è pieno smette di leggere,
+        e la connessione TCP rallenta il mittente.
+
+        Receive
+
+        Reading thread: keeps the connection up and puts the received
+        messages in the channel. If the incoming channel is full it stops
+        reading, and the TCP connection slows the sender down.
+        """
+        attesa = ATTESA_RICONNESSIONE
+        while not self.chiuso:
+            connessione = self.connetti(attesa)
+            if connessione is None:
+                attesa = min(2 * attesa,ATTESA_MASSIMA_RICONNESSIONE)
+                continue
+            attesa            = ATTESA_RICONNESSIONE
+            self.connessioni += 1
+            self.registro.info("%s connesso",self) # connected
+            with self.condizione:
+                self.connessione = connessione
+                self.condizione.notify_all()
+            try:
+                while True:
+                    for messaggio in dividi_messaggi(connessione.recv_bytes()):
+                        self.entrata.put(messaggio)
+            except (OSError,EOFError):
+                pass
+            with self.condizione:
+                if self.connessione is connessione:
+                    self.connessione = None
+            connessione.close()
+            if not self.chiuso:
+                self.registro.warning("%s disconnesso",self) # disconnected
+    def scrivi(self):
+        """
+        Scrivi
+
+        Thread di scrittura: spedisce con un'unica scrittura tutti i messaggi
+        in attesa (fino a SCRITTURA_MASSIMA byte). Se la scrittura fallisce i
+        messaggi tornano in testa e vengono rispediti alla connessione
+        successiva.
+
+        Write
+
+        Writing thread: ships with a single write all the waiting messages (up
+        to SCRITTURA_MASSIMA bytes). If the write fails the messages go back
+        to the head and are shipped again on the next connection.
+        """
+        while True:
+            with self.condizione:
+                while not self.uscita or self.connessione is None:
+                    if self.chiuso:
+                        return
+                    self.condizione.wait()
+                connessione = self.connessione
+                messaggi    = []
+                dimensione  = 0
+                while self.uscita and dimensione < SCRITTURA_MASSIMA:
+                    messaggi.append(self.uscita.popleft())
+                    dimensione += len(messaggi[-1])
+                self.in_volo = len(messaggi)
+                self.condizione.notify_all()
+            try:
+                connessione.send_bytes(unisci_messaggi(messaggi))
+            except (OSError,ValueError):
+                with self.condizione:
+                    self.uscita.extendleft(reversed(messaggi))
+                    if self.connessione is connessione:
+                        self.connessione = None
+                # Chiudere la connessione sveglia il thread di lettura
+                # Closing the connection wakes the reading thread up
+                try:
+                    connessione.close()
+                except OSError:
+                    pass
+            with self.condizione:
+                self.in_volo = 0
+                self.condizione.notify_all()
+    def chiudi(self,attesa=ATTESA_CHIUSURA):
+        """
+        Chiudi
+
+        Attende al più "attesa" secondi che i messaggi in attesa siano
+        spediti, poi chiude la connessione.
+
+        Close
+
+        Waits at most "attesa" seconds for the waiting messages to be
+        shipped, then closes the connection.
+        """
+        if self.pid != os.getpid() or self.chiuso:
+            return
+        scadenza = monotonic() + attesa
+        with self.condizione:
+            while (self.uscita or self.in_volo) and \
+                  self.connessione is not None:
+                rimanente = scadenza - monotonic()
+                if rimanente <= 0:
+                    break
+                self.condizione.wait(rimanente)
+            self.chiuso = True
+            connessione,self.connessione = self.connessione,None
+            self.condizione.notify_all()
+        if connessione is not None:
+            connessione.close()
+        if self.ascoltatore is not None:
+            self.ascoltatore.close()
+
+class operazione_remota:
+    """
+    Operazione Remota
+
+    Segnaposto nel Gestore Pipeline di un'operazione che gira su un altro
+    host: non c'è un processo locale da avviare o attendere.
+
+    Remote Operation
+
+    Placeholder in the Pipeline Manager of an operation running on another
+    host: there is no local process to start or wait for.
+    """
+    def __init__(self,nome,canale):
+        self.nome        = nome
+        self.canale      = canale
+        self.coda_pronti = None
+    def __repr__(self):
+        return type(self).__name__ + "(" + repr(self.canale) + ")"
+    def start(self):
+        pass
+    def join(self,timeout=None):
+        pass
+    def is_alive(self):
+        return False